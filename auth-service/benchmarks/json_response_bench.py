@@ -0,0 +1,71 @@
+#
+# Cost of rendering a large list response (ROWS models with uuid, datetime,
+# str, int fields) along the three paths a route can take:
+#   stdlib  - jsonable_encoder + JSONResponse (FastAPI default)
+#   orjson  - jsonable_encoder + config.responses.FastJSONResponse
+#   model   - config.responses.model_response, no intermediate dicts
+# Bodies of all three are checked to be byte for byte equal.
+#
+# Run from the service root:
+#   poetry run python benchmarks/json_response_bench.py
+#
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+import datetime
+import pathlib
+import timeit
+import uuid
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "auth_service"))
+
+from config.responses import FastJSONResponse, model_response
+
+ROWS = 10_000
+REPEATS = 5
+
+
+class Row(BaseModel):
+    id: uuid.UUID
+    name: str
+    description: str
+    views: int
+    created_at: datetime.datetime
+
+
+ROWS_DATA = [
+    Row(
+        id=uuid.uuid4(),
+        name=f"Видео номер {i}",
+        description="Some fairly long description of the video " * 3,
+        views=i * 37,
+        created_at=datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc) + datetime.timedelta(minutes=i)
+    )
+    for i in range(ROWS)
+]
+
+
+def stdlib_body() -> bytes:
+    return JSONResponse(jsonable_encoder(ROWS_DATA)).body
+
+
+def orjson_body() -> bytes:
+    return FastJSONResponse(jsonable_encoder(ROWS_DATA)).body
+
+
+def model_body() -> bytes:
+    return model_response(ROWS_DATA).body
+
+
+if __name__ == "__main__":
+    expected = stdlib_body()
+    assert orjson_body() == expected, "FastJSONResponse output differs from JSONResponse"
+    assert model_body() == expected, "model_response output differs from JSONResponse"
+
+    print(f"{ROWS} rows, {len(expected) / 1024:.0f} KiB body")
+    baseline = None
+    for name, func in (("stdlib", stdlib_body), ("orjson", orjson_body), ("model", model_body)):
+        seconds = min(timeit.repeat(func, number=1, repeat=REPEATS))
+        baseline = baseline or seconds
+        print(f"{name:<6} {seconds * 1000:>8.2f} ms | x{baseline / seconds:.1f}")
@@ -0,0 +1,117 @@
+#
+# JWT encode/decode throughput: plain PyJWT HS256 (previous implementation) vs
+# a prepared HS256 codec and the EdDSA codec used since key rotation. The
+# HS256 codec is only kept here, the services sign with EdDSA.
+#
+# Run from the service root:
+#   poetry run python benchmarks/jwt_bench.py
+#
+import pathlib
+import hashlib
+import timeit
+import hmac
+import sys
+import datetime
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "auth_service"))
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from services.jwt_codec import BaseJwtCodec, EdDsaJwtCodec, b64url_encode
+import orjson
+import jwt
+
+SECRET_KEY = "benchmark-secret-key-benchmark-secret-key"
+ITERATIONS = 50_000
+
+
+#
+# HS256 codec producing the same tokens as jwt.encode/jwt.decode.
+# The HMAC key schedule and the encoded header are prepared once,
+# every token only copies the keyed hash and serializes the claims.
+#
+class JwtCodec(BaseJwtCodec):
+    ALGORITHM = "HS256"
+
+    def __init__(self, secret_key: str, leeway: int = 0):
+        super().__init__(leeway=leeway)
+        self.__hmac = hmac.new(secret_key.encode(), digestmod=hashlib.sha256)
+        self.__header_segment = b64url_encode(orjson.dumps({"alg": self.ALGORITHM, "typ": "JWT"}))
+
+    def encode(self, payload: dict) -> str:
+        signing_input = self.__header_segment + b"." + b64url_encode(orjson.dumps(payload))
+        return (signing_input + b"." + b64url_encode(self.__sign(signing_input))).decode()
+
+    def _verify(self, header_segment: bytes, signing_input: bytes, signature: bytes):
+        if header_segment != self.__header_segment:
+            self._parse_header(header_segment)
+
+        if not hmac.compare_digest(signature, self.__sign(signing_input)):
+            raise jwt.InvalidTokenError("Signature verification failed")
+
+    def __sign(self, signing_input: bytes) -> bytes:
+        mac = self.__hmac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+
+codec = JwtCodec(SECRET_KEY)
+eddsa_codec = EdDsaJwtCodec(signing_key=Ed25519PrivateKey.generate(), signing_kid="bench")
+
+
+def pyjwt_encode():
+    return jwt.encode(
+        payload={
+            "id": "9a0c4b4e-4d1f-4c59-9b8e-3f2c1d0e5a77",
+            "sub": "username",
+            "role": "USER",
+            "exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=15)
+        },
+        key=SECRET_KEY,
+        algorithm="HS256"
+    )
+
+def codec_encode():
+    return codec.encode_claims("9a0c4b4e-4d1f-4c59-9b8e-3f2c1d0e5a77", "username", "USER", 15)
+
+def pyjwt_pair():
+    return (pyjwt_encode(), pyjwt_encode())
+
+def codec_pair():
+    return codec.encode_pair("9a0c4b4e-4d1f-4c59-9b8e-3f2c1d0e5a77", "username", "USER", 15, 30 * 24 * 60)
+
+
+TOKEN = pyjwt_encode()
+
+def pyjwt_decode():
+    return jwt.decode(jwt=TOKEN, key=SECRET_KEY, algorithms=["HS256"])
+
+def codec_decode():
+    return codec.decode(TOKEN)
+
+
+def eddsa_encode():
+    return eddsa_codec.encode_claims("9a0c4b4e-4d1f-4c59-9b8e-3f2c1d0e5a77", "username", "USER", 15)
+
+EDDSA_TOKEN = eddsa_encode()
+
+def eddsa_decode():
+    return eddsa_codec.decode(EDDSA_TOKEN)
+
+
+def rate(func, tokens_per_call: int = 1) -> float:
+    return ITERATIONS * tokens_per_call / timeit.timeit(func, number=ITERATIONS)
+
+def report(name: str, before, after, tokens_per_call: int = 1):
+    before_rate = rate(before, tokens_per_call)
+    after_rate = rate(after, tokens_per_call)
+    print(f"{name:<8} pyjwt {before_rate:>12,.0f} tok/s | codec {after_rate:>12,.0f} tok/s | x{after_rate / before_rate:.2f}")
+
+
+if __name__ == "__main__":
+    assert codec_decode() == pyjwt_decode()
+    assert jwt.decode(jwt=codec_encode(), key=SECRET_KEY, algorithms=["HS256"])["sub"] == "username"
+
+    report("encode", pyjwt_encode, codec_encode)
+    report("pair", pyjwt_pair, codec_pair, tokens_per_call=2)
+    report("decode", pyjwt_decode, codec_decode)
+    print(f"eddsa    encode {rate(eddsa_encode):>12,.0f} tok/s | decode {rate(eddsa_decode):>12,.0f} tok/s")
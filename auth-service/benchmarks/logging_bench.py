@@ -0,0 +1,75 @@
+#
+# Per-call overhead of the entrance/exit logging wrapper: the previous eager
+# f-string wrapper vs log.wrappers.log_entrance_debug, with DEBUG disabled
+# and enabled (records go to a handler that discards them).
+#
+# Run from the service root:
+#   poetry run python benchmarks/logging_bench.py
+#
+import pathlib
+import asyncio
+import logging
+import timeit
+import sys
+import os
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "auth_service"))
+
+for name, value in {
+    "REDIS_PORT": "6379",
+    "JWT_ACCESS_EXPIRATION_TIME_MINUTES": "15",
+    "JWT_REFRESH_EXPIRATION_TIME_DAYS": "30",
+    "SESSION_EXPIRATION_TIME": "3600"
+}.items():
+    os.environ.setdefault(name, value)
+
+from models.dtos import UserCredsCreate
+from log.wrappers import log_entrance_debug
+
+ITERATIONS = 100_000
+
+logger = logging.getLogger("BENCH")
+logger.propagate = False
+logger.addHandler(logging.NullHandler())
+
+
+def eager_log_entrance_debug(logger: logging.Logger):
+    def decorator(func):
+        async def async_wrapper(*args, **kwargs):
+            logger.debug(f"Function {func.__name__} entrance | args {args} ; kwargs {kwargs}")
+            result = await func(*args, **kwargs)
+            logger.debug(f"Function {func.__name__} exit | Result {result}")
+            return result
+        return async_wrapper
+    return decorator
+
+
+async def service_call(user_dto: UserCredsCreate) -> tuple[str, str]:
+    return (user_dto.username, user_dto.email)
+
+eager_call = eager_log_entrance_debug(logger)(service_call)
+lazy_call = log_entrance_debug(logger)(service_call)
+
+USER_DTO = UserCredsCreate(username="username", email="user@example.com", password="password")
+
+
+def measure(func) -> float:
+    async def run():
+        for _ in range(ITERATIONS):
+            await func(USER_DTO)
+
+    seconds = timeit.timeit(lambda: asyncio.run(run()), number=1)
+    return seconds / ITERATIONS * 1e9
+
+
+if __name__ == "__main__":
+    for level in (logging.INFO, logging.DEBUG):
+        logger.setLevel(level)
+        baseline = measure(service_call)
+
+        print(
+            f"level {logging.getLevelName(level):<5} | "
+            f"no wrapper {baseline:>8.0f} ns | "
+            f"eager {measure(eager_call) - baseline:>8.0f} ns/call | "
+            f"lazy {measure(lazy_call) - baseline:>8.0f} ns/call"
+        )
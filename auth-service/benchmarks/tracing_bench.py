@@ -0,0 +1,68 @@
+#
+# Per-request overhead of tracing: a request span with three child spans
+# (one redis command and two queries), measured outside of a trace,
+# in an unsampled trace and in a sampled one (exporter queue is drained
+# by the background thread into a temporary file).
+#
+# Run from the service root:
+#   poetry run python benchmarks/tracing_bench.py
+#
+import tempfile
+import pathlib
+import asyncio
+import timeit
+import sys
+import os
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "auth_service"))
+
+for name, value in {
+    "REDIS_PORT": "6379",
+    "JWT_ACCESS_EXPIRATION_TIME_MINUTES": "15",
+    "JWT_REFRESH_EXPIRATION_TIME_DAYS": "30",
+    "SESSION_EXPIRATION_TIME": "3600",
+    "TRACING_EXPORTER": "file"
+}.items():
+    os.environ.setdefault(name, value)
+
+import globals
+
+globals.TRACING_FILENAME = os.path.join(tempfile.mkdtemp(), "{date}.jsonl")
+
+from log.tracing import EXPORTER, span, start_span
+
+ITERATIONS = 100_000
+SAMPLED = "00-" + "1" * 32 + "-" + "2" * 16 + "-01"
+UNSAMPLED = "00-" + "1" * 32 + "-" + "2" * 16 + "-00"
+
+
+async def handler():
+    for name in ("redis GET", "db query", "db query"):
+        child = start_span(name, "client", {"db.system": "bench"}, new_trace=False)
+        child.end()
+
+
+async def traced_request(traceparent: str | None):
+    with span("GET /bench", "server", traceparent=traceparent):
+        await handler()
+
+
+def measure(func, *args) -> float:
+    async def run():
+        for _ in range(ITERATIONS):
+            await func(*args)
+
+    seconds = timeit.timeit(lambda: asyncio.run(run()), number=1)
+    return seconds / ITERATIONS * 1e9
+
+
+if __name__ == "__main__":
+    EXPORTER.start()
+
+    baseline = measure(handler)
+    print(f"no tracing {baseline:>8.0f} ns/request")
+    print(f"unsampled  {measure(traced_request, UNSAMPLED) - baseline:>8.0f} ns/request overhead")
+    print(f"sampled    {measure(traced_request, SAMPLED) - baseline:>8.0f} ns/request overhead")
+
+    EXPORTER.stop()
+    print(f"dropped spans {EXPORTER.dropped}")
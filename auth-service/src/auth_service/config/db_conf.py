@@ -1,25 +1,158 @@
 from globals import DB_USERNAME, DB_HOST, DB_NAME, DB_PASSWORD, DB_URL
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from globals import (
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT_SECONDS, DB_POOL_RECYCLE_SECONDS,
+    DB_POOL_PRE_PING, DB_POOL_WARM_UP_CONNECTIONS, WARM_UP_TIMEOUT_SECONDS, DB_STATEMENT_CACHE_SIZE, DB_STATEMENT_TIMEOUT_MS,
+    DB_REPLICA_HOSTS, DB_REPLICA_MAX_LAG_SECONDS, DB_REPLICA_CHECK_INTERVAL_SECONDS, DB_REPLICA_CHECK_TIMEOUT_SECONDS,
+    DB_READ_YOUR_WRITES_SECONDS
+)
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError
+from config.db_routing import ReplicaSet, RoutingSession
+from config.db_tracing import trace_engine
+from log.loggers import APP_LOGGER
+from sqlalchemy import text
 from models import entities
+import asyncio
+import time
 
-engine = None
-AsyncSessionMaker = None
 
-if (DB_URL != None 
-    and DB_USERNAME != None 
-    and DB_PASSWORD != None 
-    and DB_NAME != None 
-    and DB_HOST != None
-):
+#
+# Queue pool that also counts checkouts and how long they waited for a
+# free connection, so the pool can be fitted to postgres max_connections
+#
+class MeteredPool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started_at
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": self.total_wait / self.checkouts * 1000 if self.checkouts != 0 else 0.0,
+            "max_wait_ms": self.max_wait * 1000
+        }
+
+
+def create_metered_engine(host: str) -> AsyncEngine:
     engine = create_async_engine(
         DB_URL.format(
             username=DB_USERNAME,
             password=DB_PASSWORD,
-            host=DB_HOST,
+            host=host,
             bd_name=DB_NAME
-        )
+        ),
+        poolclass=MeteredPool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+        }
+    )
+    trace_engine(engine)
+
+    return engine
+
+
+engine: AsyncEngine = None
+replica_set: ReplicaSet = None
+# Reads and writes on the primary
+AsyncSessionMaker: async_sessionmaker[AsyncSession] = None
+# Read-only work, routed to a healthy replica unless this request has just written
+ReadOnlySessionMaker: async_sessionmaker[AsyncSession] = None
+
+if (DB_URL != None
+    and DB_USERNAME != None
+    and DB_PASSWORD != None
+    and DB_NAME != None
+    and DB_HOST != None
+):
+    engine = create_metered_engine(DB_HOST)
+
+    replica_set = ReplicaSet(
+        primary=engine,
+        replicas=[create_metered_engine(host) for host in DB_REPLICA_HOSTS],
+        max_lag=DB_REPLICA_MAX_LAG_SECONDS,
+        check_interval=DB_REPLICA_CHECK_INTERVAL_SECONDS,
+        check_timeout=DB_REPLICA_CHECK_TIMEOUT_SECONDS,
+        read_your_writes_window=DB_READ_YOUR_WRITES_SECONDS
     )
-    AsyncSessionMaker = sessionmaker(engine, class_=AsyncSession)
 
+    class ServiceSession(RoutingSession):
+        replica_set = replica_set
+
+    AsyncSessionMaker = async_sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=ServiceSession,
+        expire_on_commit=False
+    )
+    ReadOnlySessionMaker = async_sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=ServiceSession,
+        expire_on_commit=False,
+        info={"read_only": True}
+    )
+
+
+async def ping_db():
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+#
+# Opens the configured number of connections up front,
+# so the first requests after a deploy don't pay for the handshakes
+#
+async def warm_up_pool():
+    if engine == None:
+        return
+
+    connections = min(DB_POOL_WARM_UP_CONNECTIONS, DB_POOL_SIZE)
+    results = await asyncio.gather(
+        *(asyncio.wait_for(ping_db(), WARM_UP_TIMEOUT_SECONDS) for _ in range(connections)),
+        return_exceptions=True
+    )
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    if len(errors) != 0:
+        APP_LOGGER.warning(f"DB pool warm up failed for {len(errors)}/{connections} connections | {errors[0]!r}")
+
+
+def pool_stats() -> dict:
+    if engine == None:
+        return {}
+
+    return engine.pool.stats()
+
+
+def replica_stats() -> dict:
+    if replica_set == None:
+        return {}
 
+    return replica_set.stats()
@@ -0,0 +1,37 @@
+from sqlalchemy.ext.asyncio import AsyncEngine
+from log.tracing import start_span
+from sqlalchemy import event
+
+MAX_STATEMENT_LENGTH = 1000
+
+
+#
+# Records every statement executed by the engine as a span of the current trace.
+# Parameters are never recorded, they may carry credentials.
+#
+def trace_engine(engine: AsyncEngine):
+    sync_engine = engine.sync_engine
+    host = str(engine.url.host)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = start_span(
+            "db query",
+            "client",
+            {"db.system": "postgresql", "db.host": host, "db.statement": statement[:MAX_STATEMENT_LENGTH]},
+            new_trace=False
+        )
+        conn.info.setdefault("trace_spans", []).append(span)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            spans.pop().end()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            spans.pop().end(exception_context.original_exception)
@@ -1,21 +1,102 @@
+from globals import ERROR_LOG_INTERVAL_SECONDS, ERROR_RESPONSE_CACHE_SIZE
 from fastapi.exceptions import RequestValidationError
 from log.loggers import EXCEPTION_HANDLER_LOGGER
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from exceptions import CodeException
 from fastapi import Request
+import orjson
+import time
+
+
+#
+# Error counters per exception class. Expected errors (status below 500) are
+# logged as one line per class per interval, with the number of occurrences
+# folded into it, so bursts of 401/404/409 cost a counter increment.
+#
+class ErrorMetrics:
+    def __init__(self, log_interval: float):
+        self.__log_interval = log_interval
+        self.__counts: dict[str, int] = {}
+        self.__suppressed: dict[str, int] = {}
+        self.__logged_at: dict[str, float] = {}
+
+    def expected(self, name: str, status_code: int, message: str):
+        self.__counts[name] = self.__counts.get(name, 0) + 1
+
+        now = time.monotonic()
+        if now - self.__logged_at.get(name, float("-inf")) < self.__log_interval:
+            self.__suppressed[name] = self.__suppressed.get(name, 0) + 1
+            return
+
+        suppressed = self.__suppressed.pop(name, 0)
+        self.__logged_at[name] = now
+        EXCEPTION_HANDLER_LOGGER.info(
+            f"{name}: {status_code} | {message}" + (f" | +{suppressed} since last report" if suppressed != 0 else "")
+        )
+
+    def unexpected(self, name: str):
+        self.__counts[name] = self.__counts.get(name, 0) + 1
+
+    def stats(self) -> dict:
+        return dict(self.__counts)
+
+
+error_metrics = ErrorMetrics(log_interval=ERROR_LOG_INTERVAL_SECONDS)
+
+# Serialized {"error": message} bodies, exception messages are mostly constants
+__ERROR_BODIES: dict[str, bytes] = {}
+
+
+def error_body(message: str) -> bytes:
+    body = __ERROR_BODIES.get(message)
+
+    if body is None:
+        body = orjson.dumps({"error": message})
+        if len(__ERROR_BODIES) < ERROR_RESPONSE_CACHE_SIZE:
+            __ERROR_BODIES[message] = body
+
+    return body
+
+
+def error_stats() -> dict:
+    return error_metrics.stats()
+
 
 async def code_exception_handler(req: Request, ex: CodeException):
-    EXCEPTION_HANDLER_LOGGER.exception(f"CODE EXCEPTION: {ex.status_code} | {ex.message}")
+    name = type(ex).__name__
+
+    if ex.status_code < 500:
+        error_metrics.expected(name, ex.status_code, ex.message)
+    else:
+        error_metrics.unexpected(name)
+        EXCEPTION_HANDLER_LOGGER.exception(f"CODE EXCEPTION: {ex.status_code} | {ex.message}")
 
-    return JSONResponse(
+    return Response(
         status_code=ex.status_code,
-        content={"error": ex.message},
+        content=error_body(ex.message),
+        media_type="application/json"
     )
 
+
+#
+# Anything that is not a CodeException is a bug. The server logs its
+# traceback once the exception is re-raised, here it is only counted.
+#
+async def unexpected_exception_handler(req: Request, ex: Exception):
+    error_metrics.unexpected(type(ex).__name__)
+
+    return Response(
+        status_code=500,
+        content=error_body("Internal server error"),
+        media_type="application/json"
+    )
+
+
 async def pydantic_validation_exception_handler(req: Request, ex: RequestValidationError):
-    EXCEPTION_HANDLER_LOGGER.exception(f"VALIDATION EXCEPTION: {ex.errors} | {ex.__traceback__}")
+    error_metrics.expected(type(ex).__name__, 404, str(ex.errors()))
 
-    return JSONResponse(
+    return Response(
         status_code=404,
-        content={"error": "Validation failed"},
+        content=error_body("Validation failed"),
+        media_type="application/json"
     )
@@ -0,0 +1,43 @@
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from globals import JWT_KEYS_DIR, JWT_ACTIVE_KID
+from log.loggers import JWT_SERVICE_LOGGER
+import pathlib
+import uuid
+
+#
+# Ed25519 signing keys are read from JWT_KEYS_DIR, one PKCS8 PEM file per key,
+# the file name (without .pem) is the kid. The active key is JWT_ACTIVE_KID or
+# the last kid in lexical order, so date prefixed names rotate naturally.
+# Every key in the directory is published in JWKS, a retired key should stay
+# there until the longest-lived token signed with it has expired.
+#
+
+signing_kid: str = None
+signing_key: Ed25519PrivateKey = None
+verifying_keys: dict[str, Ed25519PublicKey] = {}
+
+keys_dir = pathlib.Path(JWT_KEYS_DIR)
+
+if keys_dir.is_dir():
+    for key_path in sorted(keys_dir.glob("*.pem")):
+        private_key = load_pem_private_key(key_path.read_bytes(), password=None)
+
+        if not isinstance(private_key, Ed25519PrivateKey):
+            raise ValueError(f"JWT key {key_path} is not an Ed25519 private key")
+
+        verifying_keys[key_path.stem] = private_key.public_key()
+
+        if JWT_ACTIVE_KID == None or JWT_ACTIVE_KID == key_path.stem:
+            signing_kid = key_path.stem
+            signing_key = private_key
+
+if signing_key == None:
+    if JWT_ACTIVE_KID != None:
+        raise ValueError(f"Active JWT key {JWT_ACTIVE_KID} is not found in {JWT_KEYS_DIR}")
+
+    signing_kid = f"ephemeral-{uuid.uuid4().hex[:12]}"
+    signing_key = Ed25519PrivateKey.generate()
+    verifying_keys[signing_kid] = signing_key.public_key()
+
+    JWT_SERVICE_LOGGER.warning(f"No JWT keys in {JWT_KEYS_DIR}, using ephemeral key {signing_kid}")
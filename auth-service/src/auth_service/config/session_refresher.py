@@ -0,0 +1,111 @@
+from log.loggers import SESSION_CACHE_LOGGER
+from redis.exceptions import RedisError
+from collections import OrderedDict
+from redis.asyncio import Redis
+import asyncio
+import time
+
+
+#
+# Sliding session expiration. A session TTL is pushed forward at most once
+# per refresh interval, refreshes are collected in memory and written to
+# redis as one pipelined batch per flush.
+#
+class SessionRefresher:
+    def __init__(self, redis_client: Redis, expiration_time: int, refresh_interval: float, flush_interval: float):
+        self.__redis = redis_client
+        self.__expiration_time = expiration_time
+        self.__refresh_interval = refresh_interval
+        self.__flush_interval = flush_interval
+
+        # session_id -> monotonic time of the last scheduled refresh, oldest first
+        self.__last_refresh: OrderedDict[str, float] = OrderedDict()
+        self.__pending: set[str] = set()
+        self.__flusher: asyncio.Task | None = None
+
+        self.__touches = 0
+        self.__writes = 0
+
+    def touch(self, session_id: str):
+        self.__touches += 1
+        now = time.monotonic()
+
+        last_refresh = self.__last_refresh.get(session_id)
+        if last_refresh is not None and now - last_refresh < self.__refresh_interval:
+            return
+
+        self.__last_refresh[session_id] = now
+        self.__last_refresh.move_to_end(session_id)
+        self.__pending.add(session_id)
+
+    def forget(self, session_id: str):
+        self.__last_refresh.pop(session_id, None)
+        self.__pending.discard(session_id)
+
+    def stats(self) -> dict:
+        return {
+            "touches": self.__touches,
+            "writes": self.__writes,
+            "pending": len(self.__pending),
+            "tracked": len(self.__last_refresh)
+        }
+
+    async def start(self):
+        if self.__flusher is None:
+            self.__flusher = asyncio.create_task(self.__run())
+
+    async def stop(self):
+        if self.__flusher is None:
+            return
+
+        self.__flusher.cancel()
+        try:
+            await self.__flusher
+        except asyncio.CancelledError:
+            pass
+
+        self.__flusher = None
+
+        try:
+            await self.flush()
+        except RedisError as ex:
+            SESSION_CACHE_LOGGER.warning(f"Final session TTL refresh batch failed | {ex}")
+
+    async def flush(self):
+        self.__prune()
+
+        if len(self.__pending) == 0:
+            return
+
+        session_ids = self.__pending
+        self.__pending = set()
+
+        # EXPIRE is a no-op for missing keys, so revoked sessions are never resurrected
+        try:
+            async with self.__redis.pipeline(transaction=False) as pipe:
+                for session_id in session_ids:
+                    pipe.expire(session_id, self.__expiration_time)
+                await pipe.execute()
+        except RedisError:
+            self.__pending |= session_ids
+            raise
+
+        self.__writes += len(session_ids)
+
+    def __prune(self):
+        deadline = time.monotonic() - self.__refresh_interval
+
+        while len(self.__last_refresh) != 0:
+            session_id, last_refresh = next(iter(self.__last_refresh.items()))
+            if last_refresh > deadline:
+                break
+            self.__last_refresh.popitem(last=False)
+
+    async def __run(self):
+        while True:
+            await asyncio.sleep(self.__flush_interval)
+
+            try:
+                await self.flush()
+            except RedisError as ex:
+                SESSION_CACHE_LOGGER.warning(f"Session TTL refresh batch failed | {ex}")
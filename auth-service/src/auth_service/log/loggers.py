@@ -5,7 +5,10 @@ EXCEPTION_HANDLER_LOGGER: logging.Logger = logging.getLogger("EXCEPTION HANDLER"
 TEST_LOGGER: logging.Logger = logging.getLogger("TEST")
 
 SESSION_SERVICE_LOGGER: logging.Logger = logging.getLogger("SESSION SERVICE")
+SESSION_CACHE_LOGGER: logging.Logger = logging.getLogger("SESSION CACHE")
 USER_CREDS_SERVICE_LOGGER: logging.Logger = logging.getLogger("USER CREDS SERVICE")
 JWT_SERVICE_LOGGER: logging.Logger = logging.getLogger("JWT SERVICE LOGGER")
+TOKEN_FAMILY_SERVICE_LOGGER: logging.Logger = logging.getLogger("TOKEN FAMILY SERVICE")
+USER_IMPORT_SERVICE_LOGGER: logging.Logger = logging.getLogger("USER IMPORT SERVICE")
 
 USER_CREDS_SERVICE_ROUTER: logging.Logger = logging.getLogger("USER CREDS ROUTER")
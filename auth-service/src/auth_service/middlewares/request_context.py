@@ -0,0 +1,43 @@
+from log.context import REQUEST_ID, ROUTE_LOGS_LEVEL, route_logs_level
+import uuid
+
+REQUEST_ID_HEADER = b"x-request-id"
+MAX_REQUEST_ID_LENGTH = 128
+
+
+#
+# Binds the request id (and the route log level) to the request context.
+# Services take the id forwarded by the gateway, the gateway always
+# generates a new one. The id is echoed back in the response headers.
+#
+class RequestContextMiddleware:
+    def __init__(self, app, trust_incoming: bool = True):
+        self.app = app
+        self.trust_incoming = trust_incoming
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        if self.trust_incoming:
+            for name, value in scope["headers"]:
+                if name == REQUEST_ID_HEADER:
+                    request_id = value.decode("latin-1")[:MAX_REQUEST_ID_LENGTH]
+                    break
+        if not request_id:
+            request_id = uuid.uuid4().hex
+
+        request_id_token = REQUEST_ID.set(request_id)
+        level_token = ROUTE_LOGS_LEVEL.set(route_logs_level(scope["path"]))
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            REQUEST_ID.reset(request_id_token)
+            ROUTE_LOGS_LEVEL.reset(level_token)
@@ -12,3 +12,9 @@ class UserCredsAuth(BaseModel):
 
 class UserCredsAuthWithToken(BaseModel):
     token: str = Field(...)
+
+class UserImportRow(BaseModel):
+    username: str = Field(..., min_length=3, max_length=20)
+    email: EmailStr = Field(..., min_length=3, max_length=60)
+    password: str | None = Field(None, min_length=3, max_length=30)
+    password_hash: str | None = Field(None, pattern=r"^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$")
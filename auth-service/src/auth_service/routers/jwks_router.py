@@ -0,0 +1,17 @@
+from services.jwt_token_service import get_jwks
+from fastapi import APIRouter, Response
+import orjson
+
+jwks_router = APIRouter()
+
+# Key set is static for the process lifetime, serialize it once
+JWKS_CONTENT = orjson.dumps(get_jwks())
+
+
+@jwks_router.get("/.well-known/jwks.json")
+async def router_jwks():
+    return Response(
+        content=JWKS_CONTENT,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=300"}
+    )
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Response
+from fastapi import APIRouter, Response, Cookie
 from models.dtos import UserCredsCreate, UserCredsAuth, UserCredsAuthWithToken
-from services.user_creds_service import register, auth, auth_with_jwt_token
+from services.user_creds_service import register, auth, auth_with_jwt_token, refresh
+from services.session_service import delete_session
 
 user_creds_router = APIRouter()
 
@@ -30,21 +31,37 @@ async def router_auth(user_dto: UserCredsAuth, resp: Response):
 
 @user_creds_router.post("/auth_with_token")
 async def router_auth_with_token(token: UserCredsAuthWithToken, resp: Response):
-    _, _, session_id = await auth_with_jwt_token(token.token)
+    access_token, refresh_token, session_id = await auth_with_jwt_token(token.token)
 
+    # The presented refresh token is used up, the client must keep the new pair
     resp.set_cookie("session_id", value=session_id, httponly=True, samesite="strict")
+    resp.set_cookie("access_token", value=access_token, httponly=True, samesite="strict")
+    resp.set_cookie("refresh_token", value=refresh_token, httponly=True, samesite="strict")
     resp.status_code = 200
 
     return {"status": "OK"}
 
 
 @user_creds_router.post("/refresh")
-async def router_auth_with_token(token: UserCredsAuthWithToken, resp: Response):
-    access_token, _, session_id = await auth_with_jwt_token(token.token)
+async def router_refresh(token: UserCredsAuthWithToken, resp: Response):
+    access_token, refresh_token, session_id = await refresh(token.token)
 
     resp.set_cookie("session_id", value=session_id, httponly=True, samesite="strict")
     resp.set_cookie("access_token", value=access_token, httponly=True, samesite="strict")
+    resp.set_cookie("refresh_token", value=refresh_token, httponly=True, samesite="strict")
     resp.status_code = 200
 
     return {"status": "OK"}
 
+
+@user_creds_router.post("/logout")
+async def router_logout(resp: Response, session_id: str | None = Cookie(None)):
+    if session_id != None:
+        await delete_session(session_id)
+
+    resp.delete_cookie("session_id", httponly=True, samesite="strict")
+    resp.delete_cookie("access_token", httponly=True, samesite="strict")
+    resp.delete_cookie("refresh_token", httponly=True, samesite="strict")
+    resp.status_code = 200
+
+    return {"status": "OK"}
@@ -0,0 +1,48 @@
+from services.user_import_service import import_users, get_import
+from exceptions import ForbiddenException, NotFoundException
+from services.jwt_token_service import validate_token
+from fastapi import APIRouter, Request, Cookie, Depends
+
+user_import_router = APIRouter(prefix="/admin/users")
+
+ADMIN_ROLE = "ADMIN"
+FORMATS_BY_CONTENT_TYPE = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson"
+}
+
+
+async def require_admin(access_token: str | None = Cookie(None)):
+    if access_token == None:
+        raise ForbiddenException("Admin access token is required")
+
+    jwt_data = await validate_token(access_token)
+    if jwt_data.role != ADMIN_ROLE:
+        raise ForbiddenException()
+
+
+#
+# Body is a CSV (username,email,password|password_hash header) or NDJSON upload,
+# it is consumed as it arrives. Progress of a running import is served by
+# GET /admin/users/import/{import_id}.
+#
+@user_import_router.post("/import", dependencies=[Depends(require_admin)])
+async def router_import_users(req: Request, format: str | None = None, import_id: str | None = None):
+    if format == None:
+        content_type = req.headers.get("content-type", "").split(";")[0].strip()
+        format = FORMATS_BY_CONTENT_TYPE.get(content_type, "csv")
+
+    user_import = await import_users(req.stream(), format, import_id)
+
+    return user_import.report()
+
+
+@user_import_router.get("/import/{import_id}", dependencies=[Depends(require_admin)])
+async def router_import_progress(import_id: str):
+    user_import = get_import(import_id)
+
+    if user_import == None:
+        raise NotFoundException("Cannot find such import")
+
+    return user_import.report()
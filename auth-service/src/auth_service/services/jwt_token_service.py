@@ -1,54 +1,69 @@
 from exceptions import UnauthorizedException
-from globals import JWT_SECRET_KEY
-import datetime
-from log.wrappers import log_entrance_debug
-from log.loggers import JWT_SERVICE_LOGGER
+from config.jwt_keys_conf import signing_key, signing_kid, verifying_keys
+from .jwt_codec import EdDsaJwtCodec
 import jwt
 
+JWT_CODEC = EdDsaJwtCodec(
+    signing_key=signing_key,
+    signing_kid=signing_kid,
+    verifying_keys=verifying_keys
+)
+
+
 class JwtPayload:
-    def __init__(self, user_id: str, username: str, role: str, exp_time: int):
+    def __init__(self, user_id: str, username: str, role: str, exp_time: int, family_id: str | None = None, seq: int | None = None):
         self.user_id = user_id
         self.username = username
         self.role = role
         self.exp_time = exp_time
+        # Refresh tokens only: rotation family and position in it
+        self.family_id = family_id
+        self.seq = seq
 
-    def to_dict(self):
-        return {
-            "id": self.user_id,
-            "sub": self.username,
-            "role": self.role,
-            "exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=self.exp_time)
-        }
-    
     @staticmethod
     def from_dict(dict_payload: dict):
         return JwtPayload(
             user_id=dict_payload.get("id", None),
             username=dict_payload.get("sub", None),
             role=dict_payload.get("role", None),
-            exp_time=dict_payload.get("exp_time", None)
+            exp_time=dict_payload.get("exp_time", None),
+            family_id=dict_payload.get("fam", None),
+            seq=dict_payload.get("seq", None)
         )
 
 
+# Token functions are on the hot path and are deliberately not wrapped
+# with log_entrance_debug: it would format every token on every call.
 
-@log_entrance_debug(JWT_SERVICE_LOGGER)
-async def create_token(username: str, user_id: str, role: str, exp_time: int) -> str:
-    payload = JwtPayload(
+#
+# Returns access token and refresh token
+#
+async def create_token_pair(
+    username: str,
+    user_id: str,
+    role: str,
+    access_exp_time: int,
+    refresh_exp_time: int,
+    family_id: str,
+    seq: int = 0
+) -> tuple[str, str]:
+    return JWT_CODEC.encode_pair(
         user_id=user_id,
         username=username,
         role=role,
-        exp_time=exp_time
+        access_exp_time=access_exp_time,
+        refresh_exp_time=refresh_exp_time,
+        refresh_claims={"fam": family_id, "seq": seq}
     )
-    
-    token = jwt.encode(payload=payload.to_dict(), key=JWT_SECRET_KEY, algorithm="HS256")
-    return token
 
-@log_entrance_debug(JWT_SERVICE_LOGGER)
 async def validate_token(token: str) -> JwtPayload:
     try:
-        payload = jwt.decode(jwt=token, key=JWT_SECRET_KEY, algorithms=["HS256"])
+        payload = JWT_CODEC.decode(token)
         return JwtPayload.from_dict(payload)
     except jwt.ExpiredSignatureError:
         raise UnauthorizedException("Token expired")
-    except jwt.InvalidTokenError:
+    except (jwt.InvalidTokenError, jwt.InvalidKeyError):
         raise UnauthorizedException("Invalid token")
+
+def get_jwks() -> dict:
+    return JWT_CODEC.jwks()
@@ -0,0 +1,12 @@
+from passlib.hash import bcrypt
+
+#
+# Runs in import worker processes. Like every spawned process they import
+# the service's main module, which only builds the app: redis and db
+# connections are opened by its lifespan, never run in a worker. Keep this
+# module free of service imports all the same.
+#
+
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    return [bcrypt.hash(password) for password in passwords]
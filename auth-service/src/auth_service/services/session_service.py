@@ -1,19 +1,21 @@
-from config.redis_conf import redis_client
+from config.redis_conf import redis_client, session_cache, session_refresher
 from globals import SESSION_EXPIRATION_TIME
 from log.wrappers import log_entrance_debug
 from log.loggers import SESSION_SERVICE_LOGGER
 from exceptions import UnauthorizedException
+from .token_family_service import revoke_family
 import uuid
 import json
 
-@log_entrance_debug(SESSION_SERVICE_LOGGER)
-async def create_session(user_id: str, username: str, role: str) -> str:
+@log_entrance_debug(SESSION_SERVICE_LOGGER, log_result=False)
+async def create_session(user_id: str, username: str, role: str, family_id: str | None = None) -> str:
     session_id = str(uuid.uuid4())
 
     session_data = json.dumps({    
         "user_id": user_id,
         "username": username,
-        "role": role
+        "role": role,
+        "family_id": family_id
     })
 
     await redis_client.set(session_id, session_data, ex=SESSION_EXPIRATION_TIME)
@@ -22,10 +24,23 @@ async def create_session(user_id: str, username: str, role: str) -> str:
 
 @log_entrance_debug(SESSION_SERVICE_LOGGER)
 async def get_session(session_id: str) -> dict:
-    session_data = redis_client.get(session_id)
+    session_data = await session_cache.get(session_id)
 
     if session_data == None:
-        UnauthorizedException("Session id is expired.")
+        raise UnauthorizedException("Session id is expired.")
+
+    session_refresher.touch(session_id)
 
-    return json.loads(session_data)
+    return session_data
+
+@log_entrance_debug(SESSION_SERVICE_LOGGER)
+async def delete_session(session_id: str):
+    session_refresher.forget(session_id)
+    session_data = await session_cache.get(session_id)
+
+    # Logging out also kills the refresh token family bound to the session
+    if session_data != None and session_data.get("family_id") != None:
+        await revoke_family(session_data["family_id"])
+    else:
+        await session_cache.revoke(session_id)
 
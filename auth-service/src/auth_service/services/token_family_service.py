@@ -0,0 +1,101 @@
+from globals import JWT_REFRESH_EXPIRATION_TIME_MINUTES, SESSION_REVOCATION_CHANNEL
+from config.redis_conf import redis_client, session_cache
+from log.loggers import TOKEN_FAMILY_SERVICE_LOGGER
+from log.wrappers import log_entrance_debug
+from exceptions import UnauthorizedException
+import uuid
+
+#
+# Refresh tokens are rotated inside a family. A family is one redis hash
+# (current seq and the session bound to it), so redis memory per login stays
+# constant no matter how many times the token is refreshed.
+#
+
+FAMILY_EXPIRATION_TIME = JWT_REFRESH_EXPIRATION_TIME_MINUTES * 60
+
+#
+# KEYS[1] family key; ARGV[1] presented seq, ARGV[2] family ttl, ARGV[3] revocation channel
+# Returns {seq + 1, session_id, session_exists} on success, {0} for unknown family
+# and {-1} on reuse, in which case the family and its session are already revoked
+#
+__ADVANCE_FAMILY_SCRIPT = redis_client.register_script("""
+local stored = redis.call('HMGET', KEYS[1], 'seq', 'session_id')
+if not stored[1] then
+    return {0}
+end
+
+if tonumber(stored[1]) ~= tonumber(ARGV[1]) then
+    redis.call('DEL', KEYS[1], stored[2])
+    redis.call('PUBLISH', ARGV[3], stored[2])
+    return {-1}
+end
+
+local seq = redis.call('HINCRBY', KEYS[1], 'seq', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return {seq, stored[2], redis.call('EXISTS', stored[2])}
+""")
+
+#
+# KEYS[1] family key; ARGV[1] revocation channel
+#
+__REVOKE_FAMILY_SCRIPT = redis_client.register_script("""
+local session_id = redis.call('HGET', KEYS[1], 'session_id')
+redis.call('DEL', KEYS[1])
+if session_id then
+    redis.call('DEL', session_id)
+    redis.call('PUBLISH', ARGV[1], session_id)
+end
+return session_id
+""")
+
+
+def family_key(family_id: str) -> str:
+    return f"refresh_family:{family_id}"
+
+
+def new_family_id() -> str:
+    return str(uuid.uuid4())
+
+
+@log_entrance_debug(TOKEN_FAMILY_SERVICE_LOGGER)
+async def create_family(family_id: str, session_id: str):
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(family_key(family_id), mapping={"seq": 0, "session_id": session_id})
+        pipe.expire(family_key(family_id), FAMILY_EXPIRATION_TIME)
+        await pipe.execute()
+
+
+#
+# Returns next seq, session_id and whether that session is still alive
+#
+@log_entrance_debug(TOKEN_FAMILY_SERVICE_LOGGER, log_result=False)
+async def advance_family(family_id: str, seq: int) -> tuple[int, str, bool]:
+    result = await __ADVANCE_FAMILY_SCRIPT(
+        keys=[family_key(family_id)],
+        args=[seq, FAMILY_EXPIRATION_TIME, SESSION_REVOCATION_CHANNEL]
+    )
+
+    if result[0] == 0:
+        raise UnauthorizedException("Refresh token is revoked or expired")
+
+    if result[0] == -1:
+        TOKEN_FAMILY_SERVICE_LOGGER.warning(f"Refresh token reuse detected, family is revoked | family {family_id}")
+        raise UnauthorizedException("Refresh token reuse detected")
+
+    return (result[0], result[1].decode(), result[2] == 1)
+
+
+@log_entrance_debug(TOKEN_FAMILY_SERVICE_LOGGER)
+async def rebind_family(family_id: str, session_id: str):
+    await redis_client.hset(family_key(family_id), "session_id", session_id)
+
+
+@log_entrance_debug(TOKEN_FAMILY_SERVICE_LOGGER)
+async def revoke_family(family_id: str):
+    session_id = await __REVOKE_FAMILY_SCRIPT(
+        keys=[family_key(family_id)],
+        args=[SESSION_REVOCATION_CHANNEL]
+    )
+
+    if session_id != None:
+        session_cache.evict(session_id.decode())
@@ -1,8 +1,9 @@
 from globals import JWT_ACCESS_EXPIRATION_TIME_MINUTES, JWT_REFRESH_EXPIRATION_TIME_MINUTES
-from exceptions import ConflictException, BadRequestException, NotFoundException
+from exceptions import ConflictException, BadRequestException, NotFoundException, UnauthorizedException
 from models.dtos import UserCredsCreate, UserCredsAuth
 from log.loggers import USER_CREDS_SERVICE_LOGGER
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 from config.db_conf import AsyncSessionMaker
 from log.wrappers import log_entrance_debug
 from sqlalchemy import select, or_, and_
@@ -12,7 +13,8 @@ from passlib.hash import bcrypt
 from typing import List
 
 from .session_service import create_session
-from .jwt_token_service import create_token, validate_token, JwtPayload
+from .jwt_token_service import create_token_pair, validate_token, JwtPayload
+from .token_family_service import new_family_id, create_family, advance_family, rebind_family
 
 import datetime
 import uuid
@@ -21,7 +23,7 @@ import uuid
 #
 # Returns access token, refresh token and session_id
 #
-@log_entrance_debug(USER_CREDS_SERVICE_LOGGER)
+@log_entrance_debug(USER_CREDS_SERVICE_LOGGER, log_result=False)
 async def register(user_dto: UserCredsCreate) -> tuple[str, str, str]:
     async with AsyncSessionMaker() as session:
         session: AsyncSession
@@ -55,27 +57,19 @@ async def register(user_dto: UserCredsCreate) -> tuple[str, str, str]:
 
         session.add(new_user)
 
-        session_id: str = await create_session(
+        access_token, refresh_token, session_id = await __start_token_family(
             user_id=new_user.id,
             username=new_user.username,
             role="USER"
         )
-        access_token: str = await create_token(
-            user_id=new_user.id,
-            username=new_user.username,
-            role="USER",
-            exp_time=JWT_ACCESS_EXPIRATION_TIME_MINUTES
-        ) 
-        refresh_token: str = await create_token(
-            user_id=new_user.id,
-            username=new_user.username,
-            role="USER",
-            exp_time=JWT_REFRESH_EXPIRATION_TIME_MINUTES
-        )
 
         USER_CREDS_SERVICE_LOGGER.info(f"User was successfilly added | user id {new_user.id}")
 
-        await session.commit()
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Taken by a concurrent registration or import after the check above
+            raise ConflictException("Those name or email have already taken.")
         await session.refresh(new_user)
 
         return (access_token, refresh_token, session_id)
@@ -84,7 +78,7 @@ async def register(user_dto: UserCredsCreate) -> tuple[str, str, str]:
 #
 # Returns access token, refresh token and session_id
 #
-@log_entrance_debug(USER_CREDS_SERVICE_LOGGER)
+@log_entrance_debug(USER_CREDS_SERVICE_LOGGER, log_result=False)
 async def auth(user_dto: UserCredsAuth) -> tuple[str, str, str]:
     if user_dto.username == None and user_dto.email == None:
         raise BadRequestException("Invalid creds for authentification")
@@ -110,52 +104,84 @@ async def auth(user_dto: UserCredsAuth) -> tuple[str, str, str]:
         if bcrypt.verify(user_dto.password, user.password) == False:
             raise BadRequestException("Invalid password")
 
-        session_id: str = await create_session(
+        access_token, refresh_token, session_id = await __start_token_family(
             user_id=str(user.id),
             username=user.username,
             role=user.role.role
         )
-        access_token: str = await create_token(
-            user_id=str(user.id),
-            username=user.username,
-            role=user.role.role,
-            exp_time=JWT_ACCESS_EXPIRATION_TIME_MINUTES
-        ) 
-        refresh_token: str = await create_token(
-            user_id=str(user.id),
-            username=user.username,
-            role=user.role.role,
-            exp_time=JWT_REFRESH_EXPIRATION_TIME_MINUTES
-        )
 
         return (access_token, refresh_token, session_id)
 
 
 #
-# Returns access token, refresh token and session_id
+# Returns access token, refresh token and session_id.
+# Signing in with a token is a refresh: only refresh tokens are taken, and
+# they go through rotation, otherwise they could be replayed here. A token
+# outside any family (an access token) would start a new family and session
+# on every call.
 #
-@log_entrance_debug(USER_CREDS_SERVICE_LOGGER)
+@log_entrance_debug(USER_CREDS_SERVICE_LOGGER, log_result=False)
 async def auth_with_jwt_token(token: str) -> tuple[str, str, str]:
+    return await refresh(token)
+
+
+#
+# Returns access token, refresh token and session_id
+#
+@log_entrance_debug(USER_CREDS_SERVICE_LOGGER, log_result=False)
+async def refresh(token: str) -> tuple[str, str, str]:
     jwt_data: JwtPayload = await validate_token(token)
 
+    if jwt_data.family_id == None or jwt_data.seq == None:
+        raise UnauthorizedException("Not a refresh token")
+
+    return await __rotate_token_family(jwt_data)
+
+
+async def __start_token_family(user_id: str, username: str, role: str) -> tuple[str, str, str]:
+    family_id = new_family_id()
+
     session_id: str = await create_session(
-        user_id=jwt_data.user_id,
-        username=jwt_data.username,
-        role=jwt_data.role
+        user_id=user_id,
+        username=username,
+        role=role,
+        family_id=family_id
     )
-    access_token: str = await create_token(
-        user_id=jwt_data.user_id,
-        username=jwt_data.username,
-        role=jwt_data.role,
-        exp_time=JWT_ACCESS_EXPIRATION_TIME_MINUTES
-    ) 
-    refresh_token: str = await create_token(
+    await create_family(family_id, session_id)
+
+    access_token, refresh_token = await create_token_pair(
+        user_id=user_id,
+        username=username,
+        role=role,
+        access_exp_time=JWT_ACCESS_EXPIRATION_TIME_MINUTES,
+        refresh_exp_time=JWT_REFRESH_EXPIRATION_TIME_MINUTES,
+        family_id=family_id
+    )
+
+    return (access_token, refresh_token, session_id)
+
+
+async def __rotate_token_family(jwt_data: JwtPayload) -> tuple[str, str, str]:
+    seq, session_id, session_alive = await advance_family(jwt_data.family_id, jwt_data.seq)
+
+    # Session outlived by its refresh token, bind a fresh one to the same family
+    if not session_alive:
+        session_id = await create_session(
+            user_id=jwt_data.user_id,
+            username=jwt_data.username,
+            role=jwt_data.role,
+            family_id=jwt_data.family_id
+        )
+        await rebind_family(jwt_data.family_id, session_id)
+
+    access_token, refresh_token = await create_token_pair(
         user_id=jwt_data.user_id,
         username=jwt_data.username,
         role=jwt_data.role,
-        exp_time=JWT_REFRESH_EXPIRATION_TIME_MINUTES
+        access_exp_time=JWT_ACCESS_EXPIRATION_TIME_MINUTES,
+        refresh_exp_time=JWT_REFRESH_EXPIRATION_TIME_MINUTES,
+        family_id=jwt_data.family_id,
+        seq=seq
     )
 
     return (access_token, refresh_token, session_id)
-
-
@@ -0,0 +1,347 @@
+from globals import (
+    USER_IMPORT_BATCH_SIZE, USER_IMPORT_HASH_WORKERS, USER_IMPORT_HASH_CHUNK_SIZE, USER_IMPORT_MAX_REPORTED_REJECTS,
+    USER_IMPORT_STATEMENT_TIMEOUT_MS
+)
+from typing import AsyncIterator, Iterator, TYPE_CHECKING
+from log.loggers import USER_IMPORT_SERVICE_LOGGER
+from .password_hashing import hash_passwords
+from exceptions import BadRequestException
+from models.dtos import UserImportRow
+from pydantic import ValidationError
+from config.db_conf import engine
+from collections import deque
+import datetime
+import asyncio
+import orjson
+import uuid
+import time
+import csv
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+#
+# Bulk import of users migrated from other platforms.
+# The upload is parsed as it streams in, passwords are hashed in a process
+# pool (or taken as is when already bcrypt hashed), and every batch is
+# COPYed into a temporary staging table and merged into users_credits with
+# one INSERT ... SELECT. A batch is one transaction, an interrupted import
+# can be sent again: already imported rows are rejected as taken.
+#
+# The staging table is not part of the migrations on purpose: a TEMP table
+# belongs to the connection, imports running at once (on any replica) never
+# see each other's rows and nothing is left behind by a crashed one.
+#
+
+STAGING_TABLE = "users_import_staging"
+STAGING_COLUMNS = ["line", "id", "username", "password", "email", "created_at", "role_id"]
+
+CREATE_STAGING_TABLE = f"""
+CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+    line bigint NOT NULL,
+    id uuid NOT NULL,
+    username varchar NOT NULL,
+    password varchar NOT NULL,
+    email varchar NOT NULL,
+    created_at date NOT NULL,
+    role_id integer NOT NULL
+) ON COMMIT DELETE ROWS
+"""
+
+# Returns lines of the staged rows that were not inserted. Taken usernames and
+# emails, also those taken by a concurrent import or registration, are left
+# out by their unique indexes.
+MERGE_STAGING_TABLE = f"""
+WITH inserted AS (
+    INSERT INTO users_credits (id, username, password, email, created_at, role_id)
+    SELECT s.id, s.username, s.password, s.email, s.created_at, s.role_id
+    FROM {STAGING_TABLE} s
+    ON CONFLICT DO NOTHING
+    RETURNING id
+)
+SELECT s.line FROM {STAGING_TABLE} s
+WHERE s.id NOT IN (SELECT id FROM inserted)
+ORDER BY s.line
+"""
+
+FINISHED_IMPORTS_KEPT = 20
+
+__HASH_POOL: "ProcessPoolExecutor | None" = None
+
+
+class UserImport:
+    def __init__(self, import_id: str):
+        self.import_id = import_id
+        self.state = "running"
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+
+        self.processed = 0
+        self.imported = 0
+        self.rejected = 0
+        self.hashed = 0
+        self.rejects: list[dict] = []
+
+    def reject(self, line: int, error: str):
+        self.rejected += 1
+        if len(self.rejects) < USER_IMPORT_MAX_REPORTED_REJECTS:
+            self.rejects.append({"line": line, "error": error})
+
+    def report(self) -> dict:
+        finished_at = self.finished_at if self.finished_at is not None else time.time()
+        elapsed = finished_at - self.started_at
+
+        return {
+            "import_id": self.import_id,
+            "state": self.state,
+            "processed": self.processed,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "hashed": self.hashed,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.processed / elapsed, 1) if elapsed > 0 else 0.0,
+            "rejects": self.rejects
+        }
+
+
+__IMPORTS: dict[str, UserImport] = {}
+__FINISHED_IMPORTS: deque[str] = deque()
+
+
+def get_import(import_id: str) -> UserImport | None:
+    return __IMPORTS.get(import_id)
+
+
+def shutdown_hash_pool():
+    global __HASH_POOL
+
+    if __HASH_POOL is not None:
+        __HASH_POOL.shutdown(cancel_futures=True)
+        __HASH_POOL = None
+
+
+def __hash_pool() -> "ProcessPoolExecutor":
+    global __HASH_POOL
+
+    if __HASH_POOL is None:
+        # multiprocessing is only imported by processes that actually run an import
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+
+        # Forking the server itself would copy the locks held by its logging and
+        # tracing threads into the workers. They are forked from a fresh fork
+        # server process instead, which has no threads of its own.
+        context = multiprocessing.get_context("forkserver")
+        __HASH_POOL = ProcessPoolExecutor(max_workers=USER_IMPORT_HASH_WORKERS, mp_context=context)
+    return __HASH_POOL
+
+
+async def __iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, str]]:
+    line_number = 0
+    tail = b""
+
+    async for chunk in stream:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+
+        for line in lines:
+            line_number += 1
+            yield (line_number, line.decode("utf-8", errors="replace").rstrip("\r"))
+
+    if tail.strip() != b"":
+        yield (line_number + 1, tail.decode("utf-8", errors="replace").rstrip("\r"))
+
+
+#
+# Yields (line, fields) for every data line, the CSV header is required and
+# must name username, email and password or password_hash.
+# Quoted fields spanning several lines are not supported.
+#
+async def __iter_records(stream: AsyncIterator[bytes], format: str) -> AsyncIterator[tuple[int, dict | str]]:
+    header: list[str] | None = None
+
+    async for line_number, line in __iter_lines(stream):
+        if line.strip() == "":
+            continue
+
+        if format == "ndjson":
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError as ex:
+                yield (line_number, f"Invalid JSON: {ex}")
+                continue
+
+            yield (line_number, record if isinstance(record, dict) else "Line is not a JSON object")
+            continue
+
+        fields = next(csv.reader([line]))
+        if header is None:
+            header = [field.strip() for field in fields]
+            if "username" not in header or "email" not in header:
+                raise BadRequestException("CSV header must contain username and email")
+            continue
+
+        if len(fields) != len(header):
+            yield (line_number, f"Expected {len(header)} fields, got {len(fields)}")
+            continue
+
+        yield (line_number, {name: value for name, value in zip(header, fields) if value != ""})
+
+
+async def __iter_batches(stream: AsyncIterator[bytes], format: str, user_import: UserImport) -> AsyncIterator[list]:
+    batch: list[tuple[int, UserImportRow]] = []
+    # Duplicates inside the upload are reported as such, not as taken
+    usernames: set[str] = set()
+    emails: set[str] = set()
+
+    async for line_number, record in __iter_records(stream, format):
+        user_import.processed += 1
+
+        if isinstance(record, str):
+            user_import.reject(line_number, record)
+            continue
+
+        try:
+            row = UserImportRow.model_validate(record)
+        except ValidationError as ex:
+            user_import.reject(line_number, "; ".join(
+                f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in ex.errors()
+            ))
+            continue
+
+        if (row.password is None) == (row.password_hash is None):
+            user_import.reject(line_number, "Exactly one of password and password_hash is required")
+            continue
+
+        if row.username in usernames or row.email in emails:
+            user_import.reject(line_number, "Duplicate username or email in the upload")
+            continue
+
+        usernames.add(row.username)
+        emails.add(row.email)
+        batch.append((line_number, row))
+
+        if len(batch) == USER_IMPORT_BATCH_SIZE:
+            yield batch
+            batch, usernames, emails = [], set(), set()
+
+    if len(batch) != 0:
+        yield batch
+
+
+def __chunks(items: list, size: int) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+#
+# Turns a batch into staging records, hashing plain passwords in the process pool
+#
+async def __prepare_batch(batch: list[tuple[int, UserImportRow]], user_import: UserImport) -> list[tuple]:
+    loop = asyncio.get_running_loop()
+
+    plain = [row.password for _, row in batch if row.password_hash is None]
+    hashes = []
+    if len(plain) != 0:
+        hashed_chunks = await asyncio.gather(*(
+            loop.run_in_executor(__hash_pool(), hash_passwords, chunk)
+            for chunk in __chunks(plain, USER_IMPORT_HASH_CHUNK_SIZE)
+        ))
+        hashes = [password_hash for chunk in hashed_chunks for password_hash in chunk]
+        user_import.hashed += len(hashes)
+
+    created_at = datetime.datetime.now(datetime.timezone.utc).date()
+    hashes_iter = iter(hashes)
+
+    return [
+        (
+            line_number,
+            uuid.uuid4(),
+            row.username,
+            row.password_hash if row.password_hash is not None else next(hashes_iter),
+            row.email,
+            created_at,
+            0
+        )
+        for line_number, row in batch
+    ]
+
+
+async def __load_batch(conn, records: list[tuple], user_import: UserImport):
+    async with conn.transaction():
+        # A whole batch is one statement, the service wide timeout is meant for single requests
+        await conn.execute(f"SET LOCAL statement_timeout = {USER_IMPORT_STATEMENT_TIMEOUT_MS}")
+        await conn.copy_records_to_table(STAGING_TABLE, records=records, columns=STAGING_COLUMNS)
+        not_inserted = await conn.fetch(MERGE_STAGING_TABLE)
+
+    for row in not_inserted:
+        user_import.reject(row["line"], "Username or email is already taken")
+
+    user_import.imported += len(records) - len(not_inserted)
+
+
+def __finish(user_import: UserImport, state: str):
+    user_import.state = state
+    user_import.finished_at = time.time()
+
+    __FINISHED_IMPORTS.append(user_import.import_id)
+    while len(__FINISHED_IMPORTS) > FINISHED_IMPORTS_KEPT:
+        __IMPORTS.pop(__FINISHED_IMPORTS.popleft(), None)
+
+
+#
+# Hashing of the next batch overlaps with COPY and merge of the previous one
+#
+async def import_users(stream: AsyncIterator[bytes], format: str, import_id: str | None = None) -> UserImport:
+    if format not in ("csv", "ndjson"):
+        raise BadRequestException("Import format must be csv or ndjson")
+
+    user_import = UserImport(import_id if import_id is not None else str(uuid.uuid4()))
+    if user_import.import_id in __IMPORTS and __IMPORTS[user_import.import_id].state == "running":
+        raise BadRequestException("Import with this id is already running")
+    __IMPORTS[user_import.import_id] = user_import
+
+    USER_IMPORT_SERVICE_LOGGER.info(f"User import started | import {user_import.import_id} ; format {format}")
+
+    try:
+        async with engine.connect() as sa_conn:
+            conn = (await sa_conn.get_raw_connection()).driver_connection
+            await conn.execute(CREATE_STAGING_TABLE)
+
+            pending: asyncio.Task | None = None
+            prepared: asyncio.Task | None = None
+            try:
+                async for batch in __iter_batches(stream, format, user_import):
+                    prepared = asyncio.create_task(__prepare_batch(batch, user_import))
+
+                    if pending is not None:
+                        await __load_batch(conn, await pending, user_import)
+                        USER_IMPORT_SERVICE_LOGGER.info(
+                            f"User import progress | import {user_import.import_id} ; "
+                            f"processed {user_import.processed} ; imported {user_import.imported} ; "
+                            f"rejected {user_import.rejected}"
+                        )
+                    pending = prepared
+
+                if pending is not None:
+                    await __load_batch(conn, await pending, user_import)
+            except BaseException:
+                # The batch being hashed is not loaded either
+                for task in (pending, prepared):
+                    if task is not None:
+                        task.cancel()
+                raise
+            finally:
+                await conn.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+    except BaseException as ex:
+        __finish(user_import, "failed")
+        USER_IMPORT_SERVICE_LOGGER.error(f"User import failed | import {user_import.import_id} ; {ex}")
+        raise
+
+    __finish(user_import, "done")
+    USER_IMPORT_SERVICE_LOGGER.info(
+        f"User import done | import {user_import.import_id} ; processed {user_import.processed} ; "
+        f"imported {user_import.imported} ; rejected {user_import.rejected}"
+    )
+
+    return user_import
@@ -0,0 +1,145 @@
+#
+# Cold start profile of the service:
+#   import  - cost of importing main (python -X importtime) in fresh
+#             interpreters, median of RUNS, with the most expensive modules
+#             and top level packages of the slowest run
+#   first request - from process spawn until /healthz answers through uvicorn
+# Both are checked against benchmarks/startup_budget.json and the exit code
+# is 1 when a budget is exceeded, so the numbers can gate a build.
+#
+# Run from the service root (redis and postgres from docker-compose should be
+# up, otherwise warm up time is measured against connection errors):
+#   poetry run python benchmarks/startup_bench.py [--runs 5] [--top 15] [--no-server]
+#
+import urllib.request
+import urllib.error
+import subprocess
+import statistics
+import argparse
+import tempfile
+import pathlib
+import socket
+import json
+import time
+import sys
+import os
+
+BENCHMARKS_DIR = pathlib.Path(__file__).resolve().parent
+SRC_DIR = next(path for path in (BENCHMARKS_DIR.parent / "src").iterdir() if (path / "main.py").exists())
+BUDGET_FILE = BENCHMARKS_DIR / "startup_budget.json"
+
+FIRST_REQUEST_TIMEOUT_SECONDS = 60
+
+ENV = {
+    "LOAD_DOTENV": "false",
+    "TRACING_EXPORTER": "none",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "JWT_ACCESS_EXPIRATION_TIME_MINUTES": "15",
+    "JWT_REFRESH_EXPIRATION_TIME_DAYS": "30",
+    "SESSION_EXPIRATION_TIME": "3600",
+    **os.environ,
+    # Processes run in a scratch directory, main is found through the path
+    # and logs/ (and any other relative directory) is not written to src
+    "PYTHONPATH": str(SRC_DIR)
+}
+
+
+#
+# Returns total microseconds and {module: (self us, cumulative us)}
+#
+def import_profile() -> tuple[int, dict[str, tuple[int, int]]]:
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=cwd, env=ENV, capture_output=True, text=True
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+
+    return (modules["main"][1], modules)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_request_ms() -> float:
+    port = free_port()
+    cwd = tempfile.TemporaryDirectory()
+    started_at = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-c",
+            f"import main, uvicorn; uvicorn.run(main.app, host='127.0.0.1', port={port}, log_config=None)"
+        ],
+        cwd=cwd.name, env=ENV, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    try:
+        while time.perf_counter() - started_at < FIRST_REQUEST_TIMEOUT_SECONDS:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started_at) * 1000
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise RuntimeError("Server did not answer in time")
+    finally:
+        server.terminate()
+        server.wait()
+        cwd.cleanup()
+
+
+def top_level_costs(modules: dict[str, tuple[int, int]]) -> dict[str, int]:
+    costs: dict[str, int] = {}
+    for name, (self_us, _) in modules.items():
+        package = name.split(".")[0]
+        costs[package] = costs.get(package, 0) + self_us
+    return costs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--no-server", action="store_true")
+    args = parser.parse_args()
+
+    budget = json.loads(BUDGET_FILE.read_text())
+    profiles = [import_profile() for _ in range(args.runs)]
+    import_ms = statistics.median(total for total, _ in profiles) / 1000
+    _, slowest = max(profiles, key=lambda profile: profile[0])
+
+    print(f"{SRC_DIR.name}: import main {import_ms:.0f} ms (median of {args.runs})")
+    print(f"\ntop {args.top} modules by self time:")
+    for name, (self_us, cumulative_us) in sorted(slowest.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {self_us / 1000:>7.1f} ms self {cumulative_us / 1000:>7.1f} ms cumulative  {name}")
+    print(f"\ntop {args.top} packages:")
+    for package, self_us in sorted(top_level_costs(slowest).items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {self_us / 1000:>7.1f} ms  {package}")
+
+    failures = []
+    if import_ms > budget["import_ms"]:
+        failures.append(f"import {import_ms:.0f} ms > budget {budget['import_ms']} ms")
+
+    if not args.no_server:
+        ttfr_ms = statistics.median(first_request_ms() for _ in range(max(1, args.runs // 2)))
+        print(f"\ntime to first request {ttfr_ms:.0f} ms")
+        if ttfr_ms > budget["first_request_ms"]:
+            failures.append(f"first request {ttfr_ms:.0f} ms > budget {budget['first_request_ms']} ms")
+
+    if len(failures) != 0:
+        print("\nSTARTUP BUDGET EXCEEDED: " + "; ".join(failures))
+        sys.exit(1)
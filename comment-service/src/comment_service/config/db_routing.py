@@ -0,0 +1,197 @@
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy import Insert, Update, Delete, Engine, text
+from sqlalchemy.exc import SQLAlchemyError
+from log.loggers import APP_LOGGER
+from contextvars import ContextVar
+from sqlalchemy.orm import Session
+import asyncio
+import time
+
+#
+# Monotonic time of the last write made in the current request context.
+# Every request runs in its own context, so read-your-writes is per request.
+#
+LAST_WRITE_AT: ContextVar[float | None] = ContextVar("LAST_WRITE_AT", default=None)
+
+#
+# Time since the last replayed transaction is only lag while WAL is still
+# waiting to be replayed: on a quiet primary it grows with nothing to catch up
+# on, so a replica that replayed everything it received has no lag. That only
+# holds while the WAL receiver streams, a replica cut off from the primary has
+# replayed all it received too. NULL (not streaming, or never replayed
+# anything) means unhealthy. Without pg_read_all_stats the receiver status
+# reads NULL, then a running receiver counts as streaming.
+#
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN NOT EXISTS ("
+    "SELECT 1 FROM pg_stat_wal_receiver WHERE COALESCE(status, 'streaming') = 'streaming'"
+    ") THEN NULL "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) "
+    "END"
+)
+
+
+#
+# Primary plus read replicas. Replicas are periodically checked for
+# replication lag, a lagging or unreachable replica is taken out of
+# rotation until it catches up. With no healthy replica reads go to primary.
+#
+class ReplicaSet:
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: list[AsyncEngine],
+        max_lag: float,
+        check_interval: float,
+        check_timeout: float,
+        read_your_writes_window: float
+    ):
+        self.primary = primary
+        self.__replicas = replicas
+        self.__max_lag = max_lag
+        self.__check_interval = check_interval
+        self.__check_timeout = check_timeout
+        self.__read_your_writes_window = read_your_writes_window
+
+        # Replicas stay out of rotation until the first successful lag check
+        self.__healthy: list[AsyncEngine] = []
+        self.__lags: dict[str, float | None] = {str(replica.url.host): None for replica in replicas}
+        self.__next = 0
+        self.__checker: asyncio.Task | None = None
+
+        self.__primary_reads = 0
+        self.__replica_reads = 0
+        self.__writes = 0
+
+    def mark_write(self):
+        self.__writes += 1
+        LAST_WRITE_AT.set(time.monotonic())
+
+    #
+    # pinned is the replica this session already reads from, it is kept while
+    # healthy so one transaction never spans two replicas
+    #
+    def read_bind(self, pinned: Engine | None = None) -> Engine:
+        last_write_at = LAST_WRITE_AT.get()
+        recently_wrote = last_write_at is not None and time.monotonic() - last_write_at < self.__read_your_writes_window
+
+        if recently_wrote or len(self.__healthy) == 0:
+            self.__primary_reads += 1
+            return self.primary.sync_engine
+
+        self.__replica_reads += 1
+
+        if pinned is not None and any(replica.sync_engine is pinned for replica in self.__healthy):
+            return pinned
+
+        self.__next = (self.__next + 1) % len(self.__healthy)
+        return self.__healthy[self.__next].sync_engine
+
+    def primary_read(self) -> Engine:
+        self.__primary_reads += 1
+        return self.primary.sync_engine
+
+    def stats(self) -> dict:
+        reads = self.__primary_reads + self.__replica_reads
+
+        return {
+            "replicas": len(self.__replicas),
+            "healthy_replicas": len(self.__healthy),
+            "replica_lag_seconds": dict(self.__lags),
+            "writes": self.__writes,
+            "primary_reads": self.__primary_reads,
+            "replica_reads": self.__replica_reads,
+            "replica_read_share": self.__replica_reads / reads if reads != 0 else 0.0
+        }
+
+    #
+    # Replicas are checked concurrently, each within check_timeout, so one
+    # that does not answer neither holds up the others nor stays in rotation
+    #
+    async def check(self):
+        await asyncio.gather(*(self.__check_replica(replica) for replica in self.__replicas))
+
+    async def __check_replica(self, replica: AsyncEngine):
+        host = str(replica.url.host)
+
+        try:
+            lag = await asyncio.wait_for(self.__replica_lag(replica), self.__check_timeout)
+        except asyncio.TimeoutError:
+            self.__drop(replica, None)
+            APP_LOGGER.warning(f"Replica {host} did not answer in {self.__check_timeout:.2f}s")
+            return
+        except (SQLAlchemyError, OSError) as ex:
+            self.__drop(replica, None)
+            APP_LOGGER.warning(f"Replica {host} is unreachable | {ex}")
+            return
+
+        if lag is None:
+            self.__drop(replica, None)
+            APP_LOGGER.warning(f"Replica {host} is not streaming from the primary")
+        elif lag > self.__max_lag:
+            self.__drop(replica, lag)
+            APP_LOGGER.warning(f"Replica {host} lags {lag:.2f}s, reads fall back to other nodes")
+        else:
+            self.__lags[host] = lag
+            # Rebuilt in configuration order rather than appended to, rotation stays stable
+            self.__healthy = [node for node in self.__replicas if node is replica or node in self.__healthy]
+
+    def __drop(self, replica: AsyncEngine, lag: float | None):
+        self.__lags[str(replica.url.host)] = lag
+        self.__healthy = [node for node in self.__healthy if node is not replica]
+
+    @staticmethod
+    async def __replica_lag(replica: AsyncEngine) -> float | None:
+        async with replica.connect() as conn:
+            lag = (await conn.execute(REPLICA_LAG_QUERY)).scalar()
+
+        return float(lag) if lag is not None else None
+
+    async def start(self):
+        if len(self.__replicas) != 0 and self.__checker is None:
+            await self.check()
+            self.__checker = asyncio.create_task(self.__run())
+
+    async def stop(self):
+        if self.__checker is None:
+            return
+
+        self.__checker.cancel()
+        try:
+            await self.__checker
+        except asyncio.CancelledError:
+            pass
+
+        self.__checker = None
+        for replica in self.__replicas:
+            await replica.dispose()
+
+    async def __run(self):
+        while True:
+            await asyncio.sleep(self.__check_interval)
+            await self.check()
+
+
+#
+# Sessions opened with info={"read_only": True} send their queries to a replica,
+# everything else (and anything flushed or DML) goes to the primary.
+# Subclasses set replica_set.
+#
+class RoutingSession(Session):
+    replica_set: ReplicaSet = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.replica_set.mark_write()
+            return self.replica_set.primary.sync_engine
+
+        if self.info.get("read_only", False):
+            read_bind = self.replica_set.read_bind(self.info.get("pinned_replica"))
+            if read_bind is not self.replica_set.primary.sync_engine:
+                self.info["pinned_replica"] = read_bind
+            return read_bind
+
+        return self.replica_set.primary_read()
@@ -1,4 +1,24 @@
-from redis.asyncio import Redis
-from globals import REDIS_HOST, REDIS_PORT
+from globals import REDIS_HOST, REDIS_PORT, REDIS_WARM_UP_CONNECTIONS, WARM_UP_TIMEOUT_SECONDS
+from config.redis_tracing import TracedRedis
+from log.loggers import APP_LOGGER
+import asyncio
 
-redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT)
+redis_client = TracedRedis(host=REDIS_HOST, port=REDIS_PORT)
+
+
+async def ping_redis():
+    await redis_client.ping()
+
+
+#
+# Opens the configured number of pool connections up front
+#
+async def warm_up_redis():
+    results = await asyncio.gather(
+        *(asyncio.wait_for(ping_redis(), WARM_UP_TIMEOUT_SECONDS) for _ in range(REDIS_WARM_UP_CONNECTIONS)),
+        return_exceptions=True
+    )
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    if len(errors) != 0:
+        APP_LOGGER.warning(f"Redis pool warm up failed for {len(errors)}/{REDIS_WARM_UP_CONNECTIONS} connections | {errors[0]!r}")
@@ -1,22 +1,71 @@
-from dotenv import load_dotenv
 import logging
 import os
 
-load_dotenv()
+# .env is a local development convenience, containers get their environment
+# from compose and skip importing python-dotenv
+if os.environ.get("LOAD_DOTENV", "true").lower() == "true":
+    from dotenv import load_dotenv
+    load_dotenv()
 
 #
 # SERVER VARS
 #
 PORT = 8082
 HOST = "localhost"
+SERVICE_NAME = "comment-service"
+
+# Not counted as in-flight requests, they are answered while draining too
+HEALTH_PATHS = ("/healthz", "/readyz", "/metrics")
+READINESS_CHECK_TIMEOUT_SECONDS = float(os.environ.get("READINESS_CHECK_TIMEOUT_SECONDS", 1))
+# In-flight requests are given this long to finish on shutdown
+SHUTDOWN_DRAIN_TIMEOUT_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_TIMEOUT_SECONDS", 20))
+# After SIGTERM the service reports not ready but keeps serving this long,
+# so load balancers polling /readyz stop sending it traffic first
+SHUTDOWN_READINESS_DELAY_SECONDS = float(os.environ.get("SHUTDOWN_READINESS_DELAY_SECONDS", 5))
+# Unreachable dependencies must not hold the start up
+WARM_UP_TIMEOUT_SECONDS = float(os.environ.get("WARM_UP_TIMEOUT_SECONDS", 2))
 
 
 #
 # LOGGING VARS
 #
-LOGS_LEVEL = logging.DEBUG
+LOGS_LEVEL = logging.getLevelName(os.environ.get("LOGS_LEVEL", "INFO").upper())
 LOGS_FILENAME = "logs/{date}.log" 
-LOGS_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOGS_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s"
+# "json" or "text" (LOGS_FORMAT)
+LOGS_FORMAT_TYPE = os.environ.get("LOGS_FORMAT_TYPE", "json")
+LOGS_QUEUE_SIZE = int(os.environ.get("LOGS_QUEUE_SIZE", 10000))
+# "LOGGER NAME=rate,OTHER LOGGER=rate", rate is the share of records kept
+LOGS_SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, rate in (
+        item.rsplit("=", 1) for item in os.environ.get("LOGS_SAMPLE_RATES", "").split(",") if item.strip() != ""
+    )
+}
+# "/path/prefix=LEVEL,...", records below LEVEL are dropped while serving that route
+LOGS_ROUTE_LEVELS = {
+    prefix.strip(): logging.getLevelName(level.strip().upper())
+    for prefix, level in (
+        item.rsplit("=", 1) for item in os.environ.get("LOGS_ROUTE_LEVELS", "").split(",") if item.strip() != ""
+    )
+}
+# Expected (4xx) errors are reported once per exception class per interval
+ERROR_LOG_INTERVAL_SECONDS = float(os.environ.get("ERROR_LOG_INTERVAL_SECONDS", 10))
+ERROR_RESPONSE_CACHE_SIZE = int(os.environ.get("ERROR_RESPONSE_CACHE_SIZE", 1024))
+
+
+#
+# TRACING
+#
+# "file", "otlp" or "none"
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "file")
+# Share of new traces recorded, services follow the decision sent in traceparent
+TRACING_SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", 0.05))
+TRACING_FILENAME = "traces/{date}.jsonl"
+TRACING_OTLP_ENDPOINT = os.environ.get("TRACING_OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+TRACING_QUEUE_SIZE = int(os.environ.get("TRACING_QUEUE_SIZE", 10000))
+TRACING_BATCH_SIZE = int(os.environ.get("TRACING_BATCH_SIZE", 512))
+TRACING_EXPORT_INTERVAL_MS = int(os.environ.get("TRACING_EXPORT_INTERVAL_MS", 1000))
 
 
 #
@@ -28,12 +77,28 @@ DB_NAME = os.environ.get("DB_NAME")
 DB_HOST = os.environ.get("DB_HOST")
 DB_URL = os.environ.get("DB_URL")
 
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 5))
+DB_POOL_TIMEOUT_SECONDS = float(os.environ.get("DB_POOL_TIMEOUT_SECONDS", 5))
+DB_POOL_RECYCLE_SECONDS = int(os.environ.get("DB_POOL_RECYCLE_SECONDS", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_WARM_UP_CONNECTIONS = int(os.environ.get("DB_POOL_WARM_UP_CONNECTIONS", 2))
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 100))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 5000))
+
+DB_REPLICA_HOSTS = [host for host in os.environ.get("DB_REPLICA_HOSTS", "").split(",") if host != ""]
+DB_REPLICA_MAX_LAG_SECONDS = float(os.environ.get("DB_REPLICA_MAX_LAG_SECONDS", 1))
+DB_REPLICA_CHECK_INTERVAL_SECONDS = float(os.environ.get("DB_REPLICA_CHECK_INTERVAL_SECONDS", 2))
+DB_REPLICA_CHECK_TIMEOUT_SECONDS = float(os.environ.get("DB_REPLICA_CHECK_TIMEOUT_SECONDS", 3))
+DB_READ_YOUR_WRITES_SECONDS = float(os.environ.get("DB_READ_YOUR_WRITES_SECONDS", 5))
+
 
 #
 # REDIS
 #
 REDIS_HOST = os.environ.get("REDIS_HOST")
 REDIS_PORT = int(os.environ.get("REDIS_PORT"))
+REDIS_WARM_UP_CONNECTIONS = int(os.environ.get("REDIS_WARM_UP_CONNECTIONS", 2))
 
 
 #
@@ -0,0 +1,91 @@
+from globals import JWKS_URL, JWKS_REFRESH_INTERVAL_SECONDS, JWKS_MIN_REFRESH_INTERVAL_SECONDS
+from services.jwt_codec import EdDsaJwtCodec, jwk_to_public_key
+from log.loggers import JWT_SERVICE_LOGGER
+from jwt import InvalidKeyError
+import aiohttp
+import asyncio
+import time
+
+
+#
+# Keeps the auth-service JWKS in memory and refreshes it in the background,
+# so tokens are verified locally. A token with an unknown kid triggers an
+# early refresh (rate limited), so key rotation needs no restart.
+#
+class JwksClient:
+    def __init__(self, url: str, refresh_interval: float, min_refresh_interval: float):
+        self.__url = url
+        self.__refresh_interval = refresh_interval
+        self.__min_refresh_interval = min_refresh_interval
+
+        self.__codec = EdDsaJwtCodec()
+        self.__last_refresh = 0.0
+        self.__refresh_lock = asyncio.Lock()
+        self.__refresher: asyncio.Task | None = None
+
+    @property
+    def codec(self) -> EdDsaJwtCodec:
+        return self.__codec
+
+    async def refresh_for_kid(self, kid: str | None = None) -> bool:
+        async with self.__refresh_lock:
+            if kid is not None and self.__codec.has_kid(kid):
+                return True
+            if time.monotonic() - self.__last_refresh < self.__min_refresh_interval:
+                return False
+
+            await self.refresh()
+
+        return kid is None or self.__codec.has_kid(kid)
+
+    async def refresh(self):
+        self.__last_refresh = time.monotonic()
+
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(self.__url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                    response.raise_for_status()
+                    jwks = await response.json()
+
+            verifying_keys = {}
+            for jwk in jwks.get("keys", []):
+                try:
+                    verifying_keys[jwk["kid"]] = jwk_to_public_key(jwk)
+                except (InvalidKeyError, KeyError, ValueError) as ex:
+                    JWT_SERVICE_LOGGER.warning(f"Skipping JWK | {ex}")
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as ex:
+            # Keep serving with the last known key set
+            JWT_SERVICE_LOGGER.error(f"JWKS refresh failed | {ex}")
+            return
+
+        self.__codec.set_verifying_keys(verifying_keys)
+        JWT_SERVICE_LOGGER.info(f"JWKS refreshed | kids {list(verifying_keys)}")
+
+    async def start(self):
+        if self.__refresher is None:
+            await self.refresh()
+            self.__refresher = asyncio.create_task(self.__run())
+
+    async def stop(self):
+        if self.__refresher is None:
+            return
+
+        self.__refresher.cancel()
+        try:
+            await self.__refresher
+        except asyncio.CancelledError:
+            pass
+
+        self.__refresher = None
+
+    async def __run(self):
+        while True:
+            await asyncio.sleep(self.__refresh_interval)
+            await self.refresh()
+
+
+jwks_client = JwksClient(
+    url=JWKS_URL,
+    refresh_interval=JWKS_REFRESH_INTERVAL_SECONDS,
+    min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL_SECONDS
+)
@@ -0,0 +1,171 @@
+from globals import READINESS_CHECK_TIMEOUT_SECONDS
+from typing import Awaitable, Callable
+from log.loggers import APP_LOGGER
+from fastapi import FastAPI
+import threading
+import asyncio
+import signal
+import time
+
+
+#
+# Readiness and in-flight request accounting of the process.
+# The service is ready once warm up is done and stops being ready as soon
+# as SIGTERM arrives (see serve), in-flight requests are then given time
+# to finish before pools are closed. Components register their counters
+# with add_stats, they are served on /metrics while the process runs.
+#
+class Lifecycle:
+    def __init__(self, check_timeout: float):
+        self.ready = False
+        self.draining = False
+        self.in_flight = 0
+
+        self.__check_timeout = check_timeout
+        self.__checks: dict[str, Callable[[], Awaitable]] = {}
+        self.__stats: dict[str, Callable[[], dict]] = {}
+        self.__idle = asyncio.Event()
+        self.__idle.set()
+
+    def add_check(self, name: str, check: Callable[[], Awaitable]):
+        self.__checks[name] = check
+
+    async def check(self) -> dict[str, str]:
+        async def run(check: Callable[[], Awaitable]) -> str:
+            try:
+                await asyncio.wait_for(check(), self.__check_timeout)
+                return "OK"
+            except asyncio.TimeoutError:
+                return "timeout"
+            except Exception as ex:
+                return f"{type(ex).__name__}: {ex}"
+
+        results = await asyncio.gather(*(run(check) for check in self.__checks.values()))
+        return dict(zip(self.__checks.keys(), results))
+
+    def add_stats(self, name: str, stats: Callable[[], dict]):
+        self.__stats[name] = stats
+
+    def stats(self) -> dict[str, dict]:
+        return {"in_flight": self.in_flight} | {name: stats() for name, stats in self.__stats.items()}
+
+    def request_started(self):
+        self.in_flight += 1
+        self.__idle.clear()
+
+    def request_finished(self):
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self.__idle.set()
+
+    def start_draining(self):
+        self.ready = False
+        self.draining = True
+
+    #
+    # Returns the number of requests still running after timeout
+    #
+    async def drain(self, timeout: float) -> int:
+        self.start_draining()
+        started_at = time.monotonic()
+
+        try:
+            await asyncio.wait_for(self.__idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        APP_LOGGER.info(
+            f"Drained in {time.monotonic() - started_at:.2f}s | {self.in_flight} requests still in flight"
+        )
+        return self.in_flight
+
+
+lifecycle = Lifecycle(check_timeout=READINESS_CHECK_TIMEOUT_SECONDS)
+
+
+#
+# Runs the app under uvicorn. uvicorn only runs the lifespan shutdown once
+# it stopped accepting connections, too late to report draining, so SIGTERM
+# is taken over: the service stops being ready at once and keeps serving
+# for readiness_delay, then uvicorn shuts down as usual and gives in-flight
+# requests drain_timeout. Another signal shuts down without the delay.
+# An external runner needs a preStop delay instead.
+#
+def serve(app: FastAPI, host: str, port: int, readiness_delay: float, drain_timeout: float):
+    # Only needed when started as a script
+    import uvicorn
+
+    class DrainingServer(uvicorn.Server):
+        def handle_exit(self, sig, frame):
+            if sig != signal.SIGTERM or lifecycle.draining or readiness_delay <= 0:
+                return super().handle_exit(sig, frame)
+
+            lifecycle.start_draining()
+
+            def shut_down():
+                APP_LOGGER.info(f"Not ready for {readiness_delay}s, shutting down")
+                super(DrainingServer, self).handle_exit(sig, frame)
+
+            timer = threading.Timer(readiness_delay, shut_down)
+            timer.daemon = True
+            timer.start()
+
+    DrainingServer(uvicorn.Config(
+        app, host=host, port=port, log_config=None, timeout_graceful_shutdown=drain_timeout
+    )).run()
+
+
+#
+# Runs one request through the whole middleware stack in process,
+# so routing, middlewares and the response class are built before real traffic
+#
+async def self_request(app: FastAPI, path: str) -> int:
+    status = 0
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if request_sent:
+            await asyncio.Event().wait()
+        request_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app({
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 0)
+    }, receive, send)
+
+    return status
+
+
+#
+# Builds the OpenAPI schema (and with it the schemas of every request and
+# response model) and sends a self request, failures only slow down the start
+#
+async def warm_up_app(app: FastAPI):
+    started_at = time.monotonic()
+
+    try:
+        app.openapi()
+        status = await self_request(app, "/healthz")
+        if status != 200:
+            APP_LOGGER.warning(f"Warm up self request answered {status}")
+    except Exception as ex:
+        APP_LOGGER.warning(f"App warm up failed | {ex}")
+
+    APP_LOGGER.info(f"App warmed up in {(time.monotonic() - started_at) * 1000:.0f} ms")
@@ -1,4 +1,41 @@
-from redis.asyncio import Redis
-from globals import REDIS_HOST, REDIS_PORT
+from globals import REDIS_HOST, REDIS_PORT, REDIS_WARM_UP_CONNECTIONS, WARM_UP_TIMEOUT_SECONDS, SESSION_CACHE_MAX_SIZE, SESSION_CACHE_TTL_SECONDS, SESSION_REVOCATION_CHANNEL
+from globals import SESSION_EXPIRATION_TIME, SESSION_REFRESH_INTERVAL_SECONDS, SESSION_REFRESH_FLUSH_INTERVAL_MS
+from config.session_refresher import SessionRefresher
+from config.session_cache import SessionCache
+from config.redis_tracing import TracedRedis
+from log.loggers import APP_LOGGER
+import asyncio
 
-redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT)
+redis_client = TracedRedis(host=REDIS_HOST, port=REDIS_PORT)
+
+session_cache = SessionCache(
+    redis_client=redis_client,
+    max_size=SESSION_CACHE_MAX_SIZE,
+    ttl=SESSION_CACHE_TTL_SECONDS,
+    channel=SESSION_REVOCATION_CHANNEL
+)
+
+session_refresher = SessionRefresher(
+    redis_client=redis_client,
+    expiration_time=SESSION_EXPIRATION_TIME,
+    refresh_interval=SESSION_REFRESH_INTERVAL_SECONDS,
+    flush_interval=SESSION_REFRESH_FLUSH_INTERVAL_MS / 1000
+)
+
+
+async def ping_redis():
+    await redis_client.ping()
+
+
+#
+# Opens the configured number of pool connections up front
+#
+async def warm_up_redis():
+    results = await asyncio.gather(
+        *(asyncio.wait_for(ping_redis(), WARM_UP_TIMEOUT_SECONDS) for _ in range(REDIS_WARM_UP_CONNECTIONS)),
+        return_exceptions=True
+    )
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    if len(errors) != 0:
+        APP_LOGGER.warning(f"Redis pool warm up failed for {len(errors)}/{REDIS_WARM_UP_CONNECTIONS} connections | {errors[0]!r}")
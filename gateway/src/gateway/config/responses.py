@@ -0,0 +1,41 @@
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+from functools import lru_cache
+from typing import Any
+import orjson
+
+
+#
+# Default response class of the app. Output matches JSONResponse byte for byte
+# (compact separators, UTF-8 without escaping), only the encoder is orjson.
+#
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache(maxsize=256)
+def __list_adapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+#
+# Routes returning dicts or models still pay for FastAPI's jsonable_encoder pass.
+# Listing endpoints return model_response(...) instead, models are then
+# serialized by pydantic-core straight to bytes without intermediate dicts.
+#
+def model_response(
+    content: BaseModel | list[BaseModel],
+    status_code: int = 200,
+    headers: dict[str, str] | None = None
+) -> Response:
+    if isinstance(content, BaseModel):
+        body = content.__pydantic_serializer__.to_json(content)
+    elif len(content) == 0:
+        body = b"[]"
+    else:
+        body = __list_adapter(type(content[0])).dump_json(content)
+
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
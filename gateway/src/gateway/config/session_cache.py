@@ -0,0 +1,131 @@
+from log.loggers import SESSION_CACHE_LOGGER
+from redis.exceptions import RedisError
+from collections import OrderedDict
+from redis.asyncio import Redis
+import asyncio
+import time
+import json
+
+
+#
+# In-process LRU in front of redis session storage.
+# Revocations are fanned out through redis pub/sub, so every replica
+# evicts the entry as soon as the message arrives. While the subscription
+# is down nothing is cached and every lookup goes straight to redis.
+#
+class SessionCache:
+    def __init__(self, redis_client: Redis, max_size: int, ttl: float, channel: str):
+        self.__redis = redis_client
+        self.__max_size = max_size
+        self.__ttl = ttl
+        self.__channel = channel
+
+        self.__entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.__epoch = 0
+        self.__subscribed = False
+        self.__listener: asyncio.Task | None = None
+
+        self.__hits = 0
+        self.__misses = 0
+
+    async def get(self, session_id: str) -> dict | None:
+        entry = self.__entries.get(session_id)
+
+        if entry is not None:
+            expires_at, session_data = entry
+            if expires_at > time.monotonic():
+                self.__entries.move_to_end(session_id)
+                self.__hits += 1
+                return session_data
+            del self.__entries[session_id]
+
+        self.__misses += 1
+
+        # Any invalidation received while we wait on redis bumps the epoch,
+        # so a value read before the revocation is never put into the cache
+        epoch = self.__epoch
+        raw_data = await self.__redis.get(session_id)
+
+        if raw_data is None:
+            return None
+
+        session_data = json.loads(raw_data)
+
+        if self.__subscribed and epoch == self.__epoch:
+            self.__put(session_id, session_data)
+
+        return session_data
+
+    async def revoke(self, session_id: str):
+        async with self.__redis.pipeline(transaction=True) as pipe:
+            pipe.delete(session_id)
+            pipe.publish(self.__channel, session_id)
+            await pipe.execute()
+
+        self.evict(session_id)
+
+    def stats(self) -> dict:
+        lookups = self.__hits + self.__misses
+
+        return {
+            "size": len(self.__entries),
+            "max_size": self.__max_size,
+            "hits": self.__hits,
+            "misses": self.__misses,
+            "hit_ratio": self.__hits / lookups if lookups != 0 else 0.0,
+            "subscribed": self.__subscribed
+        }
+
+    async def start(self):
+        if self.__listener is None:
+            self.__listener = asyncio.create_task(self.__listen())
+
+    async def stop(self):
+        if self.__listener is None:
+            return
+
+        self.__listener.cancel()
+        try:
+            await self.__listener
+        except asyncio.CancelledError:
+            pass
+
+        self.__listener = None
+        self.__drop_all()
+
+    def __put(self, session_id: str, session_data: dict):
+        self.__entries[session_id] = (time.monotonic() + self.__ttl, session_data)
+        self.__entries.move_to_end(session_id)
+
+        while len(self.__entries) > self.__max_size:
+            self.__entries.popitem(last=False)
+
+    def evict(self, session_id: str):
+        self.__epoch += 1
+        self.__entries.pop(session_id, None)
+
+    def __drop_all(self):
+        self.__subscribed = False
+        self.__epoch += 1
+        self.__entries.clear()
+
+    async def __listen(self):
+        while True:
+            pubsub = self.__redis.pubsub()
+
+            try:
+                await pubsub.subscribe(self.__channel)
+
+                async for message in pubsub.listen():
+                    if message["type"] == "subscribe":
+                        self.__subscribed = True
+                        SESSION_CACHE_LOGGER.info(f"Subscribed to {self.__channel}")
+                    elif message["type"] == "message":
+                        self.evict(message["data"].decode())
+            except RedisError as ex:
+                # Revocations may have been missed, cached entries can't be trusted anymore
+                self.__drop_all()
+                SESSION_CACHE_LOGGER.warning(f"Revocation channel is lost, cache is dropped | {ex}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
@@ -1,22 +1,71 @@
-from dotenv import load_dotenv
 import logging
 import os
 
-load_dotenv()
+# .env is a local development convenience, containers get their environment
+# from compose and skip importing python-dotenv
+if os.environ.get("LOAD_DOTENV", "true").lower() == "true":
+    from dotenv import load_dotenv
+    load_dotenv()
 
 #
 # SERVER VARS
 #
 PORT = 8083
 HOST = "gateway"
+SERVICE_NAME = "gateway"
+
+# Not counted as in-flight requests, they are answered while draining too
+HEALTH_PATHS = ("/healthz", "/readyz", "/metrics")
+READINESS_CHECK_TIMEOUT_SECONDS = float(os.environ.get("READINESS_CHECK_TIMEOUT_SECONDS", 1))
+# In-flight requests are given this long to finish on shutdown
+SHUTDOWN_DRAIN_TIMEOUT_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_TIMEOUT_SECONDS", 20))
+# After SIGTERM the service reports not ready but keeps serving this long,
+# so load balancers polling /readyz stop sending it traffic first
+SHUTDOWN_READINESS_DELAY_SECONDS = float(os.environ.get("SHUTDOWN_READINESS_DELAY_SECONDS", 5))
+# Unreachable dependencies must not hold the start up
+WARM_UP_TIMEOUT_SECONDS = float(os.environ.get("WARM_UP_TIMEOUT_SECONDS", 2))
 
 
 #
 # LOGGING VARS
 #
-LOGS_LEVEL = logging.DEBUG
+LOGS_LEVEL = logging.getLevelName(os.environ.get("LOGS_LEVEL", "INFO").upper())
 LOGS_FILENAME = "logs/{date}.log" 
-LOGS_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOGS_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s"
+# "json" or "text" (LOGS_FORMAT)
+LOGS_FORMAT_TYPE = os.environ.get("LOGS_FORMAT_TYPE", "json")
+LOGS_QUEUE_SIZE = int(os.environ.get("LOGS_QUEUE_SIZE", 10000))
+# "LOGGER NAME=rate,OTHER LOGGER=rate", rate is the share of records kept
+LOGS_SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, rate in (
+        item.rsplit("=", 1) for item in os.environ.get("LOGS_SAMPLE_RATES", "").split(",") if item.strip() != ""
+    )
+}
+# "/path/prefix=LEVEL,...", records below LEVEL are dropped while serving that route
+LOGS_ROUTE_LEVELS = {
+    prefix.strip(): logging.getLevelName(level.strip().upper())
+    for prefix, level in (
+        item.rsplit("=", 1) for item in os.environ.get("LOGS_ROUTE_LEVELS", "").split(",") if item.strip() != ""
+    )
+}
+# Expected (4xx) errors are reported once per exception class per interval
+ERROR_LOG_INTERVAL_SECONDS = float(os.environ.get("ERROR_LOG_INTERVAL_SECONDS", 10))
+ERROR_RESPONSE_CACHE_SIZE = int(os.environ.get("ERROR_RESPONSE_CACHE_SIZE", 1024))
+
+
+#
+# TRACING
+#
+# "file", "otlp" or "none"
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "file")
+# Share of new traces recorded, services follow the decision sent in traceparent
+TRACING_SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", 0.05))
+TRACING_FILENAME = "traces/{date}.jsonl"
+TRACING_OTLP_ENDPOINT = os.environ.get("TRACING_OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+TRACING_QUEUE_SIZE = int(os.environ.get("TRACING_QUEUE_SIZE", 10000))
+TRACING_BATCH_SIZE = int(os.environ.get("TRACING_BATCH_SIZE", 512))
+TRACING_EXPORT_INTERVAL_MS = int(os.environ.get("TRACING_EXPORT_INTERVAL_MS", 1000))
 
 
 #
@@ -24,11 +73,23 @@ LOGS_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 #
 REDIS_HOST = os.environ.get("REDIS_HOST")
 REDIS_PORT = int(os.environ.get("REDIS_PORT"))
+REDIS_WARM_UP_CONNECTIONS = int(os.environ.get("REDIS_WARM_UP_CONNECTIONS", 2))
+
+SESSION_CACHE_MAX_SIZE = int(os.environ.get("SESSION_CACHE_MAX_SIZE", 10000))
+SESSION_CACHE_TTL_SECONDS = float(os.environ.get("SESSION_CACHE_TTL_SECONDS", 5))
+SESSION_REVOCATION_CHANNEL = os.environ.get("SESSION_REVOCATION_CHANNEL", "sessions:revoked")
 
 
 #
 # OTHER
 # 
-JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY")
+JWKS_URL = os.environ.get("JWKS_URL", "http://auth-service:8081/.well-known/jwks.json")
+JWKS_REFRESH_INTERVAL_SECONDS = float(os.environ.get("JWKS_REFRESH_INTERVAL_SECONDS", 300))
+JWKS_MIN_REFRESH_INTERVAL_SECONDS = float(os.environ.get("JWKS_MIN_REFRESH_INTERVAL_SECONDS", 10))
+SESSION_EXPIRATION_TIME = int(os.environ.get("SESSION_EXPIRATION_TIME"))
+SESSION_REFRESH_INTERVAL_SECONDS = float(os.environ.get("SESSION_REFRESH_INTERVAL_SECONDS", 60))
+SESSION_REFRESH_FLUSH_INTERVAL_MS = int(os.environ.get("SESSION_REFRESH_FLUSH_INTERVAL_MS", 250))
 SERVICE_NOT_RESPONDING_TIMEOUT = 10
+# Service responses up to this size are read whole, larger ones (video files) are relayed as they arrive
+PROXY_BUFFERED_RESPONSE_SIZE = int(os.environ.get("PROXY_BUFFERED_RESPONSE_SIZE", 1024 ** 2))
 
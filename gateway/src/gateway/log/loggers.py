@@ -7,3 +7,6 @@ TEST_LOGGER: logging.Logger = logging.getLogger("TEST")
 MAIN_ROUTER_LOGGER: logging.Logger = logging.getLogger("MAIN LOGGER")
 
 JWT_SERVICE_LOGGER: logging.Logger = logging.getLogger("JWT SERVICE LOGGER")
+SESSION_SERVICE_LOGGER: logging.Logger = logging.getLogger("SESSION SERVICE")
+SESSION_CACHE_LOGGER: logging.Logger = logging.getLogger("SESSION CACHE")
+AUTH_LOGGER: logging.Logger = logging.getLogger("AUTH MIDDLEWARE")
@@ -1,59 +1,92 @@
+from pydantic import BaseModel
+from .sampling import sampled
+import functools
 import logging
 import inspect
+import re
 
-def log_entrance_debug(logger: logging.Logger):
-    def decorator(func):
-        async def async_wrapper(*args, **kwargs):
-            logger.debug(f"Function {func.__name__} entrance | args {args} ; kwargs {kwargs}")
-            result = await func(*args, **kwargs)
-            logger.debug(f"Function {func.__name__} exit | Result {result}")
-            return result
-        
-        def sync_wrapper(*args, **kwargs):
-            logger.debug(f"Function {func.__name__} entrance | args {args} ; kwargs {kwargs}")
-            result = func(*args, **kwargs)
-            logger.debug(f"Function {func.__name__} exit | Result {result}")
-            return result
-        
-        if inspect.iscoroutinefunction(func):
-            return async_wrapper
-        return sync_wrapper
-    return decorator
+REDACTED = "***"
+SENSITIVE_FIELDS = frozenset({
+    "password",
+    "token",
+    "access_token",
+    "refresh_token",
+    "session_id",
+    "secret",
+    "secret_key"
+})
+JWT_PATTERN = re.compile(r"^eyJ[\w-]*\.[\w-]+\.[\w-]+$")
 
-def log_entrance_info(logger: logging.Logger):
-    def decorator(func):
-        async def async_wrapper(*args, **kwargs):
-            logger.info(f"Function {func.__name__} entrance | args {args} ; {kwargs}")
-            result = await func(*args, **kwargs)
-            logger.info(f"Function {func.__name__} exit | Result {result}")
-            return result
-        
-        def sync_wrapper(*args, **kwargs):
-            logger.info(f"Function {func.__name__} entrance | args {args} ; {kwargs}")
-            result = func(*args, **kwargs)
-            logger.info(f"Function {func.__name__} exit | Result {result}")
-            return result
-        
-        if inspect.iscoroutinefunction(func):
-            return async_wrapper
-        return sync_wrapper
-    return decorator
 
-def log_entrance_error(logger: logging.Logger):
+def redact(value):
+    if isinstance(value, BaseModel):
+        return {name: REDACTED if name in SENSITIVE_FIELDS else redact(field) for name, field in value}
+    if isinstance(value, dict):
+        return {key: REDACTED if key in SENSITIVE_FIELDS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(item) for item in value)
+    if isinstance(value, str) and JWT_PATTERN.match(value):
+        return REDACTED
+    return value
+
+
+#
+# Logs function entrance and exit. Nothing is bound, redacted or formatted
+# unless the level is enabled and the call is sampled, so a disabled wrapper
+# costs one level check. Arguments are logged by parameter name, sensitive
+# ones are masked; pass log_result=False for functions returning credentials.
+#
+def __log_entrance(logger: logging.Logger, level: int, log_result: bool):
     def decorator(func):
+        parameter_names = [
+            parameter.name
+            for parameter in inspect.signature(func).parameters.values()
+            if parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD)
+        ]
+        name = func.__qualname__
+        extra = {"presampled": True}
+
+        def log_enter(args, kwargs):
+            arguments = dict(zip(parameter_names, args))
+            if len(args) > len(parameter_names):
+                arguments["*args"] = args[len(parameter_names):]
+            arguments.update(kwargs)
+
+            logger.log(level, "Function %s entrance | args %s", name, redact(arguments), extra=extra)
+
+        def log_exit(result):
+            logger.log(level, "Function %s exit | Result %s", name, redact(result) if log_result else REDACTED, extra=extra)
+
+        @functools.wraps(func)
         async def async_wrapper(*args, **kwargs):
-            logger.error(f"Function {func.__name__} entrance | args {args} ; {kwargs}")
+            if not logger.isEnabledFor(level) or not sampled(logger):
+                return await func(*args, **kwargs)
+
+            log_enter(args, kwargs)
             result = await func(*args, **kwargs)
-            logger.error(f"Function {func.__name__} exit | Result {result}")
+            log_exit(result)
             return result
-        
+
+        @functools.wraps(func)
         def sync_wrapper(*args, **kwargs):
-            logger.error(f"Function {func.__name__} entrance | args {args} ; {kwargs}")
+            if not logger.isEnabledFor(level) or not sampled(logger):
+                return func(*args, **kwargs)
+
+            log_enter(args, kwargs)
             result = func(*args, **kwargs)
-            logger.error(f"Function {func.__name__} exit | Result {result}")
+            log_exit(result)
             return result
-        
+
         if inspect.iscoroutinefunction(func):
             return async_wrapper
         return sync_wrapper
     return decorator
+
+def log_entrance_debug(logger: logging.Logger, log_result: bool = True):
+    return __log_entrance(logger, logging.DEBUG, log_result)
+
+def log_entrance_info(logger: logging.Logger, log_result: bool = True):
+    return __log_entrance(logger, logging.INFO, log_result)
+
+def log_entrance_error(logger: logging.Logger, log_result: bool = True):
+    return __log_entrance(logger, logging.ERROR, log_result)
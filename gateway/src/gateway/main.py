@@ -1,26 +1,62 @@
-from config.global_exception_handlers import code_exception_handler
+from config.global_exception_handlers import code_exception_handler, unexpected_exception_handler, error_stats
 from contextlib import asynccontextmanager
-from log.setup import setup_logging
+from config.responses import FastJSONResponse
+from log.setup import setup_logging, shutdown_logging
+from middlewares.request_context import RequestContextMiddleware
+from middlewares.tracing import TracingMiddleware
+from middlewares.auth import AuthMiddleware
+from middlewares.lifecycle import LifecycleMiddleware
+from config.lifecycle import lifecycle, warm_up_app, serve
+from routers.health_router import health_router
+from log.tracing import EXPORTER
 from log.loggers import APP_LOGGER
+from config.redis_conf import session_cache, session_refresher, warm_up_redis, ping_redis
+from config.jwks_conf import jwks_client
 from routers.main_router import main_router
-from globals import PORT, HOST
+from globals import PORT, HOST, SHUTDOWN_DRAIN_TIMEOUT_SECONDS, SHUTDOWN_READINESS_DELAY_SECONDS
 from fastapi import FastAPI
 import exceptions
-import uvicorn
 
 @asynccontextmanager
 async def app_startup(app: FastAPI):
     setup_logging()
+    EXPORTER.start()
+    await session_cache.start()
+    await session_refresher.start()
+    await jwks_client.start()
+    await warm_up_redis()
+    await warm_up_app(app)
+    lifecycle.add_check("redis", ping_redis)
+    lifecycle.add_stats("session_cache", session_cache.stats)
+    lifecycle.add_stats("session_refresher", session_refresher.stats)
+    lifecycle.add_stats("errors", error_stats)
+    lifecycle.ready = True
     APP_LOGGER.info(f"Server is started on {HOST}:{PORT}")
     yield
+    await lifecycle.drain(SHUTDOWN_DRAIN_TIMEOUT_SECONDS)
+    APP_LOGGER.info(f"Session cache stats | {session_cache.stats()}")
+    APP_LOGGER.info(f"Session refresher stats | {session_refresher.stats()}")
+    await jwks_client.stop()
+    await session_refresher.stop()
+    await session_cache.stop()
+    APP_LOGGER.info(f"Error stats | {error_stats()}")
     APP_LOGGER.error("Server shutdown...")
+    EXPORTER.stop()
+    shutdown_logging()
 
 
-app = FastAPI(lifespan=app_startup)
+app = FastAPI(lifespan=app_startup, default_response_class=FastJSONResponse)
+
+app.add_middleware(AuthMiddleware)
+app.add_middleware(TracingMiddleware, trust_incoming=False)
+app.add_middleware(RequestContextMiddleware, trust_incoming=False)
+app.add_middleware(LifecycleMiddleware)
 
 app.add_exception_handler(exceptions.CodeException, code_exception_handler)
+app.add_exception_handler(Exception, unexpected_exception_handler)
 
+app.include_router(router=health_router)
 app.include_router(router=main_router)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host=HOST, port=PORT, log_config=None)
\ No newline at end of file
+    serve(app, HOST, PORT, SHUTDOWN_READINESS_DELAY_SECONDS, SHUTDOWN_DRAIN_TIMEOUT_SECONDS)
\ No newline at end of file
@@ -0,0 +1,22 @@
+from config.lifecycle import lifecycle
+from globals import HEALTH_PATHS
+
+
+#
+# Counts in-flight requests for the shutdown drain. Requests arriving while
+# draining are still served: they come from load balancers that haven't
+# seen /readyz fail yet.
+#
+class LifecycleMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in HEALTH_PATHS:
+            return await self.app(scope, receive, send)
+
+        lifecycle.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lifecycle.request_finished()
@@ -0,0 +1,46 @@
+from log.tracing import span
+from log.context import REQUEST_ID
+
+TRACEPARENT_HEADER = b"traceparent"
+
+
+#
+# Wraps every request into a server span. Services continue the trace
+# started by the gateway, the gateway always starts a new one.
+#
+class TracingMiddleware:
+    def __init__(self, app, trust_incoming: bool = True):
+        self.app = app
+        self.trust_incoming = trust_incoming
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        traceparent = None
+        if self.trust_incoming:
+            for name, value in scope["headers"]:
+                if name == TRACEPARENT_HEADER:
+                    traceparent = value.decode("latin-1")
+                    break
+
+        with span(f"{scope['method']} {scope['path']}", "server", traceparent=traceparent) as server_span:
+            if not server_span.sampled:
+                return await self.app(scope, receive, send)
+
+            server_span.set_attribute("http.method", scope["method"])
+            server_span.set_attribute("http.target", scope["path"])
+            server_span.set_attribute("request_id", REQUEST_ID.get())
+
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    server_span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+
+            # Route template is known only once the router has matched the path
+            route = scope.get("route")
+            if route is not None:
+                server_span.name = f"{scope['method']} {route.path}"
+                server_span.set_attribute("http.route", route.path)
@@ -1,8 +1,11 @@
 from exceptions import NotFoundException, GatewayTimeoutException
-from globals import SERVICE_NOT_RESPONDING_TIMEOUT
+from globals import SERVICE_NOT_RESPONDING_TIMEOUT, PROXY_BUFFERED_RESPONSE_SIZE
 from fastapi import APIRouter, Request, Response
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from log.loggers import MAIN_ROUTER_LOGGER
+from log.context import REQUEST_ID
+from log.tracing import span
 from urllib.parse import urljoin
 from multidict import MultiDict
 import aiohttp
@@ -19,7 +22,24 @@ SERVICES_URLS = {
 STATIC_NGINX_URL = "http://static-nginx"
 
 
-@main_router.api_route("/api/{service}/{path:path}", methods=["GET", "POST", "PUTCH", "DELETE", "PUT", "UPDATE", "OPTION"])
+async def __close(session: aiohttp.ClientSession, response: aiohttp.ClientResponse):
+    response.release()
+    await session.close()
+
+
+#
+# Closed when the relay ends, or as the response's background task once it is
+# sent: a client gone before the first piece never starts the relay. Both may run.
+#
+async def __relay(session: aiohttp.ClientSession, response: aiohttp.ClientResponse):
+    try:
+        async for data in response.content.iter_any():
+            yield data
+    finally:
+        await __close(session, response)
+
+
+@main_router.api_route("/api/{service}/{path:path}", methods=["GET", "HEAD", "POST", "PATCH", "DELETE", "PUT", "UPDATE", "OPTION"])
 async def proxy_api(service: str, path: str, req: Request, resp: Response):
     if service not in SERVICES_URLS:
         raise NotFoundException("Cannot find such service!")
@@ -28,32 +48,69 @@ async def proxy_api(service: str, path: str, req: Request, resp: Response):
 
     MAIN_ROUTER_LOGGER.debug(f"Routing {target_url}")
 
-    async with aiohttp.ClientSession() as session:
-        session: aiohttp.ClientSession
+    # Closed once the response is read, or once a relayed response is sent
+    session = aiohttp.ClientSession()
+
+    # Bodies are passed on as they arrive, a video upload chunk is never held whole
+    has_body = req.headers.get("content-length", "0") != "0" or "transfer-encoding" in req.headers
+    data = req.stream() if has_body else None
+    # Bodies both ways take as long as the client takes, only the service's silence is bounded
+    timeout = aiohttp.ClientTimeout(sock_connect=SERVICE_NOT_RESPONDING_TIMEOUT, sock_read=SERVICE_NOT_RESPONDING_TIMEOUT)
+    headers = dict(req.headers)
+    headers["x-request-id"] = REQUEST_ID.get()
+    # Services apply per-client limits by address, the peer is appended as proxies do
+    if req.client != None:
+        forwarded_for = headers.get("x-forwarded-for")
+        headers["x-forwarded-for"] = f"{forwarded_for}, {req.client.host}" if forwarded_for else req.client.host
 
-        data = await req.body()
-        headers = dict(req.headers)
+    with span(f"proxy {service}", "client", {"http.method": req.method, "http.url": target_url}) as proxy_span:
+        traceparent = proxy_span.traceparent()
+        if traceparent is not None:
+            headers["traceparent"] = traceparent
+        else:
+            headers.pop("traceparent", None)
 
         try:
-            async with session.request(
+            response = await session.request(
                 method=req.method,
                 url=target_url,
                 headers=headers,
                 data=data,
                 params=req.query_params,
-                timeout=SERVICE_NOT_RESPONDING_TIMEOUT
-            ) as response:
-                filtered_headers = MultiDict(response.headers)
-                filtered_headers.pop("date", None)
-                filtered_headers.pop("server", None)
-
-                return Response(
-                    content=(await response.read()),
-                    status_code=response.status,
-                    headers=filtered_headers
-                )
-        except asyncio.TimeoutError:
-            raise GatewayTimeoutException("Service is not responding")
+                timeout=timeout
+            )
+        except BaseException as ex:
+            await session.close()
+            if isinstance(ex, asyncio.TimeoutError):
+                raise GatewayTimeoutException("Service is not responding")
+            raise
+
+        proxy_span.set_attribute("http.status_code", response.status)
+
+    filtered_headers = MultiDict(response.headers)
+    filtered_headers.pop("date", None)
+    filtered_headers.pop("server", None)
+    # Set again by the request context middleware
+    filtered_headers.pop("x-request-id", None)
+
+    # A video file is relayed piece by piece, never held whole
+    length = response.content_length
+    if req.method != "HEAD" and (length == None or length > PROXY_BUFFERED_RESPONSE_SIZE):
+        return StreamingResponse(
+            content=__relay(session, response),
+            status_code=response.status,
+            headers=filtered_headers,
+            background=BackgroundTask(__close, session, response)
+        )
+
+    try:
+        content = await response.read()
+    except asyncio.TimeoutError:
+        raise GatewayTimeoutException("Service is not responding")
+    finally:
+        await __close(session, response)
+
+    return Response(content=content, status_code=response.status, headers=filtered_headers)
 
     
 @main_router.get("/static/{path:path}")
@@ -0,0 +1,192 @@
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from jwt import ExpiredSignatureError, InvalidTokenError, InvalidKeyError
+from cryptography.exceptions import InvalidSignature
+import binascii
+import base64
+import orjson
+import time
+
+
+def b64url_encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+def b64url_decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+#
+# Claims building and token parsing shared by the codecs.
+# Subclasses only know how to sign and how to check a signature.
+#
+class BaseJwtCodec:
+    ALGORITHM: str = None
+
+    def __init__(self, leeway: int = 0):
+        self.__leeway = leeway
+
+    def encode(self, payload: dict) -> str:
+        raise NotImplementedError()
+
+    def encode_claims(
+        self,
+        user_id: str,
+        username: str,
+        role: str,
+        exp_time: int,
+        now: int | None = None,
+        extra_claims: dict | None = None
+    ) -> str:
+        if now is None:
+            now = int(time.time())
+
+        payload = {
+            "id": user_id,
+            "sub": username,
+            "role": role,
+            "exp": now + exp_time * 60
+        }
+        if extra_claims is not None:
+            payload.update(extra_claims)
+
+        return self.encode(payload)
+
+    #
+    # Returns access token and refresh token
+    #
+    def encode_pair(
+        self,
+        user_id: str,
+        username: str,
+        role: str,
+        access_exp_time: int,
+        refresh_exp_time: int,
+        refresh_claims: dict | None = None
+    ) -> tuple[str, str]:
+        now = int(time.time())
+
+        return (
+            self.encode_claims(user_id, username, role, access_exp_time, now),
+            self.encode_claims(user_id, username, role, refresh_exp_time, now, refresh_claims)
+        )
+
+    def decode(self, token: str) -> dict:
+        try:
+            signing_input, _, signature = token.encode("ascii").rpartition(b".")
+            header_segment, _, payload_segment = signing_input.partition(b".")
+
+            self._verify(header_segment, signing_input, b64url_decode(signature))
+
+            payload = orjson.loads(b64url_decode(payload_segment))
+        except (UnicodeEncodeError, binascii.Error, orjson.JSONDecodeError) as ex:
+            raise InvalidTokenError(f"Invalid token segments | {ex}")
+
+        if not isinstance(payload, dict):
+            raise InvalidTokenError("Invalid payload")
+
+        exp = payload.get("exp")
+        if exp is not None:
+            if not isinstance(exp, (int, float)):
+                raise InvalidTokenError("Expiration Time claim (exp) must be a number")
+            if exp <= time.time() - self.__leeway:
+                raise ExpiredSignatureError("Signature has expired")
+
+        return payload
+
+    def _verify(self, header_segment: bytes, signing_input: bytes, signature: bytes):
+        raise NotImplementedError()
+
+    def _parse_header(self, header_segment: bytes) -> dict:
+        header = orjson.loads(b64url_decode(header_segment))
+
+        if not isinstance(header, dict) or header.get("alg") != self.ALGORITHM:
+            raise InvalidTokenError("The specified alg value is not allowed")
+
+        return header
+
+
+#
+# EdDSA (Ed25519) codec. Tokens carry the signing key id in the "kid"
+# header, verifiers pick the public key by kid, so keys can be rotated
+# by publishing a new key set without touching the verifiers.
+#
+class EdDsaJwtCodec(BaseJwtCodec):
+    ALGORITHM = "EdDSA"
+
+    def __init__(
+        self,
+        signing_key: Ed25519PrivateKey | None = None,
+        signing_kid: str | None = None,
+        verifying_keys: dict[str, Ed25519PublicKey] | None = None,
+        leeway: int = 0
+    ):
+        super().__init__(leeway=leeway)
+        self.__signing_key = signing_key
+        self.__header_segment = None
+        self.__verifying_keys: dict[str, Ed25519PublicKey] = {}
+        # header segment -> kid, so a known header is parsed only once
+        self.__header_kids: dict[bytes, str] = {}
+
+        if signing_key is not None:
+            self.__header_segment = b64url_encode(orjson.dumps({"alg": self.ALGORITHM, "kid": signing_kid, "typ": "JWT"}))
+            self.__header_kids[self.__header_segment] = signing_kid
+            self.__verifying_keys[signing_kid] = signing_key.public_key()
+
+        if verifying_keys is not None:
+            self.set_verifying_keys(verifying_keys)
+
+    def set_verifying_keys(self, verifying_keys: dict[str, Ed25519PublicKey]):
+        self.__verifying_keys = dict(verifying_keys)
+        self.__header_kids = {
+            header_segment: kid
+            for header_segment, kid in self.__header_kids.items()
+            if kid in self.__verifying_keys
+        }
+
+    def has_kid(self, kid: str) -> bool:
+        return kid in self.__verifying_keys
+
+    def jwks(self) -> dict:
+        return {"keys": [public_key_to_jwk(kid, key) for kid, key in self.__verifying_keys.items()]}
+
+    def encode(self, payload: dict) -> str:
+        if self.__signing_key is None:
+            raise InvalidKeyError("Codec has no signing key")
+
+        signing_input = self.__header_segment + b"." + b64url_encode(orjson.dumps(payload))
+        return (signing_input + b"." + b64url_encode(self.__signing_key.sign(signing_input))).decode()
+
+    def _verify(self, header_segment: bytes, signing_input: bytes, signature: bytes):
+        kid = self.__header_kids.get(header_segment)
+
+        if kid is None:
+            kid = self._parse_header(header_segment).get("kid")
+            # A list or object kid is not a key id, and would not even hash
+            if not isinstance(kid, str):
+                raise InvalidKeyError("Invalid kid")
+            if kid not in self.__verifying_keys:
+                raise InvalidKeyError(f"Unknown kid {kid}")
+            if len(self.__header_kids) < 64:
+                self.__header_kids[header_segment] = kid
+
+        try:
+            self.__verifying_keys[kid].verify(signature, signing_input)
+        except InvalidSignature:
+            raise InvalidTokenError("Signature verification failed")
+
+
+def public_key_to_jwk(kid: str, public_key: Ed25519PublicKey) -> dict:
+    return {
+        "kty": "OKP",
+        "crv": "Ed25519",
+        "alg": EdDsaJwtCodec.ALGORITHM,
+        "use": "sig",
+        "kid": kid,
+        "x": b64url_encode(public_key.public_bytes(Encoding.Raw, PublicFormat.Raw)).decode()
+    }
+
+def jwk_to_public_key(jwk: dict) -> Ed25519PublicKey:
+    if jwk.get("kty") != "OKP" or jwk.get("crv") != "Ed25519":
+        raise InvalidKeyError(f"Unsupported key {jwk.get('kid')}")
+
+    return Ed25519PublicKey.from_public_bytes(b64url_decode(jwk["x"].encode()))
@@ -1,24 +1,16 @@
 from exceptions import UnauthorizedException
-from globals import JWT_SECRET_KEY
-import datetime
-from log.wrappers import log_entrance_debug
-from log.loggers import JWT_SERVICE_LOGGER
+from config.jwks_conf import jwks_client
+from .jwt_codec import b64url_decode
+import orjson
 import jwt
 
+
 class JwtPayload:
     def __init__(self, user_id: str, username: str, role: str, exp_time: int):
         self.user_id = user_id
         self.username = username
         self.role = role
         self.exp_time = exp_time
-
-    def to_dict(self):
-        return {
-            "id": self.user_id,
-            "sub": self.username,
-            "role": self.role,
-            "exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=self.exp_time)
-        }
     
     @staticmethod
     def from_dict(dict_payload: dict):
@@ -30,25 +22,28 @@ class JwtPayload:
         )
 
 
+# Token functions are on the hot path and are deliberately not wrapped
+# with log_entrance_debug: it would format every token on every call.
 
-@log_entrance_debug(JWT_SERVICE_LOGGER)
-async def create_token(username: str, user_id: str, role: str, exp_time: int) -> str:
-    payload = JwtPayload(
-        user_id=user_id,
-        username=username,
-        role=role,
-        exp_time=exp_time
-    )
-    
-    token = jwt.encode(payload=payload.to_dict(), key=JWT_SECRET_KEY, algorithm="HS256")
-    return token
-
-@log_entrance_debug(JWT_SERVICE_LOGGER)
 async def validate_token(token: str) -> JwtPayload:
     try:
-        payload = jwt.decode(jwt=token, key=JWT_SECRET_KEY, algorithms=["HS256"])
+        try:
+            payload = jwks_client.codec.decode(token)
+        except jwt.InvalidKeyError:
+            # Signed with a key we haven't seen yet, the key set may have been rotated
+            if not await jwks_client.refresh_for_kid(__token_kid(token)):
+                raise
+            payload = jwks_client.codec.decode(token)
+
         return JwtPayload.from_dict(payload)
     except jwt.ExpiredSignatureError:
         raise UnauthorizedException("Token expired")
-    except jwt.InvalidTokenError:
+    except (jwt.InvalidTokenError, jwt.InvalidKeyError):
         raise UnauthorizedException("Invalid token")
+
+
+def __token_kid(token: str) -> str:
+    kid = orjson.loads(b64url_decode(token.split(".", 1)[0].encode())).get("kid")
+    if not isinstance(kid, str):
+        raise jwt.InvalidKeyError("Invalid kid")
+    return kid
@@ -0,0 +1,15 @@
+from config.redis_conf import session_cache, session_refresher
+from log.wrappers import log_entrance_debug
+from log.loggers import SESSION_SERVICE_LOGGER
+from exceptions import UnauthorizedException
+
+@log_entrance_debug(SESSION_SERVICE_LOGGER)
+async def get_session(session_id: str) -> dict:
+    session_data = await session_cache.get(session_id)
+
+    if session_data == None:
+        raise UnauthorizedException("Session id is expired.")
+
+    session_refresher.touch(session_id)
+
+    return session_data
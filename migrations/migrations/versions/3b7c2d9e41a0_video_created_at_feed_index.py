@@ -0,0 +1,30 @@
+"""video created_at and feed index
+
+Revision ID: 3b7c2d9e41a0
+Revises: f0906aa806de
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7c2d9e41a0'
+down_revision: Union[str, None] = 'f0906aa806de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('videos', sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+    op.create_index('ix_videos_created_at_id', 'videos', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_videos_created_at_id', table_name='videos')
+    op.drop_column('videos', 'created_at')
@@ -0,0 +1,37 @@
+"""video like_count
+
+Revision ID: 8d41e6c5b2f7
+Revises: 3b7c2d9e41a0
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41e6c5b2f7'
+down_revision: Union[str, None] = '3b7c2d9e41a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('videos', sa.Column('like_count', sa.BigInteger(), server_default='0', nullable=False))
+    op.execute("""
+        UPDATE videos SET like_count = counted.like_count
+        FROM (
+            SELECT video_id, count(*) AS like_count
+            FROM video_likes_association_table
+            GROUP BY video_id
+        ) counted
+        WHERE videos.id = counted.video_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('videos', 'like_count')
@@ -0,0 +1,50 @@
+"""video blob store
+
+Revision ID: a4d9b2e7c1f3
+Revises: e7a3f0c6d154
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d9b2e7c1f3'
+down_revision: Union[str, None] = 'e7a3f0c6d154'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('blob_manifests',
+    sa.Column('digest', sa.LargeBinary(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('chunks', sa.LargeBinary(), nullable=False),
+    sa.Column('ref_count', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('digest')
+    )
+    op.create_index('ix_blob_manifests_unreferenced', 'blob_manifests', ['digest'], unique=False, postgresql_where=sa.text('ref_count = 0'))
+    op.create_table('blob_chunks',
+    sa.Column('digest', sa.LargeBinary(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('digest')
+    )
+    op.create_index('ix_blob_chunks_unreferenced', 'blob_chunks', ['digest'], unique=False, postgresql_where=sa.text('ref_count = 0'))
+    op.add_column('videos', sa.Column('manifest_digest', sa.LargeBinary(), nullable=True))
+    op.create_foreign_key('videos_manifest_digest_fkey', 'videos', 'blob_manifests', ['manifest_digest'], ['digest'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('videos_manifest_digest_fkey', 'videos', type_='foreignkey')
+    op.drop_column('videos', 'manifest_digest')
+    op.drop_index('ix_blob_chunks_unreferenced', table_name='blob_chunks', postgresql_where=sa.text('ref_count = 0'))
+    op.drop_table('blob_chunks')
+    op.drop_index('ix_blob_manifests_unreferenced', table_name='blob_manifests', postgresql_where=sa.text('ref_count = 0'))
+    op.drop_table('blob_manifests')
@@ -0,0 +1,31 @@
+"""users credits unique username and email
+
+Revision ID: b1f4c8e2d6a9
+Revises: a4d9b2e7c1f3
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1f4c8e2d6a9'
+down_revision: Union[str, None] = 'a4d9b2e7c1f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fails if duplicates already exist, they have to be resolved by hand first
+    op.create_index('ux_users_credits_username', 'users_credits', ['username'], unique=True)
+    op.create_index('ux_users_credits_email', 'users_credits', ['email'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_users_credits_email', table_name='users_credits')
+    op.drop_index('ux_users_credits_username', table_name='users_credits')
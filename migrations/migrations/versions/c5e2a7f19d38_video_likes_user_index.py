@@ -0,0 +1,28 @@
+"""video likes index by user
+
+Revision ID: c5e2a7f19d38
+Revises: 8d41e6c5b2f7
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e2a7f19d38'
+down_revision: Union[str, None] = '8d41e6c5b2f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_video_likes_users_id_video_id', 'video_likes_association_table', ['users_id', 'video_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_video_likes_users_id_video_id', table_name='video_likes_association_table')
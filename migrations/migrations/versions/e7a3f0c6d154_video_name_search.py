@@ -0,0 +1,34 @@
+"""video name search
+
+Revision ID: e7a3f0c6d154
+Revises: c5e2a7f19d38
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3f0c6d154'
+down_revision: Union[str, None] = 'c5e2a7f19d38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.add_column('videos', sa.Column('name_tsv', postgresql.TSVECTOR(), sa.Computed("to_tsvector('russian', name)", persisted=True), nullable=True))
+    op.create_index('ix_videos_name_tsv', 'videos', ['name_tsv'], unique=False, postgresql_using='gin')
+    op.create_index('ix_videos_name_trgm', 'videos', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_videos_name_trgm', table_name='videos')
+    op.drop_index('ix_videos_name_tsv', table_name='videos')
+    op.drop_column('videos', 'name_tsv')
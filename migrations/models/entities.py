@@ -1,6 +1,7 @@
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import Column, String, Date, UUID, Integer, ForeignKey, Table, Uuid
+from sqlalchemy import Column, String, Date, UUID, Integer, ForeignKey, Table, Uuid, DateTime, Index, func, BigInteger, Computed, LargeBinary, text
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
 import datetime
 
 class Base(DeclarativeBase):
@@ -15,7 +16,9 @@ video_like_association_table = Table(
     "video_likes_association_table",
     Base.metadata,
     Column("video_id", ForeignKey("videos.id"), primary_key=True),
-    Column("users_id", ForeignKey("users_data.id"), primary_key=True)
+    Column("users_id", ForeignKey("users_data.id"), primary_key=True),
+    # The primary key leads with video_id, lookups of a user's likes need the reverse order
+    Index("ix_video_likes_users_id_video_id", "users_id", "video_id")
 )
 
 video_tags_association_table = Table(
@@ -33,6 +36,10 @@ video_tags_association_table = Table(
 
 class UserCredits(Base):
     __tablename__ = "users_credits"
+    __table_args__ = (
+        Index("ux_users_credits_username", "username", unique=True),
+        Index("ux_users_credits_email", "email", unique=True)
+    )
     id = Column(UUID, primary_key=True, nullable=False)
     username = Column(String, nullable=False)
     password = Column(String, nullable=False)
@@ -81,11 +88,54 @@ class VideoTags(Base):
         lazy="select"
     )
 
+
+#
+# Content-addressed video storage, see video-service config/blob_store.py
+#
+class BlobManifest(Base):
+    __tablename__ = "blob_manifests"
+    __table_args__ = (
+        # The garbage collector only looks for unreferenced manifests
+        Index("ix_blob_manifests_unreferenced", "digest", postgresql_where=text("ref_count = 0")),
+    )
+    # sha256 of the whole file
+    digest = Column(LargeBinary, primary_key=True, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    # Packed (chunk sha256, 8 byte big endian size) records in file order
+    chunks = Column(LargeBinary, nullable=False)
+    # Videos pointing at the manifest
+    ref_count = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class BlobChunk(Base):
+    __tablename__ = "blob_chunks"
+    __table_args__ = (
+        Index("ix_blob_chunks_unreferenced", "digest", postgresql_where=text("ref_count = 0")),
+    )
+    # sha256 of the chunk, the file is {BLOB_DIR}/chunks/ab/cd/abcd...
+    digest = Column(LargeBinary, primary_key=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    # Occurrences in manifests
+    ref_count = Column(BigInteger, nullable=False)
+
+
 class Video(Base):
     __tablename__ = "videos"
+    __table_args__ = (
+        Index("ix_videos_created_at_id", "created_at", "id"),
+        Index("ix_videos_name_tsv", "name_tsv", postgresql_using="gin"),
+        Index("ix_videos_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"})
+    )
     id = Column(UUID, primary_key=True, nullable=False)
     name = Column(String, nullable=False)
     author_id = Column(UUID, ForeignKey("users_data.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Denormalized count of liked_users, kept up to date by the like counter flusher
+    like_count = Column(BigInteger, nullable=False, server_default="0")
+    # Stored file, null for videos from before the blob store
+    manifest_digest = Column(LargeBinary, ForeignKey("blob_manifests.digest"), nullable=True)
+    name_tsv = Column(TSVECTOR, Computed("to_tsvector('russian', name)", persisted=True))
 
     author = relationship("UserData", back_populates="videos", lazy="select")
     liked_users = relationship(
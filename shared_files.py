@@ -0,0 +1,98 @@
+#
+# Modules every service carries its own copy of. Each service is built from
+# its own directory (see docker-compose.yaml) and imports them by top-level
+# package, so they are copied rather than installed from one place; the
+# copies must stay byte-identical. A change is made in one service and
+# spread to the others with --sync from that service.
+#
+#   python shared_files.py                         fails if any copy differs
+#   python shared_files.py --sync video-service    copies that service's files over the others
+#
+import argparse
+import pathlib
+import shutil
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent
+
+SERVICES = {
+    "auth-service": "src/auth_service",
+    "comment-service": "src/comment_service",
+    "gateway": "src/gateway",
+    "user-service": "src/user_service",
+    "video-service": "src/video_service"
+}
+ALL = tuple(SERVICES)
+WITH_DB = ("auth-service", "comment-service", "user-service", "video-service")
+WITH_SESSIONS = ("auth-service", "gateway")
+
+# Path inside the service directory, {package} is the service package -> services having it
+SHARED_FILES = {
+    "{package}/log/context.py": ALL,
+    "{package}/log/sampling.py": ALL,
+    "{package}/log/setup.py": ALL,
+    "{package}/log/tracing.py": ALL,
+    "{package}/log/wrappers.py": ALL,
+    "{package}/config/lifecycle.py": ALL,
+    "{package}/config/redis_tracing.py": ALL,
+    "{package}/config/responses.py": ALL,
+    "{package}/middlewares/lifecycle.py": ALL,
+    "{package}/middlewares/request_context.py": ALL,
+    "{package}/middlewares/tracing.py": ALL,
+    "{package}/routers/health_router.py": ALL,
+    "{package}/config/db_conf.py": WITH_DB,
+    "{package}/config/db_routing.py": WITH_DB,
+    "{package}/config/db_tracing.py": WITH_DB,
+    "{package}/config/session_cache.py": WITH_SESSIONS,
+    "{package}/config/session_refresher.py": WITH_SESSIONS,
+    "{package}/services/jwt_codec.py": WITH_SESSIONS,
+    "benchmarks/startup_bench.py": ALL
+}
+
+
+def shared_path(service: str, name: str) -> pathlib.Path:
+    return ROOT / service / name.format(package=SERVICES[service])
+
+
+def differing() -> list[str]:
+    problems = []
+
+    for name, services in SHARED_FILES.items():
+        contents = {service: shared_path(service, name).read_bytes() for service in services}
+        if len(set(contents.values())) != 1:
+            first = services[0]
+            others = [service for service in services[1:] if contents[service] != contents[first]]
+            problems.append(f"{name}: {', '.join(others)} differ from {first}")
+
+    return problems
+
+
+def sync(source: str) -> int:
+    copied = 0
+
+    for name, services in SHARED_FILES.items():
+        if source not in services:
+            continue
+
+        for service in services:
+            destination = shared_path(service, name)
+            if service != source and destination.read_bytes() != shared_path(source, name).read_bytes():
+                shutil.copyfile(shared_path(source, name), destination)
+                print(f"{service}: {name}")
+                copied += 1
+
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sync", choices=SERVICES, help="service whose copies replace the others")
+    args = parser.parse_args()
+
+    if args.sync is not None:
+        print(f"{sync(args.sync)} files copied")
+    else:
+        problems = differing()
+        for problem in problems:
+            print(problem)
+        sys.exit(1 if len(problems) != 0 else 0)
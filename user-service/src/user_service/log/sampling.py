@@ -0,0 +1,24 @@
+from globals import LOGS_SAMPLE_RATES
+import logging
+import random
+
+
+#
+# Per-logger sampling. LOGS_SAMPLE_RATES maps logger names to the share of
+# records that are kept (1 keeps everything, 0 drops everything).
+#
+def sampled(logger: logging.Logger) -> bool:
+    rate = LOGS_SAMPLE_RATES.get(logger.name)
+    return rate is None or random.random() < rate
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate: float):
+        super().__init__()
+        self.__rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Wrapper records were sampled once per call, before anything was formatted
+        if getattr(record, "presampled", False):
+            return True
+        return random.random() < self.__rate
@@ -1,16 +1,87 @@
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
+from globals import LOGS_LEVEL, LOGS_FILENAME, LOGS_FORMAT, LOGS_FORMAT_TYPE, LOGS_QUEUE_SIZE, LOGS_SAMPLE_RATES
 from fastapi.logger import logger as fastapi_logger
-from globals import LOGS_LEVEL, LOGS_FILENAME, LOGS_FORMAT
-from datetime import datetime
+from .context import RequestContextFilter
+from .sampling import SamplingFilter
+from datetime import datetime, timezone
 import logging
+import orjson
+import queue
+import copy
 import sys
 import os
 
+
+#
+# Queue handler that never blocks the event loop: when the listener
+# can't keep up records are dropped and counted instead
+#
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, records_queue: queue.Queue):
+        super().__init__(records_queue)
+        self.dropped = 0
+        self.__exc_formatter = logging.Formatter()
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    #
+    # The base class merges the traceback into the message and drops
+    # exc_info, formatters on the listener side would never see it. The
+    # traceback is formatted here instead and travels as exc_text.
+    #
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.__exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+
+#
+# One JSON object per line, keyed for log shippers
+#
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None)
+        }
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+
+        return orjson.dumps(entry).decode()
+
+
+__listener: QueueListener | None = None
+__queue_handler: DroppingQueueHandler | None = None
+
+
 def setup_logging():
+    global __listener, __queue_handler
+
     uvicorn_logger = logging.getLogger("uvicorn")
     uvicorn_logger.handlers.clear()
 
-    formatter = logging.Formatter(LOGS_FORMAT)
+    if LOGS_FORMAT_TYPE == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(LOGS_FORMAT)
 
     # Simple console/stdout logging
     stdout_handler = logging.StreamHandler(sys.stdout)
@@ -26,10 +97,33 @@ def setup_logging():
     )
     file_handler.setFormatter(formatter)
 
+    # Records are formatted on the caller side and written by the listener thread,
+    # so console and file I/O never run on the event loop
+    __queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOGS_QUEUE_SIZE))
+    # Runs on the caller side, where the request context is still bound
+    __queue_handler.addFilter(RequestContextFilter())
+    __listener = QueueListener(__queue_handler.queue, stdout_handler, file_handler, respect_handler_level=True)
+    __listener.start()
+
     logger = logging.getLogger()
     logger.setLevel(LOGS_LEVEL)
-    logger.addHandler(stdout_handler)
-    logger.addHandler(file_handler)
+    logger.addHandler(__queue_handler)
+
+    for logger_name, rate in LOGS_SAMPLE_RATES.items():
+        logging.getLogger(logger_name).addFilter(SamplingFilter(rate))
 
     fastapi_logger.handlers = logger.handlers
     fastapi_logger.setLevel(LOGS_LEVEL)
+
+
+def shutdown_logging():
+    global __listener
+
+    if __listener is None:
+        return
+
+    if __queue_handler.dropped != 0:
+        logging.getLogger().warning(f"{__queue_handler.dropped} log records were dropped, logging queue was full")
+
+    __listener.stop()
+    __listener = None
@@ -0,0 +1,181 @@
+#
+# Chunking, write and read throughput and deduplication of the blob store
+# (config/blob_store.py) on a synthetic library of --clips random clips of
+# --clip-mib MiB each, stored as the uploads of a video site would be:
+#   original   - every clip once
+#   re-upload  - the same files again, only the manifest reference moves
+#   trimmed    - each clip without its first 3 MiB and a few odd bytes
+#   spliced    - each clip with 1000 new bytes inserted in the middle
+#   compiled   - pairs of clips concatenated, as highlight videos are
+# Reads go through sendfile to --dir (page cache warm) and are compared with
+# a plain read/write copy of the source file.
+#
+# Run from the service root against a disposable postgres (DB_* variables as
+# for the service). Tables live in their own schema (blob_bench), dropped
+# with the files in --dir afterwards:
+#   poetry run python benchmarks/blob_store_bench.py [--clips 8] [--clip-mib 256] [--dir /tmp/blob_bench]
+#
+import argparse
+import hashlib
+import pathlib
+import asyncio
+import shutil
+import time
+import sys
+import os
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "video_service"))
+
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+from globals import BLOB_CHUNK_MIN_SIZE, BLOB_CHUNK_AVG_SIZE, BLOB_CHUNK_MAX_SIZE, BLOB_GC_BATCH_SIZE
+from config.blob_store import BlobStore, chunk_boundaries, position_powers
+from models.entities import BlobManifest, BlobChunk
+from sqlalchemy.ext.asyncio import create_async_engine
+from config.db_conf import engine
+from sqlalchemy import text
+import numpy as np
+
+SCHEMA = "blob_bench"
+MIB = 1024 ** 2
+COPY_BUFFER_SIZE = MIB
+
+
+def rate(size: int, elapsed: float) -> str:
+    return f"{elapsed:>7.2f} s | {size / MIB / elapsed:>8.1f} MiB/s"
+
+
+def write_file(path: str, parts: list[bytes]) -> tuple[str, bytes, int]:
+    hasher = hashlib.sha256()
+    with open(path, "wb") as file:
+        for part in parts:
+            file.write(part)
+            hasher.update(part)
+    return (path, hasher.digest(), sum(len(part) for part in parts))
+
+
+def library(directory: str, clips: list[bytes]) -> dict[str, list[tuple[str, bytes, int]]]:
+    trimmed_start = 3 * MIB + 17
+    return {
+        "original": [write_file(os.path.join(directory, f"clip{i}"), [clip]) for i, clip in enumerate(clips)],
+        "trimmed": [write_file(os.path.join(directory, f"trimmed{i}"), [clip[trimmed_start:]]) for i, clip in enumerate(clips)],
+        "spliced": [
+            write_file(os.path.join(directory, f"spliced{i}"), [clip[:len(clip) // 2], os.urandom(1000), clip[len(clip) // 2:]])
+            for i, clip in enumerate(clips)
+        ],
+        "compiled": [
+            write_file(os.path.join(directory, f"compiled{i}"), [clips[i], clips[i + 1]]) for i in range(0, len(clips) - 1, 2)
+        ]
+    }
+
+
+def copy_baseline(source: str, destination: str) -> int:
+    copied = 0
+    with open(source, "rb", buffering=0) as src, open(destination, "wb", buffering=0) as dst:
+        buffer = bytearray(COPY_BUFFER_SIZE)
+        while (count := src.readinto(buffer)) != 0:
+            dst.write(memoryview(buffer)[:count])
+            copied += count
+    return copied
+
+
+async def main(args):
+    if engine is None:
+        print("DB_* variables are not set")
+        return
+
+    os.makedirs(args.dir, exist_ok=True)
+    bench_engine = create_async_engine(engine.url, connect_args={"server_settings": {"search_path": SCHEMA}})
+    async with bench_engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.run_sync(lambda sync: BlobManifest.metadata.create_all(sync, tables=[BlobManifest.__table__, BlobChunk.__table__]))
+
+    store = BlobStore(
+        engine=bench_engine,
+        directory=os.path.join(args.dir, "blobs"),
+        min_chunk_size=BLOB_CHUNK_MIN_SIZE,
+        avg_chunk_size=BLOB_CHUNK_AVG_SIZE,
+        max_chunk_size=BLOB_CHUNK_MAX_SIZE,
+        gc_interval=3600,
+        gc_batch_size=BLOB_GC_BATCH_SIZE
+    )
+    await store.start()
+
+    try:
+        clips = [os.urandom(args.clip_mib * MIB) for _ in range(args.clips)]
+        files = library(args.dir, clips)
+
+        sample = np.frombuffer(clips[0], dtype=np.uint8)
+        position_powers()
+        started_at = time.perf_counter()
+        boundaries = chunk_boundaries(sample, BLOB_CHUNK_MIN_SIZE, BLOB_CHUNK_AVG_SIZE, BLOB_CHUNK_MAX_SIZE)
+        chunked = time.perf_counter() - started_at
+        started_at = time.perf_counter()
+        hashlib.sha256(clips[0]).digest()
+        hashed = time.perf_counter() - started_at
+
+        print(f"{args.clips} clips of {args.clip_mib} MiB, chunks {BLOB_CHUNK_MIN_SIZE // 1024} / {BLOB_CHUNK_AVG_SIZE // 1024} / {BLOB_CHUNK_MAX_SIZE // 1024} KiB")
+        print(f"chunking      | {rate(len(sample), chunked)} | mean chunk {len(sample) / len(boundaries) / 1024:.0f} KiB")
+        print(f"sha256        | {rate(len(sample), hashed)}")
+        del sample
+
+        for name, group in [("original", files["original"]), ("re-upload", files["original"])] + [
+            (name, files[name]) for name in ("trimmed", "spliced", "compiled")
+        ]:
+            started_at = time.perf_counter()
+            for path, digest, _ in group:
+                await store.put(path, digest)
+            elapsed = time.perf_counter() - started_at
+            report = await store.report()
+            print(f"{'put ' + name:<14}| {rate(sum(size for _, _, size in group), elapsed)} | dedup ratio {report['dedup_ratio']}")
+
+        path, digest, size = files["compiled"][0] if len(files["compiled"]) != 0 else files["original"][0]
+        manifest = await store.manifest(digest)
+        destination = os.path.join(args.dir, "read")
+
+        started_at = time.perf_counter()
+        fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            store.send(manifest, fd)
+        finally:
+            os.close(fd)
+        print(f"read          | {rate(size, time.perf_counter() - started_at)} | {len(manifest.chunks)} chunks, sendfile")
+
+        started_at = time.perf_counter()
+        copy_baseline(path, destination)
+        print(f"copy          | {rate(size, time.perf_counter() - started_at)} | one file, read/write")
+
+        report = await store.report()
+        print(
+            f"report        | logical {report['logical_bytes'] / MIB:.0f} MiB ; unique files {report['unique_file_bytes'] / MIB:.0f} MiB ; "
+            f"stored {report['stored_bytes'] / MIB:.0f} MiB in {report['chunks']} chunks ; dedup ratio {report['dedup_ratio']}"
+        )
+
+        for group in files.values():
+            for _, digest, _ in group:
+                await store.release(digest)
+        for _, digest, _ in files["original"]:
+            await store.release(digest)
+
+        started_at = time.perf_counter()
+        manifests, chunks = await store.collect()
+        print(f"gc            | {time.perf_counter() - started_at:>7.2f} s | manifests {manifests} ; chunks {chunks}")
+        print(store.stats())
+    finally:
+        await store.stop()
+        async with bench_engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await bench_engine.dispose()
+        await engine.dispose()
+        shutil.rmtree(args.dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=8)
+    parser.add_argument("--clip-mib", type=int, default=256)
+    parser.add_argument("--dir", default="/tmp/blob_bench")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,74 @@
+#
+# Runtime and peak memory of the related videos job (jobs/related_videos.py)
+# on synthetic likes: --likes pairs between --users and --videos with skewed
+# (power law like) popularity on both sides, so a few videos and users carry
+# most of the likes, as in real data. Loading from postgres is replaced by the
+# generated arrays, every later stage is the job's own code. Peak memory is
+# the tracemalloc peak of each stage (numpy and scipy buffers are traced)
+# and the process max RSS at the end.
+#
+# Run from the service root:
+#   poetry run python benchmarks/related_videos_bench.py [--likes 20000000] [--users 2000000] [--videos 500000]
+#
+import tracemalloc
+import argparse
+import resource
+import pathlib
+import time
+import sys
+import os
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "video_service"))
+
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+from globals import (
+    RELATED_VIDEOS_TOP_K, RELATED_VIDEOS_BLOCK_SIZE, RELATED_VIDEOS_MAX_BLOCK_NNZ, RELATED_VIDEOS_MIN_COMMON_LIKES,
+    RELATED_VIDEOS_MAX_USER_LIKES
+)
+from jobs.related_videos import like_matrix, drop_heavy_users, top_k_similar
+import numpy as np
+
+
+def stage(name: str, func, *args):
+    tracemalloc.reset_peak()
+    started_at = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started_at
+    print(f"{name:<10} {elapsed:>8.1f} s | peak {tracemalloc.get_traced_memory()[1] / 2 ** 20:>8.0f} MiB", flush=True)
+    return result
+
+
+def synthetic_likes(likes: int, users: int, videos: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    user_ids = (users * rng.random(likes, dtype=np.float32) ** 2).astype(np.int32)
+    video_ids = (videos * rng.random(likes, dtype=np.float32) ** 3).astype(np.int32)
+    return (user_ids, video_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--likes", type=int, default=20_000_000)
+    parser.add_argument("--users", type=int, default=2_000_000)
+    parser.add_argument("--videos", type=int, default=500_000)
+    parser.add_argument("--top-k", type=int, default=RELATED_VIDEOS_TOP_K)
+    parser.add_argument("--block-size", type=int, default=RELATED_VIDEOS_BLOCK_SIZE)
+    parser.add_argument("--max-block-nnz", type=int, default=RELATED_VIDEOS_MAX_BLOCK_NNZ)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    print(f"{args.likes} likes, {args.users} users, {args.videos} videos, top {args.top_k}, blocks of {args.block_size} / {args.max_block_nnz} entries")
+
+    users, videos = stage("generate", synthetic_likes, args.likes, args.users, args.videos, args.seed)
+    matrix = stage("matrix", like_matrix, users, videos, args.users, args.videos)
+    del users, videos
+    matrix = stage("filter", drop_heavy_users, matrix, RELATED_VIDEOS_MAX_USER_LIKES)
+    neighbours = stage(
+        "top k", top_k_similar, matrix, args.top_k, args.block_size, args.max_block_nnz, RELATED_VIDEOS_MIN_COMMON_LIKES
+    )
+
+    covered = np.count_nonzero(neighbours[:, 0] >= 0)
+    print(f"distinct likes {matrix.nnz} ; videos with neighbours {covered}")
+    print(f"max rss {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
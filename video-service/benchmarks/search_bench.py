@@ -0,0 +1,166 @@
+#
+# Latency of the video name search (services/video_search_service.py) on a
+# synthetic table of --rows videos, 10M by default. The table lives in its
+# own schema (search_bench) with the same generated tsvector column and GIN
+# indexes as the migration, so service data is never touched; it is created
+# once and reused by later runs of the same size.
+#
+# Every query is run --repeats times for the first page and for the page
+# --depth cursors deep, p50/p95/max are printed in ms. Only the ranking query
+# is measured: hydrating a page is primary key lookups whatever the table size.
+#
+# Run from the service root against a disposable postgres (DB_* variables as
+# for the service, the pg_trgm extension must be available):
+#   poetry run python benchmarks/search_bench.py [--rows 10000000] [--repeats 20] [--depth 5] [--explain]
+#
+import statistics
+import argparse
+import pathlib
+import asyncio
+import time
+import sys
+import os
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "video_service"))
+
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+from globals import VIDEO_SEARCH_WORD_SIMILARITY_THRESHOLD
+from services.video_search_service import FIRST_PAGE, NEXT_PAGE, SET_SIMILARITY_THRESHOLD, normalize_query
+from config.db_conf import engine
+from sqlalchemy import text
+
+SCHEMA = "search_bench"
+PAGE_SIZE = 20
+LOAD_BATCH_SIZE = 1_000_000
+
+# Frequent words are picked far more often than rare ones (random()^3), the
+# last token of every name is unique-ish, as episode numbers and channel tags are
+WORDS = [
+    "смешные", "коты", "котики", "собака", "музыка", "обзор", "игра", "прохождение", "рецепт", "торт",
+    "новости", "футбол", "гол", "лучшие", "моменты", "стрим", "подкаст", "интервью", "урок", "python",
+    "гитара", "кавер", "клип", "путешествие", "горы", "море", "машина", "ремонт", "дача", "огород",
+    "minecraft", "speedrun", "tutorial", "review", "unboxing", "vlog", "trailer", "music", "live", "cats"
+]
+
+QUERIES = [
+    ("frequent word", "коты"),
+    ("two words", "смешные коты"),
+    ("phrase", "\"лучшие моменты\""),
+    ("rare word", "огород"),
+    ("typo", "прохаждение"),
+    ("latin typo", "minecraf speedrn"),
+    ("no match", "квантовая хромодинамика")
+]
+
+
+async def prepare(rows: int):
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+        exists = (await conn.execute(text(f"SELECT to_regclass('{SCHEMA}.videos') IS NOT NULL"))).scalar()
+        if exists and (await conn.execute(text(f"SELECT count(*) FROM {SCHEMA}.videos"))).scalar() == rows:
+            return
+
+        await conn.execute(text(f"DROP TABLE IF EXISTS {SCHEMA}.videos"))
+        await conn.execute(text(f"""
+            CREATE TABLE {SCHEMA}.videos (
+                id uuid PRIMARY KEY,
+                name varchar NOT NULL,
+                name_tsv tsvector GENERATED ALWAYS AS (to_tsvector('russian', name)) STORED
+            )
+        """))
+
+    words = "ARRAY[" + ", ".join(f"'{word}'" for word in WORDS) + "]"
+    pick = f"({words})[1 + floor(power(random(), 3) * {len(WORDS)})::int]"
+
+    for start in range(0, rows, LOAD_BATCH_SIZE):
+        started_at = time.perf_counter()
+        async with engine.begin() as conn:
+            await conn.execute(text(f"""
+                INSERT INTO {SCHEMA}.videos (id, name)
+                SELECT gen_random_uuid(), {pick} || ' ' || {pick} || ' ' || {pick} || ' ' || substr(md5(i::text), 1, 6)
+                FROM generate_series({start + 1}, {min(start + LOAD_BATCH_SIZE, rows)}) i
+            """))
+        print(f"loaded {min(start + LOAD_BATCH_SIZE, rows):>10} rows | {time.perf_counter() - started_at:.1f} s", flush=True)
+
+    started_at = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.execute(text(f"CREATE INDEX ON {SCHEMA}.videos USING gin (name_tsv)"))
+        await conn.execute(text(f"CREATE INDEX ON {SCHEMA}.videos USING gin (name gin_trgm_ops)"))
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"VACUUM ANALYZE {SCHEMA}.videos"))
+    print(f"indexed | {time.perf_counter() - started_at:.1f} s")
+
+
+async def run_page(conn, query: str, after) -> tuple[float, tuple | None]:
+    params = {"text": query, "limit": PAGE_SIZE + 1}
+    statement = FIRST_PAGE
+    if after is not None:
+        params.update(score=after[0], video_id=after[1])
+        statement = NEXT_PAGE
+
+    started_at = time.perf_counter()
+    rows = (await conn.execute(statement, params)).all()
+    elapsed = (time.perf_counter() - started_at) * 1000
+
+    return (elapsed, (rows[PAGE_SIZE - 1].score, rows[PAGE_SIZE - 1].id) if len(rows) > PAGE_SIZE else None)
+
+
+def summary(timings: list[float]) -> str:
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return f"p50 {statistics.median(timings):>8.1f} | p95 {p95:>8.1f} | max {timings[-1]:>8.1f}"
+
+
+async def main(args):
+    if engine is None:
+        sys.exit("DB_* variables are not set")
+
+    await prepare(args.rows)
+
+    async with engine.connect() as conn:
+        await conn.execute(text(f"SET search_path TO {SCHEMA}, public"))
+
+        print(f"\n{args.rows} videos, page of {PAGE_SIZE}, times in ms")
+        for label, query in QUERIES:
+            query = normalize_query(query)
+            first, deep = [], []
+
+            for _ in range(args.repeats):
+                await conn.execute(SET_SIMILARITY_THRESHOLD, {"threshold": str(VIDEO_SEARCH_WORD_SIMILARITY_THRESHOLD)})
+                elapsed, after = await run_page(conn, query, None)
+                first.append(elapsed)
+
+                for _ in range(args.depth):
+                    if after is None:
+                        break
+                    elapsed, after = await run_page(conn, query, after)
+                else:
+                    deep.append(elapsed)
+                await conn.commit()
+
+            print(f"{label:<14} first | {summary(first)}")
+            if len(deep) != 0:
+                print(f"{'':<14} +{args.depth:<4} | {summary(deep)}")
+
+            if args.explain:
+                plan = await conn.execute(
+                    text("EXPLAIN (ANALYZE, BUFFERS) " + FIRST_PAGE.text), {"text": query, "limit": PAGE_SIZE + 1}
+                )
+                print("\n".join(f"    {line}" for (line,) in plan))
+                await conn.commit()
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--explain", action="store_true")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,124 @@
+#
+# Write throughput of resumable uploads (config/upload_store.py) against the
+# disk they land on. The upload is fed as a stream of --chunk-size pieces,
+# 64 KiB by default as uvicorn hands over request bodies, and compared with:
+#   disk   - plain sequential os.write of the same pieces plus one fdatasync
+#   sha256 - hashing the same bytes in memory
+# An upload can't beat the slower of the two, the store overlaps them.
+#
+# Run from the service root against a disposable redis (REDIS_* variables as
+# for the service), files go to --dir and are removed afterwards:
+#   poetry run python benchmarks/upload_bench.py [--size-mib 2048] [--chunk-size 65536] [--dir /tmp/upload_bench]
+#
+import argparse
+import hashlib
+import pathlib
+import asyncio
+import shutil
+import time
+import uuid
+import sys
+import os
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "video_service"))
+
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+from globals import UPLOAD_TTL_SECONDS, UPLOAD_WRITE_BUFFER_SIZE, UPLOAD_CHECKPOINT_SIZE, UPLOAD_SWEEP_INTERVAL_SECONDS
+from config.upload_store import UploadStore
+from config.redis_conf import redis_client
+
+MIB = 1024 ** 2
+
+
+# New bytes objects of chunk_size, as a server hands them over, cycling through block
+def pieces(block: bytes, size: int, chunk_size: int):
+    sent = 0
+    while sent < size:
+        position = sent % len(block)
+        piece = min(chunk_size, size - sent, len(block) - position)
+        yield block[position:position + piece]
+        sent += piece
+
+
+async def stream(block: bytes, size: int, chunk_size: int):
+    for piece in pieces(block, size, chunk_size):
+        yield piece
+
+
+def disk_baseline(path: str, block: bytes, size: int, chunk_size: int) -> float:
+    started_at = time.perf_counter()
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        for piece in pieces(block, size, chunk_size):
+            os.write(fd, piece)
+        os.fdatasync(fd)
+    finally:
+        os.close(fd)
+    elapsed = time.perf_counter() - started_at
+
+    os.remove(path)
+    return elapsed
+
+
+def hash_baseline(block: bytes, size: int, chunk_size: int) -> float:
+    started_at = time.perf_counter()
+    hasher = hashlib.sha256()
+    for piece in pieces(block, size, chunk_size):
+        hasher.update(piece)
+    return time.perf_counter() - started_at
+
+
+async def upload(store: UploadStore, block: bytes, size: int, chunk_size: int) -> tuple[float, float]:
+    state = await store.create(uuid.uuid4(), "bench", size, "")
+
+    started_at = time.perf_counter()
+    await store.write(state, stream(block, size, chunk_size))
+    written_at = time.perf_counter()
+
+    state = await store.get(state.upload_id)
+    async with store.completing(state):
+        completed_at = time.perf_counter()
+        await store.discard(state.upload_id)
+    return (written_at - started_at, completed_at - written_at)
+
+
+def rate(size: int, elapsed: float) -> str:
+    return f"{elapsed:>7.2f} s | {size / MIB / elapsed:>8.1f} MiB/s"
+
+
+async def main(args):
+    os.makedirs(args.dir, exist_ok=True)
+    store = UploadStore(
+        redis_client=redis_client,
+        directory=args.dir,
+        ttl=UPLOAD_TTL_SECONDS,
+        write_buffer_size=UPLOAD_WRITE_BUFFER_SIZE,
+        checkpoint_size=UPLOAD_CHECKPOINT_SIZE,
+        sweep_interval=UPLOAD_SWEEP_INTERVAL_SECONDS
+    )
+
+    size = args.size_mib * MIB
+    block = os.urandom(64 * MIB)
+
+    print(f"{args.size_mib} MiB in pieces of {args.chunk_size} bytes, write buffer {UPLOAD_WRITE_BUFFER_SIZE // 1024} KiB")
+    print(f"disk     | {rate(size, disk_baseline(os.path.join(args.dir, 'baseline'), block, size, args.chunk_size))}")
+    print(f"sha256   | {rate(size, hash_baseline(block, size, args.chunk_size))}")
+
+    written, completed = await upload(store, block, size, args.chunk_size)
+    print(f"upload   | {rate(size, written)}")
+    print(f"finish   | {completed * 1000:>7.1f} ms")
+    print(store.stats())
+
+    await redis_client.aclose()
+    shutil.rmtree(args.dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mib", type=int, default=2048)
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024)
+    parser.add_argument("--dir", default="/tmp/upload_bench")
+
+    asyncio.run(main(parser.parse_args()))
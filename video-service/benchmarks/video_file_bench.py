@@ -0,0 +1,205 @@
+#
+# Throughput and server CPU cost of serving a stored video file
+# (config/video_files.py). A --size-mib random file is cut into chunks as
+# the blob store does and served from a child process to --streams
+# concurrent clients, each downloading the whole file --repeats times:
+#   read      - starlette FileResponse of the original file, read() into python buffers
+#   mmap      - VideoFileResponse under uvicorn, slices of mapped chunks
+#   sendfile  - the chunk ranges sent with sendfile from a bare asyncio server,
+#               what a server offering zerocopysend does with VideoFileResponse
+# Server CPU (user + system, from /proc) is reported per Gbit sent. Files
+# are read from the page cache, the disk is not measured. Clients run on
+# the same machine and compete for the same cores.
+#
+# Run from the service root, files go to --dir and are removed afterwards:
+#   poetry run python benchmarks/video_file_bench.py [--size-mib 1024] [--streams 4] [--repeats 2] [--dir /tmp/video_file_bench]
+#
+import multiprocessing
+import threading
+import argparse
+import hashlib
+import pathlib
+import asyncio
+import socket
+import shutil
+import time
+import sys
+import os
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "video_service"))
+
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+from globals import BLOB_CHUNK_MIN_SIZE, BLOB_CHUNK_AVG_SIZE, BLOB_CHUNK_MAX_SIZE
+from config.blob_store import BlobStore, Manifest, chunk_boundaries, pack_chunks, to_manifest
+from config.video_files import VideoFileResponse
+from starlette.responses import FileResponse
+import numpy as np
+import uvicorn
+
+MIB = 1024 ** 2
+HOST = "127.0.0.1"
+PORT = 18095
+RECEIVE_BUFFER_SIZE = MIB
+MODES = ["read", "mmap", "sendfile"]
+
+
+def store_file(store: BlobStore, path: str) -> Manifest:
+    with open(path, "rb") as file:
+        data = file.read()
+
+    chunks, start = [], 0
+    for end in chunk_boundaries(np.frombuffer(data, dtype=np.uint8), BLOB_CHUNK_MIN_SIZE, BLOB_CHUNK_AVG_SIZE, BLOB_CHUNK_MAX_SIZE):
+        digest = hashlib.sha256(data[start:end]).digest()
+        chunk_path = store.chunk_path(digest)
+        os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+        with open(chunk_path, "wb") as chunk:
+            chunk.write(data[start:end])
+        chunks.append((digest, end - start))
+        start = end
+
+    return to_manifest(hashlib.sha256(data).digest(), len(data), pack_chunks(chunks))
+
+
+async def sendfile_server(store: BlobStore, manifest: Manifest):
+    header = (
+        f"HTTP/1.1 200 OK\r\ncontent-length: {manifest.size}\r\ncontent-type: video/mp4\r\nconnection: close\r\n\r\n"
+    ).encode()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            # wait_for_server connects and closes without a request
+            writer.close()
+            return
+
+        writer.write(header)
+        await writer.drain()
+
+        loop = asyncio.get_running_loop()
+        for chunk_digest, offset, length in manifest.ranges(0, manifest.size):
+            with open(store.chunk_path(chunk_digest), "rb") as file:
+                await loop.sendfile(writer.transport, file, offset, length)
+
+        writer.close()
+
+    server = await asyncio.start_server(handle, HOST, PORT)
+    async with server:
+        await server.serve_forever()
+
+
+def serve(mode: str, store: BlobStore, manifest: Manifest, path: str):
+    if mode == "sendfile":
+        asyncio.run(sendfile_server(store, manifest))
+        return
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        if mode == "read":
+            response = FileResponse(path, media_type="video/mp4")
+        else:
+            response = VideoFileResponse(
+                store, manifest, 0, manifest.size, 200, {"content-length": str(manifest.size)}, "video/mp4", lambda: None
+            )
+        await response(scope, receive, send)
+
+    uvicorn.run(app, host=HOST, port=PORT, log_level="warning", lifespan="off")
+
+
+def download(size: int, repeats: int, errors: list):
+    buffer = bytearray(RECEIVE_BUFFER_SIZE)
+    for _ in range(repeats):
+        with socket.create_connection((HOST, PORT)) as sock:
+            sock.sendall(f"GET /file HTTP/1.1\r\nhost: {HOST}\r\nconnection: close\r\n\r\n".encode())
+            received = 0
+            while (count := sock.recv_into(buffer)) != 0:
+                received += count
+
+        # Headers are a few hundred bytes on top of the body
+        if not size < received < size + 1024:
+            errors.append(received)
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def wait_for_server():
+    for _ in range(200):
+        try:
+            socket.create_connection((HOST, PORT)).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Server did not start")
+
+
+def run(mode: str, store: BlobStore, manifest: Manifest, path: str, streams: int, repeats: int):
+    server = multiprocessing.get_context("fork").Process(target=serve, args=(mode, store, manifest, path), daemon=True)
+    server.start()
+    try:
+        wait_for_server()
+        # One download first, the page cache and the server are warm for all modes
+        download(manifest.size, 1, [])
+
+        errors = []
+        clients = [threading.Thread(target=download, args=(manifest.size, repeats, errors)) for _ in range(streams)]
+        cpu_before = cpu_seconds(server.pid)
+        started_at = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - started_at
+        cpu = cpu_seconds(server.pid) - cpu_before
+    finally:
+        server.terminate()
+        server.join()
+
+    sent = manifest.size * streams * repeats
+    gbits = sent * 8 / 1e9
+    print(
+        f"{mode:<9}| {elapsed:>7.2f} s | {sent / MIB / elapsed:>8.1f} MiB/s | {gbits / elapsed:>6.2f} Gbit/s | "
+        f"server cpu {cpu:>6.2f} s, {cpu / gbits:.3f} s/Gbit" + (f" | bad downloads {errors}" if len(errors) != 0 else "")
+    )
+
+
+def main(args):
+    os.makedirs(args.dir, exist_ok=True)
+    path = os.path.join(args.dir, "source")
+    with open(path, "wb") as file:
+        for _ in range(args.size_mib):
+            file.write(os.urandom(MIB))
+
+    store = BlobStore(
+        engine=None,
+        directory=os.path.join(args.dir, "blobs"),
+        min_chunk_size=BLOB_CHUNK_MIN_SIZE,
+        avg_chunk_size=BLOB_CHUNK_AVG_SIZE,
+        max_chunk_size=BLOB_CHUNK_MAX_SIZE,
+        gc_interval=3600,
+        gc_batch_size=1
+    )
+    try:
+        manifest = store_file(store, path)
+        print(f"{args.size_mib} MiB in {len(manifest.chunks)} chunks, {args.streams} streams x {args.repeats} downloads")
+        for mode in args.modes:
+            run(mode, store, manifest, path, args.streams, args.repeats)
+    finally:
+        shutil.rmtree(args.dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mib", type=int, default=1024)
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--dir", default="/tmp/video_file_bench")
+
+    main(parser.parse_args())
@@ -0,0 +1,569 @@
+from globals import (
+    BLOB_DIR, BLOB_CHUNK_MIN_SIZE, BLOB_CHUNK_AVG_SIZE, BLOB_CHUNK_MAX_SIZE, BLOB_GC_INTERVAL_SECONDS, BLOB_GC_BATCH_SIZE
+)
+from sqlalchemy.ext.asyncio import AsyncEngine
+from log.loggers import BLOB_STORE_LOGGER
+from sqlalchemy.exc import SQLAlchemyError
+from dataclasses import dataclass
+from config.db_conf import engine
+from functools import lru_cache
+from sqlalchemy import text
+import numpy as np
+import hashlib
+import asyncio
+import bisect
+import errno
+import mmap
+import uuid
+import os
+
+#
+# Content-addressed video storage. A file is cut into chunks at positions
+# picked by its content, every chunk is stored once under its sha256 and the
+# file becomes a manifest: the list of its chunks, itself addressed by the
+# sha256 of the whole file. A re-upload of the same file only references the
+# existing manifest; a trimmed, extended or spliced copy shares every chunk
+# outside the edited region, as cut points move with the content.
+#
+# Chunk boundaries come from a rolling hash over the last WINDOW_SIZE bytes,
+# sum(b[i - k] * M^k) mod 2^32. Computed as a difference of prefix sums it
+# is a handful of vectorized passes over the file whatever the window. The
+# cut is chosen as in FastCDC's normalized chunking: a stricter mask below
+# the average size, a looser one above it, hard min and max sizes.
+#
+# Postgres holds the reference counts: manifests count the videos pointing
+# at them, chunks count their occurrences in manifests. An upload copies the
+# chunks that have no file yet to temporary files before it opens a
+# transaction, then references its chunks and, with their rows locked,
+# renames those files into place; the garbage collector only deletes rows
+# (and then files) still at zero.
+#
+
+WINDOW_SIZE = 64
+SEGMENT_SIZE = 4 * 1024 ** 2
+MULTIPLIER = 0x9E3779B1
+# Manifest record: chunk sha256 and chunk size
+RECORD_SIZE = 40
+
+ADD_MANIFEST_REF = text("UPDATE blob_manifests SET ref_count = ref_count + 1 WHERE digest = :digest RETURNING digest")
+
+INSERT_MANIFEST = text("""
+INSERT INTO blob_manifests (digest, size, chunks, ref_count) VALUES (:digest, :size, :chunks, 1)
+ON CONFLICT (digest) DO NOTHING
+RETURNING digest
+""")
+
+SELECT_MANIFEST = text("SELECT size, chunks FROM blob_manifests WHERE digest = :digest")
+
+RELEASE_MANIFEST = text("UPDATE blob_manifests SET ref_count = ref_count - 1 WHERE digest = :digest AND ref_count > 0")
+
+# xmax is 0 for a row this statement inserted, non zero for an updated one
+ADD_CHUNK_REFS = text("""
+INSERT INTO blob_chunks (digest, size, ref_count)
+SELECT * FROM unnest(CAST(:digests AS bytea[]), CAST(:sizes AS integer[]), CAST(:counts AS bigint[]))
+ON CONFLICT (digest) DO UPDATE SET ref_count = blob_chunks.ref_count + EXCLUDED.ref_count
+RETURNING digest, xmax = 0 AS inserted
+""")
+
+DELETE_MANIFESTS = text("""
+DELETE FROM blob_manifests WHERE digest IN (
+    SELECT digest FROM blob_manifests WHERE ref_count = 0 LIMIT :limit FOR UPDATE SKIP LOCKED
+)
+RETURNING chunks
+""")
+
+LOCK_CHUNKS = text("SELECT digest FROM blob_chunks WHERE digest = ANY(CAST(:digests AS bytea[])) ORDER BY digest FOR UPDATE")
+
+RELEASE_CHUNKS = text("""
+UPDATE blob_chunks SET ref_count = blob_chunks.ref_count - d.count
+FROM (SELECT unnest(CAST(:digests AS bytea[])) AS digest, unnest(CAST(:counts AS bigint[])) AS count) d
+WHERE blob_chunks.digest = d.digest
+""")
+
+DELETE_CHUNKS = text("""
+DELETE FROM blob_chunks WHERE digest IN (
+    SELECT digest FROM blob_chunks WHERE ref_count = 0 LIMIT :limit FOR UPDATE SKIP LOCKED
+)
+RETURNING digest, size
+""")
+
+REPORT = text("""
+SELECT
+    (SELECT CAST(coalesce(sum(ref_count), 0) AS bigint) FROM blob_manifests) AS files,
+    (SELECT CAST(coalesce(sum(size * ref_count), 0) AS bigint) FROM blob_manifests) AS logical_bytes,
+    (SELECT count(*) FROM blob_manifests WHERE ref_count > 0) AS unique_files,
+    (SELECT CAST(coalesce(sum(size), 0) AS bigint) FROM blob_manifests WHERE ref_count > 0) AS unique_file_bytes,
+    (SELECT count(*) FROM blob_chunks WHERE ref_count > 0) AS chunks,
+    (SELECT CAST(coalesce(sum(size), 0) AS bigint) FROM blob_chunks WHERE ref_count > 0) AS stored_bytes
+""")
+
+
+@lru_cache(maxsize=1)
+def position_powers() -> tuple[np.ndarray, np.ndarray]:
+    count = SEGMENT_SIZE + WINDOW_SIZE
+    powers = np.full(count, MULTIPLIER, dtype=np.uint32)
+    inverse_powers = np.full(count, pow(MULTIPLIER, -1, 2 ** 32), dtype=np.uint32)
+    powers[0] = inverse_powers[0] = 1
+    # uint32 products wrap, which is the arithmetic mod 2^32 the hash is defined in
+    return (np.multiply.accumulate(powers, dtype=np.uint32), np.multiply.accumulate(inverse_powers, dtype=np.uint32))
+
+
+#
+# Positions (exclusive ends) where the rolling hash is below 2^(32 - bits),
+# ascending, with the hash at each of them
+#
+def boundary_candidates(data: np.ndarray, bits: int) -> tuple[np.ndarray, np.ndarray]:
+    powers, inverse_powers = position_powers()
+    limit = np.uint32(1 << (32 - bits))
+    sums = np.empty(SEGMENT_SIZE + WINDOW_SIZE, dtype=np.uint32)
+    hashes = np.empty(SEGMENT_SIZE, dtype=np.uint32)
+    positions, values = [], []
+
+    for start in range(0, len(data), SEGMENT_SIZE):
+        # Every segment starts with the window before it, hashes are positional within the segment
+        low = max(0, start - (WINDOW_SIZE - 1))
+        segment = data[low:start + SEGMENT_SIZE]
+        count = len(segment)
+        if count < WINDOW_SIZE:
+            continue
+
+        # sums[i] = sum(b[j] * M^-j for j <= i) ; hash[i] = M^i * (sums[i] - sums[i - W])
+        prefix = sums[:count]
+        np.multiply(inverse_powers[:count], segment, out=prefix)
+        np.cumsum(prefix, out=prefix)
+
+        window = hashes[:count - WINDOW_SIZE + 1]
+        window[0] = prefix[WINDOW_SIZE - 1]
+        np.subtract(prefix[WINDOW_SIZE:], prefix[:count - WINDOW_SIZE], out=window[1:])
+        np.multiply(window, powers[WINDOW_SIZE - 1:count], out=window)
+
+        found = np.flatnonzero(window < limit)
+        positions.append(found + low + WINDOW_SIZE)
+        values.append(window[found])
+
+    if len(positions) == 0:
+        return (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint32))
+    return (np.concatenate(positions), np.concatenate(values))
+
+
+#
+# Chunk ends of data, the last one is len(data)
+#
+def chunk_boundaries(data: np.ndarray, min_size: int, avg_size: int, max_size: int) -> list[int]:
+    avg_bits = avg_size.bit_length() - 1
+    loose, hashes = boundary_candidates(data, avg_bits - 2)
+    strict = loose[hashes < np.uint32(1 << (32 - avg_bits - 2))]
+
+    size = len(data)
+    boundaries = []
+    last = 0
+
+    while last < size:
+        low, middle, high = last + min_size, min(last + avg_size, size), min(last + max_size, size)
+
+        if low >= size:
+            cut = size
+        else:
+            index = np.searchsorted(strict, low)
+            if index < len(strict) and strict[index] < middle:
+                cut = int(strict[index])
+            else:
+                index = np.searchsorted(loose, max(low, middle))
+                cut = int(loose[index]) if index < len(loose) and loose[index] < high else high
+
+        boundaries.append(cut)
+        last = cut
+
+    return boundaries
+
+
+def pack_chunks(chunks: list[tuple[bytes, int]]) -> bytes:
+    return b"".join(digest + size.to_bytes(8, "big") for digest, size in chunks)
+
+
+def unpack_chunks(packed: bytes) -> list[tuple[bytes, int]]:
+    return [
+        (packed[offset:offset + 32], int.from_bytes(packed[offset + 32:offset + RECORD_SIZE], "big"))
+        for offset in range(0, len(packed), RECORD_SIZE)
+    ]
+
+
+@dataclass
+class Manifest:
+    digest: bytes
+    size: int
+    chunks: list[bytes]
+    # ends[i] is the file offset right after chunks[i]
+    ends: list[int]
+
+    #
+    # (chunk digest, offset in the chunk, length) covering [start, end) of the file
+    #
+    def ranges(self, start: int, end: int) -> list[tuple[bytes, int, int]]:
+        ranges = []
+        index = bisect.bisect_right(self.ends, start)
+
+        while start < end and index < len(self.chunks):
+            chunk_start = self.ends[index - 1] if index > 0 else 0
+            stop = min(end, self.ends[index])
+            ranges.append((self.chunks[index], start - chunk_start, stop - start))
+            start = stop
+            index += 1
+
+        return ranges
+
+
+def to_manifest(digest: bytes, size: int, packed: bytes) -> Manifest:
+    chunks, ends, end = [], [], 0
+    for chunk_digest, chunk_size in unpack_chunks(packed):
+        end += chunk_size
+        chunks.append(chunk_digest)
+        ends.append(end)
+
+    return Manifest(digest=digest, size=size, chunks=chunks, ends=ends)
+
+
+class BlobStore:
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        directory: str,
+        min_chunk_size: int,
+        avg_chunk_size: int,
+        max_chunk_size: int,
+        gc_interval: float,
+        gc_batch_size: int
+    ):
+        self.__engine = engine
+        self.__directory = directory
+        self.__min_chunk_size = min_chunk_size
+        self.__avg_chunk_size = avg_chunk_size
+        self.__max_chunk_size = max_chunk_size
+        self.__gc_interval = gc_interval
+        self.__gc_batch_size = gc_batch_size
+
+        self.__collector: asyncio.Task | None = None
+
+        self.__files = 0
+        self.__deduplicated_files = 0
+        self.__chunks = 0
+        self.__deduplicated_chunks = 0
+        self.__written_bytes = 0
+        self.__collected_chunks = 0
+        self.__collected_bytes = 0
+
+    def chunk_path(self, digest: bytes) -> str:
+        name = digest.hex()
+        return os.path.join(self.__directory, "chunks", name[:2], name[2:4], name)
+
+    #
+    # Stores the file at path under its sha256 (digest) and takes one
+    # reference on the manifest, release() gives it back. The file is
+    # only read; the caller removes it afterwards.
+    #
+    async def put(self, path: str, digest: bytes) -> bytes:
+        async with self.__engine.begin() as conn:
+            if (await conn.execute(ADD_MANIFEST_REF, {"digest": digest})).first() is not None:
+                self.__deduplicated_files += 1
+                return digest
+
+        size, chunks = await asyncio.to_thread(self.__chunk_file, path)
+
+        counts: dict[bytes, int] = {}
+        sizes: dict[bytes, int] = {}
+        for chunk_digest, _, chunk_size in chunks:
+            counts[chunk_digest] = counts.get(chunk_digest, 0) + 1
+            sizes[chunk_digest] = chunk_size
+        # Rows are locked in digest order here and in the collector, so the two never deadlock
+        digests = sorted(counts)
+
+        first_offsets: dict[bytes, int] = {}
+        for chunk_digest, offset, _ in chunks:
+            first_offsets.setdefault(chunk_digest, offset)
+        unique_chunks = [(chunk_digest, first_offsets[chunk_digest], sizes[chunk_digest]) for chunk_digest in digests]
+
+        # The copying and syncing happen before any row is locked
+        temporaries = await asyncio.to_thread(self.__stage_chunks, path, unique_chunks)
+        written = sum(sizes[chunk_digest] for chunk_digest in temporaries)
+
+        try:
+            async with self.__engine.begin() as conn:
+                manifest = {"digest": digest, "size": size, "chunks": pack_chunks([(d, s) for d, _, s in chunks])}
+                if (await conn.execute(INSERT_MANIFEST, manifest)).first() is None:
+                    # The same file was stored by a concurrent upload
+                    await conn.execute(ADD_MANIFEST_REF, {"digest": digest})
+                    self.__deduplicated_files += 1
+                    return digest
+
+                rows = (await conn.execute(ADD_CHUNK_REFS, {
+                    "digests": digests,
+                    "sizes": [sizes[d] for d in digests],
+                    "counts": [counts[d] for d in digests]
+                })).all()
+                inserted = {chunk_digest for chunk_digest, is_new in rows if is_new}
+
+                written += await asyncio.to_thread(self.__place_chunks, path, unique_chunks, temporaries)
+        finally:
+            if len(temporaries) != 0:
+                await asyncio.to_thread(self.__remove_files, list(temporaries.values()))
+
+        self.__files += 1
+        self.__chunks += len(digests)
+        self.__deduplicated_chunks += len(digests) - len(inserted)
+        self.__written_bytes += written
+        BLOB_STORE_LOGGER.info(
+            f"File is stored | {digest.hex()} ; {size} bytes ; chunks {len(chunks)} ; "
+            f"new chunks {len(inserted)} ; written {written} bytes"
+        )
+        return digest
+
+    async def release(self, digest: bytes):
+        async with self.__engine.begin() as conn:
+            await conn.execute(RELEASE_MANIFEST, {"digest": digest})
+
+    async def manifest(self, digest: bytes) -> Manifest | None:
+        async with self.__engine.connect() as conn:
+            row = (await conn.execute(SELECT_MANIFEST, {"digest": digest})).first()
+
+        return to_manifest(digest, row.size, row.chunks) if row is not None else None
+
+    #
+    # Writes [start, end) of the file to fd chunk by chunk with sendfile,
+    # the bytes never pass through python. Blocking, run it in a thread.
+    #
+    def send(self, manifest: Manifest, fd: int, start: int = 0, end: int | None = None) -> int:
+        sent = 0
+
+        for chunk_digest, offset, length in manifest.ranges(start, manifest.size if end is None else end):
+            chunk_fd = os.open(self.chunk_path(chunk_digest), os.O_RDONLY)
+            try:
+                while length > 0:
+                    count = os.sendfile(fd, chunk_fd, offset, length)
+                    if count == 0:
+                        raise OSError(errno.EIO, f"Chunk {chunk_digest.hex()} is shorter than its manifest says")
+                    offset += count
+                    length -= count
+                    sent += count
+            finally:
+                os.close(chunk_fd)
+
+        return sent
+
+    #
+    # Drops manifests no video points at and then chunks no manifest
+    # contains, in batches. Returns (manifests, chunks) removed.
+    #
+    async def collect(self) -> tuple[int, int]:
+        manifests = chunks = 0
+
+        while True:
+            async with self.__engine.begin() as conn:
+                released = (await conn.execute(DELETE_MANIFESTS, {"limit": self.__gc_batch_size})).scalars().all()
+
+                counts: dict[bytes, int] = {}
+                for packed in released:
+                    for chunk_digest, _ in unpack_chunks(packed):
+                        counts[chunk_digest] = counts.get(chunk_digest, 0) + 1
+
+                if len(counts) != 0:
+                    digests = sorted(counts)
+                    await conn.execute(LOCK_CHUNKS, {"digests": digests})
+                    await conn.execute(RELEASE_CHUNKS, {"digests": digests, "counts": [counts[d] for d in digests]})
+
+            manifests += len(released)
+            if len(released) < self.__gc_batch_size:
+                break
+
+        while True:
+            # Files go while the rows are still locked: an upload bringing a chunk back waits and writes it again
+            async with self.__engine.begin() as conn:
+                deleted = (await conn.execute(DELETE_CHUNKS, {"limit": self.__gc_batch_size})).all()
+                await asyncio.to_thread(self.__remove_chunks, [chunk_digest for chunk_digest, _ in deleted])
+
+            chunks += len(deleted)
+            self.__collected_chunks += len(deleted)
+            self.__collected_bytes += sum(chunk_size for _, chunk_size in deleted)
+            if len(deleted) < self.__gc_batch_size:
+                break
+
+        if manifests != 0 or chunks != 0:
+            BLOB_STORE_LOGGER.info(f"Unreferenced blobs are collected | manifests {manifests} ; chunks {chunks}")
+        return (manifests, chunks)
+
+    #
+    # Logical bytes are what the videos add up to, stored bytes what the chunks take
+    #
+    async def report(self) -> dict:
+        async with self.__engine.connect() as conn:
+            row = (await conn.execute(REPORT)).one()
+
+        report = dict(row._mapping)
+        report["dedup_ratio"] = round(row.logical_bytes / row.stored_bytes, 3) if row.stored_bytes != 0 else None
+        return report
+
+    def stats(self) -> dict:
+        return {
+            "files": self.__files,
+            "deduplicated_files": self.__deduplicated_files,
+            "chunks": self.__chunks,
+            "deduplicated_chunks": self.__deduplicated_chunks,
+            "written_bytes": self.__written_bytes,
+            "collected_chunks": self.__collected_chunks,
+            "collected_bytes": self.__collected_bytes
+        }
+
+    async def start(self):
+        await asyncio.to_thread(os.makedirs, os.path.join(self.__directory, "chunks"), exist_ok=True)
+
+        if self.__collector is None and self.__engine is not None:
+            self.__collector = asyncio.create_task(self.__run())
+
+    async def stop(self):
+        if self.__collector is None:
+            return
+
+        self.__collector.cancel()
+        try:
+            await self.__collector
+        except asyncio.CancelledError:
+            pass
+
+        self.__collector = None
+
+    #
+    # Returns the file size and (digest, offset, size) of its chunks in order.
+    # The file is mapped, hashing and chunking read it in place.
+    #
+    def __chunk_file(self, path: str) -> tuple[int, list[tuple[bytes, int, int]]]:
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size == 0:
+                return (0, [])
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    boundaries = chunk_boundaries(
+                        np.frombuffer(view, dtype=np.uint8), self.__min_chunk_size, self.__avg_chunk_size, self.__max_chunk_size
+                    )
+
+                    chunks, start = [], 0
+                    for end in boundaries:
+                        chunks.append((hashlib.sha256(view[start:end]).digest(), start, end - start))
+                        start = end
+                finally:
+                    view.release()
+
+        return (size, chunks)
+
+    #
+    # Copies the chunks that have no file to temporary files next to where
+    # they go. Returns digest -> temporary file.
+    #
+    def __stage_chunks(self, path: str, chunks: list[tuple[bytes, int, int]]) -> dict[bytes, str]:
+        return self.__copy_chunks(path, [chunk for chunk in chunks if not os.path.exists(self.chunk_path(chunk[0]))])
+
+    #
+    # Runs with the chunk rows locked, so the collector can't remove a file
+    # any more. Chunks it removed since they were staged are copied now.
+    # Temporary files are taken out of temporaries once renamed, returns the
+    # bytes copied here.
+    #
+    def __place_chunks(self, path: str, chunks: list[tuple[bytes, int, int]], temporaries: dict[bytes, str]) -> int:
+        missing = [
+            chunk for chunk in chunks
+            if chunk[0] not in temporaries and not os.path.exists(self.chunk_path(chunk[0]))
+        ]
+        temporaries.update(self.__copy_chunks(path, missing))
+
+        for chunk_digest in list(temporaries):
+            os.replace(temporaries[chunk_digest], self.chunk_path(chunk_digest))
+            del temporaries[chunk_digest]
+
+        return sum(size for _, _, size in missing)
+
+    #
+    # Copies the chunks out of the source file in the kernel (copy_file_range,
+    # a reflink on filesystems that support it) to synced temporary files.
+    # Returns digest -> temporary file.
+    #
+    def __copy_chunks(self, path: str, chunks: list[tuple[bytes, int, int]]) -> dict[bytes, str]:
+        temporaries: dict[bytes, str] = {}
+        if len(chunks) == 0:
+            return temporaries
+
+        source = os.open(path, os.O_RDONLY)
+        try:
+            for chunk_digest, offset, size in chunks:
+                destination = self.chunk_path(chunk_digest)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                temporary = f"{destination}.{uuid.uuid4().hex}.tmp"
+
+                fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                temporaries[chunk_digest] = temporary
+                try:
+                    copy_range(source, fd, offset, size)
+                    os.fdatasync(fd)
+                finally:
+                    os.close(fd)
+        except BaseException:
+            self.__remove_files(list(temporaries.values()))
+            raise
+        finally:
+            os.close(source)
+
+        return temporaries
+
+    @staticmethod
+    def __remove_files(paths: list[str]):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def __remove_chunks(self, digests: list[bytes]):
+        self.__remove_files([self.chunk_path(chunk_digest) for chunk_digest in digests])
+
+    async def __run(self):
+        while True:
+            await asyncio.sleep(self.__gc_interval)
+
+            try:
+                await self.collect()
+            except (SQLAlchemyError, OSError) as ex:
+                BLOB_STORE_LOGGER.warning(f"Blob garbage collection failed | {ex}")
+
+
+def copy_range(source: int, destination: int, offset: int, size: int):
+    position = 0
+
+    try:
+        while position < size:
+            copied = os.copy_file_range(source, destination, size - position, offset + position, position)
+            if copied == 0:
+                raise OSError(errno.EIO, "Source file ended early")
+            position += copied
+        return
+    except OSError as ex:
+        # Not supported between these files (or filesystems), copy through sendfile
+        if ex.errno not in (errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.EINVAL):
+            raise
+
+    while position < size:
+        os.lseek(destination, position, os.SEEK_SET)
+        copied = os.sendfile(destination, source, offset + position, size - position)
+        if copied == 0:
+            raise OSError(errno.EIO, "Source file ended early")
+        position += copied
+
+
+blob_store = BlobStore(
+    engine=engine,
+    directory=BLOB_DIR,
+    min_chunk_size=BLOB_CHUNK_MIN_SIZE,
+    avg_chunk_size=BLOB_CHUNK_AVG_SIZE,
+    max_chunk_size=BLOB_CHUNK_MAX_SIZE,
+    gc_interval=BLOB_GC_INTERVAL_SECONDS,
+    gc_batch_size=BLOB_GC_BATCH_SIZE
+)
@@ -0,0 +1,345 @@
+from globals import (
+    LIKE_FLUSH_INTERVAL_SECONDS, LIKE_RECONCILE_INTERVAL_SECONDS, LIKE_RECONCILE_BATCH_SIZE, LIKE_COUNT_TTL_SECONDS
+)
+from sqlalchemy.ext.asyncio import AsyncEngine
+from log.loggers import LIKE_COUNTER_LOGGER
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from config.redis_conf import redis_client
+from config.db_conf import engine
+from redis.asyncio import Redis
+from sqlalchemy import text
+import asyncio
+import uuid
+
+#
+# Like counts are denormalized into videos.like_count with write-behind:
+# a like changes the association row (source of truth) and then, in one
+# redis script, the cached count and a hash of pending deltas. A background
+# task moves the deltas into postgres as one UPDATE per flush, reading a count
+# is one GET. Periodic reconciliation recounts the association table and
+# repairs whatever drift redis failures or crashes between the steps left.
+#
+# A like is counted by a recount as soon as it commits, its delta reaches the
+# column only when a flush applies it. Reconciliation therefore holds off
+# flushes (a postgres advisory lock, flushes share it from taking their deltas
+# until these are applied) and sets like_count to the recount less the deltas
+# still pending, so the flush after it does not count those likes twice.
+# It walks the videos in batches of ids, holding flushes off for one batch at
+# a time, and only one replica reconciles at once.
+#
+
+COUNT_KEY = "video_likes:count:{video_id}"
+DELTAS_KEY = "video_likes:deltas"
+# Deltas being flushed are moved aside under a unique name, several replicas may flush at once
+FLUSHING_KEY = "video_likes:deltas:flushing:{flush_id}"
+# Deltas left aside by a crashed flush are dropped, reconciliation recounts them
+FLUSHING_TTL_SECONDS = 3600
+# Any bigint not used by another advisory lock of the database
+FLUSH_LOCK_ID = 4207311
+# Held by the replica reconciling, the others skip their turn
+RECONCILE_LOCK_ID = 4207312
+
+# The cached count is only moved while it exists, a missing one is seeded from postgres on read
+INCREMENT_SCRIPT = """
+redis.call('HINCRBY', KEYS[2], ARGV[1], ARGV[2])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[2])
+end
+return false
+"""
+
+TAKE_DELTAS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {}
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return redis.call('HGETALL', KEYS[2])
+"""
+
+APPLY_DELTAS = text("""
+UPDATE videos SET like_count = videos.like_count + d.delta
+FROM (SELECT unnest(CAST(:video_ids AS uuid[])) AS id, unnest(CAST(:deltas AS bigint[])) AS delta) d
+WHERE videos.id = d.id
+""")
+
+LOCK_FLUSHES_SHARED = text("SELECT pg_advisory_xact_lock_shared(:lock_id)")
+LOCK_FLUSHES = text("SELECT pg_advisory_xact_lock(:lock_id)")
+TRY_LOCK_RECONCILE = text("SELECT pg_try_advisory_lock(:lock_id)")
+UNLOCK_RECONCILE = text("SELECT pg_advisory_unlock(:lock_id)")
+
+# Last id of the next batch of videos, NULL past the last video
+SELECT_BATCH_END = text("""
+SELECT id FROM (
+    SELECT id FROM videos
+    WHERE CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid)
+    ORDER BY id
+    LIMIT :batch_size
+) batch
+ORDER BY id DESC
+LIMIT 1
+""")
+
+# Videos of the batch whose column plus pending deltas is not the number of likes
+SELECT_DRIFTED = text("""
+SELECT v.id, count(l.users_id) AS like_count
+FROM videos v
+LEFT JOIN video_likes_association_table l ON l.video_id = v.id
+LEFT JOIN (
+    SELECT unnest(CAST(:video_ids AS uuid[])) AS id, unnest(CAST(:deltas AS bigint[])) AS delta
+) d ON d.id = v.id
+WHERE (CAST(:after AS uuid) IS NULL OR v.id > CAST(:after AS uuid)) AND v.id <= :last
+GROUP BY v.id, v.like_count, d.delta
+HAVING v.like_count + COALESCE(d.delta, 0) <> count(l.users_id)
+""")
+
+SET_COUNTS = text("""
+UPDATE videos SET like_count = c.like_count
+FROM (SELECT unnest(CAST(:video_ids AS uuid[])) AS id, unnest(CAST(:like_counts AS bigint[])) AS like_count) c
+WHERE videos.id = c.id
+""")
+
+SELECT_COUNT = text("SELECT like_count FROM videos WHERE id = :video_id")
+
+
+class LikeCounter:
+    def __init__(
+        self,
+        redis_client: Redis,
+        engine: AsyncEngine,
+        flush_interval: float,
+        reconcile_interval: float,
+        reconcile_batch_size: int,
+        count_ttl: int
+    ):
+        self.__redis = redis_client
+        self.__engine = engine
+        self.__flush_interval = flush_interval
+        self.__reconcile_interval = reconcile_interval
+        self.__reconcile_batch_size = reconcile_batch_size
+        self.__count_ttl = count_ttl
+
+        self.__increment = redis_client.register_script(INCREMENT_SCRIPT)
+        self.__take_deltas = redis_client.register_script(TAKE_DELTAS_SCRIPT)
+        self.__flusher: asyncio.Task | None = None
+
+        self.__flushes = 0
+        self.__flushed_videos = 0
+        self.__reconciled_videos = 0
+        self.__deferred_videos = 0
+        self.__lost_increments = 0
+
+    async def increment(self, video_id: uuid.UUID, delta: int):
+        try:
+            await self.__increment(
+                keys=[COUNT_KEY.format(video_id=video_id), DELTAS_KEY],
+                args=[str(video_id), delta]
+            )
+        except RedisError as ex:
+            # The like itself is committed, reconciliation brings the count back in line
+            self.__lost_increments += 1
+            LIKE_COUNTER_LOGGER.warning(f"Like count increment is lost | video {video_id} ; delta {delta} ; {ex}")
+
+    #
+    # A missed count is seeded from the column plus the deltas not flushed yet.
+    # A flush finishing in between can skew the seed, it lives for count_ttl.
+    #
+    async def get(self, video_id: uuid.UUID) -> int | None:
+        count_key = COUNT_KEY.format(video_id=video_id)
+
+        count = await self.__redis.get(count_key)
+        if count is not None:
+            return int(count)
+
+        async with self.__engine.connect() as conn:
+            like_count = (await conn.execute(SELECT_COUNT, {"video_id": video_id})).scalar()
+
+        if like_count is None:
+            return None
+
+        pending = await self.__redis.hget(DELTAS_KEY, str(video_id))
+        like_count += int(pending) if pending is not None else 0
+
+        # Increments racing with the seed win, NX keeps their result
+        if not await self.__redis.set(count_key, like_count, ex=self.__count_ttl, nx=True):
+            return int(await self.__redis.get(count_key) or like_count)
+
+        return like_count
+
+    def stats(self) -> dict:
+        return {
+            "flushes": self.__flushes,
+            "flushed_videos": self.__flushed_videos,
+            "reconciled_videos": self.__reconciled_videos,
+            "deferred_videos": self.__deferred_videos,
+            "lost_increments": self.__lost_increments
+        }
+
+    async def start(self):
+        if self.__flusher is None and self.__engine is not None:
+            self.__flusher = asyncio.create_task(self.__run())
+
+    async def stop(self):
+        if self.__flusher is None:
+            return
+
+        self.__flusher.cancel()
+        try:
+            await self.__flusher
+        except asyncio.CancelledError:
+            pass
+
+        self.__flusher = None
+
+        try:
+            await self.flush()
+        except (RedisError, SQLAlchemyError) as ex:
+            LIKE_COUNTER_LOGGER.warning(f"Final like count flush failed | {ex}")
+
+    async def flush(self):
+        # No postgres round trip while nothing is liked
+        if await self.__redis.exists(DELTAS_KEY) == 0:
+            return
+
+        flushing_key = FLUSHING_KEY.format(flush_id=uuid.uuid4())
+        video_ids, deltas = [], []
+
+        try:
+            async with self.__engine.begin() as conn:
+                await conn.execute(LOCK_FLUSHES_SHARED, {"lock_id": FLUSH_LOCK_ID})
+
+                raw_deltas = await self.__take_deltas(keys=[DELTAS_KEY, flushing_key], args=[FLUSHING_TTL_SECONDS])
+                if len(raw_deltas) == 0:
+                    return
+
+                for index in range(0, len(raw_deltas), 2):
+                    delta = int(raw_deltas[index + 1])
+                    if delta != 0:
+                        video_ids.append(uuid.UUID(raw_deltas[index].decode()))
+                        deltas.append(delta)
+
+                if len(video_ids) != 0:
+                    await conn.execute(APPLY_DELTAS, {"video_ids": video_ids, "deltas": deltas})
+        except SQLAlchemyError:
+            # Handed back to the next flush
+            async with self.__redis.pipeline(transaction=True) as pipe:
+                for video_id, delta in zip(video_ids, deltas):
+                    pipe.hincrby(DELTAS_KEY, str(video_id), delta)
+                pipe.delete(flushing_key)
+                await pipe.execute()
+            raise
+
+        await self.__redis.delete(flushing_key)
+
+        self.__flushes += 1
+        self.__flushed_videos += len(video_ids)
+
+    #
+    # Sets like_count to the real number of likes less the deltas still
+    # pending, the reconciled videos get their cached count dropped. A video
+    # liked while it is recounted may or may not have that like counted, it is
+    # left for the next reconciliation. Returns 0 without recounting while
+    # another replica reconciles.
+    #
+    async def reconcile(self) -> int:
+        reconciled, deferred = 0, 0
+
+        async with self.__engine.connect() as lock_conn:
+            # A session lock, released below, the batches commit on their own connections
+            if not (await lock_conn.execute(TRY_LOCK_RECONCILE, {"lock_id": RECONCILE_LOCK_ID})).scalar():
+                return 0
+            await lock_conn.commit()
+
+            try:
+                after = None
+                while True:
+                    last, batch_reconciled, batch_deferred = await self.__reconcile_batch(after)
+                    if last is None:
+                        break
+
+                    after = last
+                    reconciled += batch_reconciled
+                    deferred += batch_deferred
+            finally:
+                await lock_conn.execute(UNLOCK_RECONCILE, {"lock_id": RECONCILE_LOCK_ID})
+                await lock_conn.commit()
+
+        if reconciled != 0 or deferred != 0:
+            LIKE_COUNTER_LOGGER.warning(f"Like counts drifted and were reconciled | videos {reconciled} ; deferred {deferred}")
+
+        self.__reconciled_videos += reconciled
+        self.__deferred_videos += deferred
+        return reconciled
+
+    #
+    # Recounts the videos after the given id, up to reconcile_batch_size of
+    # them. Returns the last id of the batch (None when no video is left) and
+    # the numbers of reconciled and deferred videos.
+    #
+    async def __reconcile_batch(self, after: uuid.UUID | None) -> tuple[uuid.UUID | None, int, int]:
+        async with self.__engine.begin() as conn:
+            last = (await conn.execute(
+                SELECT_BATCH_END, {"after": after, "batch_size": self.__reconcile_batch_size}
+            )).scalar()
+            if last is None:
+                return None, 0, 0
+
+            # Waits for running flushes, pending deltas only grow from here on
+            await conn.execute(LOCK_FLUSHES, {"lock_id": FLUSH_LOCK_ID})
+
+            pending = await self.__pending_deltas()
+            drifted = (await conn.execute(SELECT_DRIFTED, {
+                "video_ids": list(pending.keys()),
+                "deltas": list(pending.values()),
+                "after": after,
+                "last": last
+            })).all()
+
+            if len(drifted) == 0:
+                return last, 0, 0
+
+            pending_after = await self.__pending_deltas()
+            video_ids, like_counts = [], []
+            for video_id, like_count in drifted:
+                if pending_after.get(video_id, 0) == pending.get(video_id, 0):
+                    video_ids.append(video_id)
+                    like_counts.append(like_count - pending.get(video_id, 0))
+
+            if len(video_ids) != 0:
+                await conn.execute(SET_COUNTS, {"video_ids": video_ids, "like_counts": like_counts})
+
+        if len(video_ids) != 0:
+            await self.__redis.delete(*(COUNT_KEY.format(video_id=video_id) for video_id in video_ids))
+
+        return last, len(video_ids), len(drifted) - len(video_ids)
+
+    async def __pending_deltas(self) -> dict[uuid.UUID, int]:
+        raw_deltas = await self.__redis.hgetall(DELTAS_KEY)
+        return {uuid.UUID(video_id.decode()): int(delta) for video_id, delta in raw_deltas.items()}
+
+    async def __run(self):
+        loop = asyncio.get_running_loop()
+        reconcile_at = loop.time() + self.__reconcile_interval
+
+        while True:
+            await asyncio.sleep(self.__flush_interval)
+
+            try:
+                if loop.time() >= reconcile_at:
+                    reconcile_at = loop.time() + self.__reconcile_interval
+                    await self.reconcile()
+                else:
+                    await self.flush()
+            except (RedisError, SQLAlchemyError) as ex:
+                LIKE_COUNTER_LOGGER.warning(f"Like count flush failed | {ex}")
+
+
+like_counter = LikeCounter(
+    redis_client=redis_client,
+    engine=engine,
+    flush_interval=LIKE_FLUSH_INTERVAL_SECONDS,
+    reconcile_interval=LIKE_RECONCILE_INTERVAL_SECONDS,
+    reconcile_batch_size=LIKE_RECONCILE_BATCH_SIZE,
+    count_ttl=LIKE_COUNT_TTL_SECONDS
+)
@@ -0,0 +1,157 @@
+from globals import LIKE_SET_TTL_SECONDS, LIKE_SET_MAX_SIZE
+from models.entities import video_like_association_table
+from sqlalchemy.ext.asyncio import AsyncEngine
+from log.loggers import LIKE_MEMBERSHIP_LOGGER
+from redis.exceptions import RedisError
+from config.redis_conf import redis_client
+from config.db_conf import engine
+from redis.asyncio import Redis
+from sqlalchemy import select
+import uuid
+
+#
+# "Has this user liked these videos?" for a whole feed page in one round trip.
+# Every user gets a redis set of liked video ids, loaded whole on the first
+# lookup through the (users_id, video_id) index and kept in sync by like and
+# unlike. A set only answers when it carries the LOADED marker, so a missing
+# or expired set is never mistaken for "liked nothing".
+#
+# A load holds a lease: like/unlike drop it, and a set read from postgres
+# before a concurrent like is not installed over it.
+#
+
+LIKES_KEY = "user_likes:{user_id}"
+LEASE_KEY = "user_likes:{user_id}:lease"
+# Users with more likes than fit a set are answered from the index directly
+LARGE_KEY = "user_likes:{user_id}:large"
+LOADED = "*"
+LEASE_TTL_SECONDS = 10
+
+UPDATE_SCRIPT = """
+redis.call('DEL', KEYS[2])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    if ARGV[1] == '1' then
+        redis.call('SADD', KEYS[1], ARGV[2])
+    else
+        redis.call('SREM', KEYS[1], ARGV[2])
+    end
+end
+"""
+
+INSTALL_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2], KEYS[1])
+-- unpack is bounded by the lua stack, members are added in chunks
+for first = 3, #ARGV, 4096 do
+    redis.call('SADD', KEYS[1], unpack(ARGV, first, math.min(first + 4095, #ARGV)))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class LikeMembership:
+    def __init__(self, redis_client: Redis, engine: AsyncEngine, ttl: int, max_size: int):
+        self.__redis = redis_client
+        self.__engine = engine
+        self.__ttl = ttl
+        self.__max_size = max_size
+
+        self.__update = redis_client.register_script(UPDATE_SCRIPT)
+        self.__install = redis_client.register_script(INSTALL_SCRIPT)
+
+        self.__hits = 0
+        self.__loads = 0
+        self.__db_lookups = 0
+
+    async def update(self, user_id: uuid.UUID, video_id: uuid.UUID, liked: bool):
+        try:
+            await self.__update(
+                keys=[LIKES_KEY.format(user_id=user_id), LEASE_KEY.format(user_id=user_id)],
+                args=["1" if liked else "0", str(video_id)]
+            )
+        except RedisError as ex:
+            LIKE_MEMBERSHIP_LOGGER.warning(f"Like set update is lost, stale until it expires | user {user_id} ; {ex}")
+
+    async def has_liked(self, user_id: uuid.UUID, video_ids: list[uuid.UUID]) -> list[bool]:
+        if len(video_ids) == 0:
+            return []
+
+        likes_key = LIKES_KEY.format(user_id=user_id)
+        members = [str(video_id) for video_id in video_ids]
+
+        try:
+            async with self.__redis.pipeline(transaction=False) as pipe:
+                pipe.smismember(likes_key, [LOADED, *members])
+                pipe.exists(LARGE_KEY.format(user_id=user_id))
+                found, large = await pipe.execute()
+
+            if found[0]:
+                self.__hits += 1
+                return [bool(is_member) for is_member in found[1:]]
+
+            if not large:
+                liked = await self.__load(user_id)
+                if liked is not None:
+                    return [video_id in liked for video_id in members]
+        except RedisError as ex:
+            LIKE_MEMBERSHIP_LOGGER.warning(f"Like set is unavailable, answering from the db | user {user_id} ; {ex}")
+
+        self.__db_lookups += 1
+        return await self.__lookup(user_id, video_ids)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.__hits,
+            "loads": self.__loads,
+            "db_lookups": self.__db_lookups
+        }
+
+    async def __load(self, user_id: uuid.UUID) -> set[str] | None:
+        lease_key = LEASE_KEY.format(user_id=user_id)
+        token = str(uuid.uuid4())
+        await self.__redis.set(lease_key, token, ex=LEASE_TTL_SECONDS)
+
+        query = (
+            select(video_like_association_table.c.video_id)
+            .where(video_like_association_table.c.users_id == user_id)
+            .limit(self.__max_size + 1)
+        )
+        async with self.__engine.connect() as conn:
+            video_ids = (await conn.execute(query)).scalars().all()
+
+        if len(video_ids) > self.__max_size:
+            await self.__redis.set(LARGE_KEY.format(user_id=user_id), 1, ex=self.__ttl)
+            return None
+
+        self.__loads += 1
+        liked = {str(video_id) for video_id in video_ids}
+        await self.__install(
+            keys=[LIKES_KEY.format(user_id=user_id), lease_key],
+            args=[token, self.__ttl, LOADED, *liked]
+        )
+
+        return liked
+
+    async def __lookup(self, user_id: uuid.UUID, video_ids: list[uuid.UUID]) -> list[bool]:
+        query = (
+            select(video_like_association_table.c.video_id)
+            .where(
+                video_like_association_table.c.users_id == user_id,
+                video_like_association_table.c.video_id.in_(video_ids)
+            )
+        )
+        async with self.__engine.connect() as conn:
+            liked = set((await conn.execute(query)).scalars().all())
+
+        return [video_id in liked for video_id in video_ids]
+
+
+like_membership = LikeMembership(
+    redis_client=redis_client,
+    engine=engine,
+    ttl=LIKE_SET_TTL_SECONDS,
+    max_size=LIKE_SET_MAX_SIZE
+)
@@ -0,0 +1,285 @@
+from globals import TAG_INDEX_REBUILD_INTERVAL_SECONDS, TAG_INDEX_SCAN_CHUNK_SIZE
+from models.entities import Video, video_tags_association_table, VideoTags
+from sqlalchemy.ext.asyncio import AsyncEngine
+from log.loggers import TAG_INDEX_LOGGER
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from config.redis_conf import redis_client
+from config.db_conf import engine
+from redis.asyncio import Redis
+from sqlalchemy import select
+import asyncio
+import heapq
+import time
+import uuid
+
+#
+# Inverted index of video tags in redis. Every tag has a posting list, a
+# sorted set of video ids scored by created_at in milliseconds, so a
+# reverse range walks it newest first in the feed order (created_at, id).
+# Next to them live the number of videos per tag, a name -> id map and a
+# lexicographic set of lowercased names for prefix autocomplete.
+#
+# The index is built from postgres under a new version and swapped in with
+# one SET, readers never see a half built index. The previous version expires,
+# so does whatever a failed build wrote. Tags are not assigned through this
+# service, the index is only as fresh as its last build: a tagged (or
+# retagged) video and a new tag show up in search within the rebuild interval.
+#
+
+VERSION_KEY = "tag_index:version"
+BUILD_LOCK_KEY = "tag_index:build_lock"
+POSTINGS_KEY = "tag_index:{version}:videos:{tag_id}"
+COUNTS_KEY = "tag_index:{version}:counts"
+NAMES_KEY = "tag_index:{version}:names"
+PREFIX_KEY = "tag_index:{version}:prefix"
+
+BUILD_LOCK_TTL_SECONDS = 600
+OLD_VERSION_TTL_SECONDS = 60
+WRITE_BATCH_SIZE = 1000
+
+
+def posting_score(created_at) -> int:
+    return int(created_at.timestamp() * 1000)
+
+
+class TagIndex:
+    def __init__(self, redis_client: Redis, engine: AsyncEngine, rebuild_interval: float, scan_chunk_size: int):
+        self.__redis = redis_client
+        self.__engine = engine
+        self.__rebuild_interval = rebuild_interval
+        self.__scan_chunk_size = scan_chunk_size
+
+        self.__builder: asyncio.Task | None = None
+
+        self.__builds = 0
+        self.__scanned = 0
+        self.__checked = 0
+
+    async def version(self) -> str | None:
+        version = await self.__redis.get(VERSION_KEY)
+        return version.decode() if version is not None else None
+
+    #
+    # Reads all (tag, video) pairs in one pass and writes them as pipelined batches
+    #
+    async def rebuild(self) -> bool:
+        lock = str(uuid.uuid4())
+        if not await self.__redis.set(BUILD_LOCK_KEY, lock, ex=BUILD_LOCK_TTL_SECONDS, nx=True):
+            return False
+
+        started_at = time.perf_counter()
+        version = str(int(time.time() * 1000))
+        postings_query = (
+            select(video_tags_association_table.c.tag_id, Video.id, Video.created_at)
+            .join(Video, Video.id == video_tags_association_table.c.video_id)
+        )
+        tags_query = select(VideoTags.id, VideoTags.tag_name)
+
+        counts: dict[int, int] = {}
+        built = False
+
+        try:
+            async with self.__engine.connect() as conn, self.__redis.pipeline(transaction=False) as pipe:
+                tags = (await conn.execute(tags_query)).all()
+
+                async for tag_id, video_id, created_at in await conn.stream(postings_query):
+                    pipe.zadd(POSTINGS_KEY.format(version=version, tag_id=tag_id), {str(video_id): posting_score(created_at)})
+                    counts[tag_id] = counts.get(tag_id, 0) + 1
+
+                    if len(pipe) == WRITE_BATCH_SIZE:
+                        await pipe.execute()
+
+                for tag_id, tag_name in tags:
+                    pipe.hset(COUNTS_KEY.format(version=version), tag_id, counts.get(tag_id, 0))
+                    pipe.hset(NAMES_KEY.format(version=version), tag_name.lower(), tag_id)
+                    pipe.zadd(PREFIX_KEY.format(version=version), {f"{tag_name.lower()}\x00{tag_id}\x00{tag_name}": 0})
+                await pipe.execute()
+
+            old_version = await self.__redis.getset(VERSION_KEY, version)
+            built = True
+            if old_version is not None:
+                await self.__expire_version(old_version.decode())
+        finally:
+            if not built:
+                await self.__discard_version(version, list(counts.keys()))
+            if await self.__redis.get(BUILD_LOCK_KEY) == lock.encode():
+                await self.__redis.delete(BUILD_LOCK_KEY)
+
+        self.__builds += 1
+        TAG_INDEX_LOGGER.info(
+            f"Tag index is built | version {version} ; tags {len(tags)} ; "
+            f"postings {sum(counts.values())} ; {time.perf_counter() - started_at:.2f} s"
+        )
+        return True
+
+    async def resolve(self, version: str, tag_names: list[str]) -> list[int | None]:
+        tag_ids = await self.__redis.hmget(NAMES_KEY.format(version=version), [name.lower() for name in tag_names])
+        return [int(tag_id) if tag_id is not None else None for tag_id in tag_ids]
+
+    async def counts(self, version: str, tag_ids: list[int]) -> list[int]:
+        counts = await self.__redis.hmget(COUNTS_KEY.format(version=version), tag_ids)
+        return [int(count) if count is not None else 0 for count in counts]
+
+    async def autocomplete(self, version: str, prefix: str, limit: int) -> list[tuple[str, int]]:
+        # Raw 0xff bound, it sorts after every utf-8 encoded continuation of the prefix
+        prefix = prefix.lower().encode()
+        members = await self.__redis.zrangebylex(
+            PREFIX_KEY.format(version=version), b"[" + prefix, b"[" + prefix + b"\xff", start=0, num=limit
+        )
+
+        tags = [member.decode().split("\x00") for member in members]
+        counts = await self.counts(version, [int(tag_id) for _, tag_id, _ in tags]) if len(tags) != 0 else []
+
+        return [(tag_name, count) for (_, _, tag_name), count in zip(tags, counts)]
+
+    #
+    # Videos carrying all of the tags, below the (score, video_id) cursor.
+    # The smallest posting list is walked newest first in chunks and every
+    # candidate is checked against the others with one ZMSCORE each; the walk
+    # stops as soon as the page is full.
+    #
+    async def intersect(self, version: str, tag_ids: list[int], after: tuple[int, str] | None, limit: int) -> list[tuple[int, str]]:
+        counts = await self.counts(version, tag_ids)
+        if 0 in counts:
+            return []
+
+        ordered = [tag_id for _, tag_id in sorted(zip(counts, tag_ids))]
+        smallest = POSTINGS_KEY.format(version=version, tag_id=ordered[0])
+        others = [POSTINGS_KEY.format(version=version, tag_id=tag_id) for tag_id in ordered[1:]]
+
+        page: list[tuple[int, str]] = []
+        offset = 0
+
+        while len(page) < limit:
+            chunk = await self.__scan(smallest, after, offset, self.__scan_chunk_size)
+            offset += self.__scan_chunk_size
+            if len(chunk) == 0:
+                break
+
+            candidates = [(score, video_id) for score, video_id in chunk if self.__is_after(score, video_id, after)]
+            self.__scanned += len(chunk)
+
+            for key in others:
+                if len(candidates) == 0:
+                    break
+                scores = await self.__redis.zmscore(key, [video_id for _, video_id in candidates])
+                self.__checked += len(candidates)
+                candidates = [candidate for candidate, score in zip(candidates, scores) if score is not None]
+
+            page.extend(candidates[:limit - len(page)])
+
+            if len(chunk) < self.__scan_chunk_size:
+                break
+
+        return page
+
+    #
+    # Videos carrying any of the tags: a k-way merge of the heads of the
+    # posting lists, none of them can contribute more than a page.
+    #
+    async def union(self, version: str, tag_ids: list[int], after: tuple[int, str] | None, limit: int) -> list[tuple[int, str]]:
+        heads = await asyncio.gather(*(
+            self.__head(POSTINGS_KEY.format(version=version, tag_id=tag_id), after, limit) for tag_id in tag_ids
+        ))
+
+        page: list[tuple[int, str]] = []
+        seen: set[str] = set()
+
+        for score, video_id in heapq.merge(*heads, reverse=True):
+            if video_id in seen:
+                continue
+            seen.add(video_id)
+            page.append((score, video_id))
+            if len(page) == limit:
+                break
+
+        return page
+
+    def stats(self) -> dict:
+        return {
+            "builds": self.__builds,
+            "scanned": self.__scanned,
+            "checked": self.__checked
+        }
+
+    async def start(self):
+        if self.__builder is None and self.__engine is not None:
+            self.__builder = asyncio.create_task(self.__run())
+
+    async def stop(self):
+        if self.__builder is None:
+            return
+
+        self.__builder.cancel()
+        try:
+            await self.__builder
+        except asyncio.CancelledError:
+            pass
+
+        self.__builder = None
+
+    async def __head(self, key: str, after: tuple[int, str] | None, limit: int) -> list[tuple[int, str]]:
+        head: list[tuple[int, str]] = []
+        offset = 0
+
+        while len(head) < limit:
+            chunk = await self.__scan(key, after, offset, limit)
+            offset += limit
+            head.extend((score, video_id) for score, video_id in chunk if self.__is_after(score, video_id, after))
+            if len(chunk) < limit:
+                break
+
+        return head[:limit]
+
+    async def __scan(self, key: str, after: tuple[int, str] | None, offset: int, count: int) -> list[tuple[int, str]]:
+        entries = await self.__redis.zrevrangebyscore(
+            key, after[0] if after is not None else "+inf", "-inf", start=offset, num=count, withscores=True
+        )
+        return [(int(score), video_id.decode()) for video_id, score in entries]
+
+    # Equal scores are ordered by member descending, as the feed orders equal created_at by id
+    @staticmethod
+    def __is_after(score: int, video_id: str, after: tuple[int, str] | None) -> bool:
+        return after is None or score < after[0] or (score == after[0] and video_id < after[1])
+
+    async def __expire_version(self, version: str, tag_ids: list[int] | None = None):
+        if tag_ids is None:
+            tag_ids = [int(tag_id) for tag_id in await self.__redis.hkeys(COUNTS_KEY.format(version=version))]
+
+        async with self.__redis.pipeline(transaction=False) as pipe:
+            for tag_id in tag_ids:
+                pipe.expire(POSTINGS_KEY.format(version=version, tag_id=tag_id), OLD_VERSION_TTL_SECONDS)
+            for key in (COUNTS_KEY, NAMES_KEY, PREFIX_KEY):
+                pipe.expire(key.format(version=version), OLD_VERSION_TTL_SECONDS)
+            await pipe.execute()
+
+    #
+    # A failed build may have written postings of any tag it read, the counts
+    # hash is not there to list them. Never raises, the build error is the one to see.
+    #
+    async def __discard_version(self, version: str, tag_ids: list[int]):
+        try:
+            await self.__expire_version(version, tag_ids)
+        except RedisError as ex:
+            TAG_INDEX_LOGGER.warning(f"Failed tag index build is not expired | version {version} ; {ex}")
+
+    async def __run(self):
+        while True:
+            try:
+                version = await self.version()
+                # Another replica may have built it while this one slept
+                if version is None or time.time() * 1000 - int(version) >= self.__rebuild_interval * 1000:
+                    await self.rebuild()
+            except (RedisError, SQLAlchemyError) as ex:
+                TAG_INDEX_LOGGER.warning(f"Tag index build failed | {ex}")
+
+            await asyncio.sleep(self.__rebuild_interval)
+
+
+tag_index = TagIndex(
+    redis_client=redis_client,
+    engine=engine,
+    rebuild_interval=TAG_INDEX_REBUILD_INTERVAL_SECONDS,
+    scan_chunk_size=TAG_INDEX_SCAN_CHUNK_SIZE
+)
@@ -0,0 +1,257 @@
+from globals import (
+    TRENDING_HALF_LIFE_SECONDS, TRENDING_RENORMALIZE_INTERVAL_SECONDS, TRENDING_MIN_SCORE,
+    TRENDING_VIDEO_TAGS_CACHE_SIZE, TRENDING_VIDEO_TAGS_CACHE_TTL_SECONDS,
+    TRENDING_EVENT_WINDOW_SECONDS, TRENDING_MAX_VIEWS_PER_MINUTE
+)
+from models.entities import Video, video_tags_association_table
+from sqlalchemy.ext.asyncio import AsyncEngine
+from log.loggers import TRENDING_LOGGER
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from config.redis_conf import redis_client
+from collections import OrderedDict
+from config.db_conf import engine
+from redis.asyncio import Redis
+from sqlalchemy import select
+import asyncio
+import math
+import time
+import uuid
+
+#
+# Trending videos with exponentially decayed scores, kept incrementally in
+# redis sorted sets: one for all videos and one per tag. Instead of decaying
+# every score as time passes, an event is added scaled up by
+# exp((now - anchor) / tau) (forward decay), so the order of the set at any
+# moment is the order of the decayed scores and an event is one ZINCRBY.
+# The scale grows with time, every set is periodically renormalized: scores
+# are multiplied down in place with ZUNIONSTORE, its anchor moves to now and
+# videos that decayed below the minimum score are dropped.
+#
+# Scores only grow: an event can't be taken back at the scale it was added
+# with, so an unlike is not recorded. Instead every user adds a given kind
+# of event to a video once per window, liking and unliking over and over
+# counts once. Views are limited per user and minute on top.
+#
+
+VIDEOS_KEY = "trending:videos"
+TAG_KEY = "trending:tag:{tag_id}"
+# Trending set -> unix time its scores are relative to
+ANCHORS_KEY = "trending:anchors"
+# Set while the event of the user (e.g. "like:<user id>") counts for the video
+EVENT_KEY = "trending:event:{event}:{video_id}"
+VIEW_RATE_KEY = "trending:view_rate:{user_id}"
+VIEW_RATE_WINDOW_SECONDS = 60
+
+RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+for i = 2, #KEYS do
+    local anchor = tonumber(redis.call('HGET', KEYS[1], KEYS[i]))
+    if not anchor then
+        anchor = now
+        redis.call('HSET', KEYS[1], KEYS[i], ARGV[1])
+    end
+    redis.call('ZINCRBY', KEYS[i], tonumber(ARGV[3]) * math.exp((now - anchor) / tonumber(ARGV[2])), ARGV[4])
+end
+"""
+
+RENORMALIZE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local anchor = tonumber(redis.call('HGET', KEYS[1], KEYS[2]))
+if not anchor or anchor >= now then
+    return -1
+end
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    redis.call('HDEL', KEYS[1], KEYS[2])
+    return 0
+end
+redis.call('ZUNIONSTORE', KEYS[2], 1, KEYS[2], 'WEIGHTS', math.exp((anchor - now) / tonumber(ARGV[2])))
+redis.call('HSET', KEYS[1], KEYS[2], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', '(' .. ARGV[3])
+return redis.call('ZCARD', KEYS[2])
+"""
+
+
+class TrendingScores:
+    def __init__(
+        self,
+        redis_client: Redis,
+        engine: AsyncEngine,
+        half_life: float,
+        renormalize_interval: float,
+        min_score: float,
+        tags_cache_size: int,
+        tags_cache_ttl: float,
+        event_window: int,
+        max_views_per_minute: int
+    ):
+        self.__redis = redis_client
+        self.__engine = engine
+        self.__tau = half_life / math.log(2)
+        self.__renormalize_interval = renormalize_interval
+        self.__min_score = min_score
+        self.__tags_cache_size = tags_cache_size
+        self.__tags_cache_ttl = tags_cache_ttl
+        self.__event_window = event_window
+        self.__max_views_per_minute = max_views_per_minute
+
+        self.__record = redis_client.register_script(RECORD_SCRIPT)
+        self.__renormalize = redis_client.register_script(RENORMALIZE_SCRIPT)
+        self.__renormalizer: asyncio.Task | None = None
+        # video_id -> (expires at, tag ids), least recently used first
+        self.__video_tags: OrderedDict[uuid.UUID, tuple[float, list[int]]] = OrderedDict()
+        # video_id -> expires at. Apart, ids made up by clients don't push real videos out
+        self.__unknown_videos: OrderedDict[uuid.UUID, float] = OrderedDict()
+
+        self.__events = 0
+        self.__repeated_events = 0
+        self.__lost_events = 0
+        self.__refused_views = 0
+        self.__renormalized = 0
+
+    #
+    # Adds weight to the video in the global and in its tags' sets. An event
+    # ("<kind>:<user id>") counts once per event window.
+    #
+    async def record(self, video_id: uuid.UUID, weight: float, event: str):
+        self.__events += 1
+
+        try:
+            tag_ids = await self.__tags_of(video_id)
+            if tag_ids is None:
+                return
+
+            if not await self.__redis.set(
+                EVENT_KEY.format(event=event, video_id=video_id), 1, ex=self.__event_window, nx=True
+            ):
+                self.__repeated_events += 1
+                return
+
+            await self.__record(
+                keys=[ANCHORS_KEY, VIDEOS_KEY, *(TAG_KEY.format(tag_id=tag_id) for tag_id in tag_ids)],
+                args=[time.time(), self.__tau, weight, str(video_id)]
+            )
+        except (RedisError, SQLAlchemyError) as ex:
+            self.__lost_events += 1
+            TRENDING_LOGGER.warning(f"Trending event is lost | video {video_id} ; weight {weight} ; {ex}")
+
+    #
+    # Counts a view of the user against the per minute limit. Views are not
+    # refused while redis is down, they are lost with their event anyway.
+    #
+    async def allow_view(self, user_id: uuid.UUID) -> bool:
+        rate_key = VIEW_RATE_KEY.format(user_id=user_id)
+
+        try:
+            async with self.__redis.pipeline(transaction=True) as pipe:
+                pipe.incr(rate_key)
+                pipe.expire(rate_key, VIEW_RATE_WINDOW_SECONDS, nx=True)
+                views, _ = await pipe.execute()
+        except RedisError as ex:
+            TRENDING_LOGGER.warning(f"View rate is not checked | user {user_id} ; {ex}")
+            return True
+
+        if views > self.__max_views_per_minute:
+            self.__refused_views += 1
+            return False
+
+        return True
+
+    async def top(self, limit: int, tag_id: int | None = None) -> list[uuid.UUID]:
+        key = TAG_KEY.format(tag_id=tag_id) if tag_id is not None else VIDEOS_KEY
+        return [uuid.UUID(member.decode()) for member in await self.__redis.zrevrange(key, 0, limit - 1)]
+
+    async def renormalize(self) -> int:
+        now = time.time()
+        keys = [key.decode() for key in await self.__redis.hkeys(ANCHORS_KEY)]
+
+        members = 0
+        for key in keys:
+            members += max(await self.__renormalize(keys=[ANCHORS_KEY, key], args=[now, self.__tau, self.__min_score]), 0)
+
+        self.__renormalized += 1
+        TRENDING_LOGGER.info(f"Trending scores renormalized | sets {len(keys)} ; videos {members}")
+        return members
+
+    def stats(self) -> dict:
+        return {
+            "events": self.__events,
+            "repeated_events": self.__repeated_events,
+            "lost_events": self.__lost_events,
+            "refused_views": self.__refused_views,
+            "renormalized": self.__renormalized,
+            "cached_video_tags": len(self.__video_tags),
+            "cached_unknown_videos": len(self.__unknown_videos)
+        }
+
+    async def start(self):
+        if self.__renormalizer is None:
+            self.__renormalizer = asyncio.create_task(self.__run())
+
+    async def stop(self):
+        if self.__renormalizer is None:
+            return
+
+        self.__renormalizer.cancel()
+        try:
+            await self.__renormalizer
+        except asyncio.CancelledError:
+            pass
+
+        self.__renormalizer = None
+
+    async def __tags_of(self, video_id: uuid.UUID) -> list[int] | None:
+        entry = self.__video_tags.get(video_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.__video_tags.move_to_end(video_id)
+            return entry[1]
+
+        unknown_until = self.__unknown_videos.get(video_id)
+        if unknown_until is not None and unknown_until > time.monotonic():
+            return None
+
+        query = (
+            select(Video.id, video_tags_association_table.c.tag_id)
+            .outerjoin(video_tags_association_table, video_tags_association_table.c.video_id == Video.id)
+            .where(Video.id == video_id)
+        )
+        async with self.__engine.connect() as conn:
+            rows = (await conn.execute(query)).all()
+
+        if len(rows) == 0:
+            self.__unknown_videos[video_id] = time.monotonic() + self.__tags_cache_ttl
+            self.__unknown_videos.move_to_end(video_id)
+            while len(self.__unknown_videos) > self.__tags_cache_size:
+                self.__unknown_videos.popitem(last=False)
+            return None
+
+        tag_ids = [tag_id for _, tag_id in rows if tag_id is not None]
+
+        self.__video_tags[video_id] = (time.monotonic() + self.__tags_cache_ttl, tag_ids)
+        self.__video_tags.move_to_end(video_id)
+        while len(self.__video_tags) > self.__tags_cache_size:
+            self.__video_tags.popitem(last=False)
+
+        return tag_ids
+
+    async def __run(self):
+        while True:
+            await asyncio.sleep(self.__renormalize_interval)
+
+            try:
+                await self.renormalize()
+            except RedisError as ex:
+                TRENDING_LOGGER.warning(f"Trending renormalization failed | {ex}")
+
+
+trending_scores = TrendingScores(
+    redis_client=redis_client,
+    engine=engine,
+    half_life=TRENDING_HALF_LIFE_SECONDS,
+    renormalize_interval=TRENDING_RENORMALIZE_INTERVAL_SECONDS,
+    min_score=TRENDING_MIN_SCORE,
+    tags_cache_size=TRENDING_VIDEO_TAGS_CACHE_SIZE,
+    tags_cache_ttl=TRENDING_VIDEO_TAGS_CACHE_TTL_SECONDS,
+    event_window=TRENDING_EVENT_WINDOW_SECONDS,
+    max_views_per_minute=TRENDING_MAX_VIEWS_PER_MINUTE
+)
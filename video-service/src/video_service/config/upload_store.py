@@ -0,0 +1,428 @@
+from globals import (
+    UPLOAD_DIR, UPLOAD_TTL_SECONDS, UPLOAD_WRITE_BUFFER_SIZE, UPLOAD_CHECKPOINT_SIZE, UPLOAD_SWEEP_INTERVAL_SECONDS,
+    UPLOAD_MAX_OPEN_PER_AUTHOR, UPLOAD_MAX_OPEN_BYTES_PER_AUTHOR
+)
+from exceptions import BadRequestException, ConflictException, InsufficientStorageException, TooManyRequestsException
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from log.loggers import UPLOAD_STORE_LOGGER
+from redis.exceptions import RedisError
+from config.redis_conf import redis_client
+from redis.asyncio import Redis
+from dataclasses import dataclass
+import hashlib
+import asyncio
+import errno
+import uuid
+import os
+
+#
+# Resumable uploads. Every upload is a file preallocated to its declared
+# size, so the disk space is reserved up front and chunks are written in
+# place at their offset. The upload state (owner, size, offset) lives in a
+# redis hash and the offset only moves once the bytes before it are synced
+# to disk, an interrupted upload resumes from there.
+#
+# Request bodies are never held whole: the stream is cut into write buffers
+# and each buffer is written and hashed in worker threads while the next
+# one is being received. The sha256 of an upload is kept in memory between
+# chunks; after a restart it is recomputed from the file once.
+#
+# Upload files are local to the replica that created them, chunks of one
+# upload have to reach the same replica (or UPLOAD_DIR has to be shared).
+#
+# Every open upload holds its declared size on disk until it is finished or
+# expires, so an author may only have so many of them and so many declared
+# bytes open at once. The uploads of an author are a redis hash of upload id
+# to declared size, checked and extended in one script with the state.
+#
+
+UPLOAD_KEY = "video_upload:{upload_id}"
+AUTHOR_UPLOADS_KEY = "video_upload:author:{author_id}"
+READ_BLOCK_SIZE = 8 * 1024 ** 2
+
+# Entries whose upload state expired are dropped before counting.
+# Returns 1 when created, -1 over the number of uploads, -2 over the bytes.
+CREATE_SCRIPT = """
+local uploads = redis.call('HGETALL', KEYS[2])
+local count, total = 0, 0
+for index = 1, #uploads, 2 do
+    if redis.call('EXISTS', ARGV[1] .. uploads[index]) == 1 then
+        count = count + 1
+        total = total + tonumber(uploads[index + 1])
+    else
+        redis.call('HDEL', KEYS[2], uploads[index])
+    end
+end
+
+if count >= tonumber(ARGV[4]) then
+    return -1
+end
+if total + tonumber(ARGV[3]) > tonumber(ARGV[5]) then
+    return -2
+end
+
+redis.call('HSET', KEYS[1], 'author_id', ARGV[7], 'name', ARGV[8], 'size', ARGV[3], 'offset', 0, 'sha256', ARGV[9])
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[6])
+return 1
+"""
+
+# A cancelled or expired upload is not brought back by a late write
+SAVE_OFFSET_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'offset', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+
+@dataclass
+class UploadState:
+    upload_id: uuid.UUID
+    author_id: uuid.UUID
+    name: str
+    size: int
+    offset: int
+    # Expected hex digest sent by the client, empty if it is not checked
+    sha256: str
+
+
+class UploadStore:
+    def __init__(
+        self,
+        redis_client: Redis,
+        directory: str,
+        ttl: int,
+        write_buffer_size: int,
+        checkpoint_size: int,
+        sweep_interval: float,
+        max_open_per_author: int,
+        max_open_bytes_per_author: int
+    ):
+        self.__redis = redis_client
+        self.__directory = directory
+        self.__ttl = ttl
+        self.__write_buffer_size = write_buffer_size
+        self.__checkpoint_size = checkpoint_size
+        self.__sweep_interval = sweep_interval
+        self.__max_open_per_author = max_open_per_author
+        self.__max_open_bytes_per_author = max_open_bytes_per_author
+
+        self.__create_script = redis_client.register_script(CREATE_SCRIPT)
+        self.__save_offset_script = redis_client.register_script(SAVE_OFFSET_SCRIPT)
+        self.__sweeper: asyncio.Task | None = None
+        # upload_id -> (offset, sha256 of the bytes before it)
+        self.__hashers: dict[uuid.UUID, tuple[int, "hashlib._Hash"]] = {}
+        # Uploads a request is writing or finishing right now
+        self.__busy: set[uuid.UUID] = set()
+
+        self.__created = 0
+        self.__refused = 0
+        self.__written_bytes = 0
+        self.__rehashed_bytes = 0
+        self.__interrupted = 0
+        self.__swept = 0
+
+    def path(self, upload_id: uuid.UUID) -> str:
+        return os.path.join(self.__directory, f"{upload_id}.part")
+
+    async def create(self, author_id: uuid.UUID, name: str, size: int, sha256: str) -> UploadState:
+        state = UploadState(uuid.uuid4(), author_id, name, size, 0, sha256)
+
+        # The state goes first: a file without state is garbage for the sweeper
+        created = await self.__create_script(
+            keys=[UPLOAD_KEY.format(upload_id=state.upload_id), AUTHOR_UPLOADS_KEY.format(author_id=author_id)],
+            args=[
+                UPLOAD_KEY.format(upload_id=""), str(state.upload_id), size,
+                self.__max_open_per_author, self.__max_open_bytes_per_author, self.__ttl,
+                str(author_id), name, sha256
+            ]
+        )
+        if created == -1:
+            self.__refused += 1
+            raise TooManyRequestsException("Too many open uploads, finish or cancel one first.")
+        if created == -2:
+            self.__refused += 1
+            raise InsufficientStorageException("Open uploads are over the size quota, finish or cancel one first.")
+
+        try:
+            await asyncio.to_thread(self.__preallocate, self.path(state.upload_id), size)
+        except OSError as ex:
+            await self.__forget(state)
+            if ex.errno == errno.ENOSPC:
+                raise InsufficientStorageException("Not enough disk space for the upload.")
+            raise
+
+        self.__created += 1
+        return state
+
+    async def get(self, upload_id: uuid.UUID) -> UploadState | None:
+        state = await self.__redis.hgetall(UPLOAD_KEY.format(upload_id=upload_id))
+        if len(state) == 0:
+            return None
+
+        return UploadState(
+            upload_id=upload_id,
+            author_id=uuid.UUID(state[b"author_id"].decode()),
+            name=state[b"name"].decode(),
+            size=int(state[b"size"]),
+            offset=int(state[b"offset"]),
+            sha256=state[b"sha256"].decode()
+        )
+
+    #
+    # Appends the stream at the upload offset and returns the new offset.
+    # Bytes received before the client went away are kept.
+    #
+    async def write(self, state: UploadState, stream: AsyncIterator[bytes]) -> int:
+        self.__acquire(state.upload_id)
+        try:
+            # Another request may have moved it since the state was read
+            current = await self.get(state.upload_id)
+            if current is None or current.offset != state.offset:
+                raise ConflictException("Upload offset has changed.")
+
+            hasher = await self.__hasher(state.upload_id, state.offset)
+            fd = await asyncio.to_thread(os.open, self.path(state.upload_id), os.O_WRONLY)
+
+            # written: on disk and hashed ; queued: handed to the writer threads
+            written = queued = checkpoint = state.offset
+            buffer = bytearray()
+            pending: asyncio.Future | None = None
+            # (offset, fdatasync running in the background), the offset is saved once it is durable
+            syncing: tuple[int, asyncio.Future] | None = None
+
+            try:
+                async for chunk in stream:
+                    if queued + len(buffer) + len(chunk) > state.size:
+                        raise BadRequestException("Upload is larger than its declared size.")
+                    buffer += chunk
+
+                    if len(buffer) < self.__write_buffer_size:
+                        continue
+
+                    if pending is not None:
+                        written = (await pending)[0]
+                    pending = self.__write(fd, hasher, buffer, queued)
+                    queued += len(buffer)
+                    buffer = bytearray()
+
+                    if syncing is not None and syncing[1].done():
+                        await syncing[1]
+                        await self.__save_offset(state, syncing[0])
+                        checkpoint, syncing = syncing[0], None
+                    if syncing is None and written - checkpoint >= self.__checkpoint_size:
+                        syncing = (written, asyncio.ensure_future(asyncio.to_thread(os.fdatasync, fd)))
+            except BaseException:
+                self.__interrupted += 1
+                raise
+            finally:
+                try:
+                    if syncing is not None:
+                        await syncing[1]
+                    if pending is not None:
+                        written = (await pending)[0]
+                    if len(buffer) != 0:
+                        written = (await self.__write(fd, hasher, buffer, queued))[0]
+
+                    await asyncio.to_thread(os.fdatasync, fd)
+                finally:
+                    await asyncio.to_thread(os.close, fd)
+
+                await self.__save_offset(state, written)
+                self.__written_bytes += written - state.offset
+                self.__hashers[state.upload_id] = (written, hasher)
+        finally:
+            self.__busy.discard(state.upload_id)
+
+        return written
+
+    #
+    # Yields the hex sha256 of a complete upload and holds it while the
+    # caller stores the file: writes, a second finish and the sweep are
+    # refused until the block exits. The caller calls discard() once the
+    # file is stored.
+    #
+    @asynccontextmanager
+    async def completing(self, state: UploadState) -> AsyncIterator[str]:
+        self.__acquire(state.upload_id)
+        try:
+            if state.offset != state.size:
+                raise ConflictException(f"Upload is incomplete: {state.offset} of {state.size} bytes received.")
+
+            hasher = await self.__hasher(state.upload_id, state.size)
+            self.__hashers[state.upload_id] = (state.size, hasher)
+            yield hasher.hexdigest()
+        finally:
+            self.__busy.discard(state.upload_id)
+
+    async def discard(self, state: UploadState):
+        await self.__forget(state)
+        self.__hashers.pop(state.upload_id, None)
+
+        try:
+            await asyncio.to_thread(os.remove, self.path(state.upload_id))
+        except FileNotFoundError:
+            pass
+
+    #
+    # Removes files of uploads whose state expired
+    #
+    async def sweep(self) -> int:
+        names = await asyncio.to_thread(os.listdir, self.__directory)
+        swept = 0
+
+        for name in names:
+            if not name.endswith(".part"):
+                continue
+
+            try:
+                upload_id = uuid.UUID(name.removesuffix(".part"))
+            except ValueError:
+                continue
+
+            if upload_id in self.__busy or await self.__redis.exists(UPLOAD_KEY.format(upload_id=upload_id)):
+                continue
+
+            self.__hashers.pop(upload_id, None)
+            try:
+                await asyncio.to_thread(os.remove, self.path(upload_id))
+                swept += 1
+            except FileNotFoundError:
+                pass
+
+        self.__swept += swept
+        if swept != 0:
+            UPLOAD_STORE_LOGGER.info(f"Expired uploads are removed | files {swept}")
+        return swept
+
+    def stats(self) -> dict:
+        return {
+            "created": self.__created,
+            "refused": self.__refused,
+            "written_bytes": self.__written_bytes,
+            "rehashed_bytes": self.__rehashed_bytes,
+            "interrupted": self.__interrupted,
+            "swept": self.__swept,
+            "active": len(self.__busy)
+        }
+
+    async def start(self):
+        await asyncio.to_thread(os.makedirs, self.__directory, exist_ok=True)
+
+        if self.__sweeper is None:
+            self.__sweeper = asyncio.create_task(self.__run())
+
+    async def stop(self):
+        if self.__sweeper is None:
+            return
+
+        self.__sweeper.cancel()
+        try:
+            await self.__sweeper
+        except asyncio.CancelledError:
+            pass
+
+        self.__sweeper = None
+
+    def __acquire(self, upload_id: uuid.UUID):
+        if upload_id in self.__busy:
+            raise ConflictException("Upload is busy with another request.")
+        self.__busy.add(upload_id)
+
+    async def __save_offset(self, state: UploadState, offset: int):
+        await self.__save_offset_script(
+            keys=[UPLOAD_KEY.format(upload_id=state.upload_id), AUTHOR_UPLOADS_KEY.format(author_id=state.author_id)],
+            args=[offset, self.__ttl]
+        )
+
+    async def __forget(self, state: UploadState):
+        async with self.__redis.pipeline(transaction=True) as pipe:
+            pipe.delete(UPLOAD_KEY.format(upload_id=state.upload_id))
+            pipe.hdel(AUTHOR_UPLOADS_KEY.format(author_id=state.author_id), str(state.upload_id))
+            await pipe.execute()
+
+    async def __hasher(self, upload_id: uuid.UUID, offset: int) -> "hashlib._Hash":
+        entry = self.__hashers.pop(upload_id, None)
+        if entry is not None and entry[0] == offset:
+            return entry[1]
+
+        # Restarted or resumed behind the last write: hash what is on disk
+        hasher = await asyncio.to_thread(self.__hash_file, self.path(upload_id), offset)
+        self.__rehashed_bytes += offset
+        return hasher
+
+    @staticmethod
+    def __preallocate(path: str, size: int):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except OSError as ex:
+                # Filesystems without fallocate get a sparse file, space is then taken as chunks arrive
+                if ex.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                    raise
+                os.ftruncate(fd, size)
+        except OSError:
+            os.close(fd)
+            os.remove(path)
+            raise
+        os.close(fd)
+
+    #
+    # Writing and hashing a buffer run side by side in two worker threads,
+    # both release the GIL. Resolves to (offset after the buffer, None).
+    #
+    def __write(self, fd: int, hasher: "hashlib._Hash", buffer: bytearray, offset: int) -> asyncio.Future:
+        return asyncio.gather(asyncio.to_thread(self.__pwrite, fd, buffer, offset), asyncio.to_thread(hasher.update, buffer))
+
+    @staticmethod
+    def __pwrite(fd: int, buffer: bytearray, offset: int) -> int:
+        view = memoryview(buffer)
+        position = 0
+
+        while position < len(view):
+            position += os.pwrite(fd, view[position:], offset + position)
+
+        return offset + len(view)
+
+    @staticmethod
+    def __hash_file(path: str, length: int) -> "hashlib._Hash":
+        hasher = hashlib.sha256()
+        buffer = bytearray(READ_BLOCK_SIZE)
+
+        with open(path, "rb", buffering=0) as file:
+            while length > 0:
+                read = file.readinto(memoryview(buffer)[:min(length, READ_BLOCK_SIZE)])
+                if read == 0:
+                    break
+                hasher.update(memoryview(buffer)[:read])
+                length -= read
+
+        return hasher
+
+    async def __run(self):
+        while True:
+            await asyncio.sleep(self.__sweep_interval)
+
+            try:
+                await self.sweep()
+            except (RedisError, OSError) as ex:
+                UPLOAD_STORE_LOGGER.warning(f"Upload sweep failed | {ex}")
+
+
+upload_store = UploadStore(
+    redis_client=redis_client,
+    directory=UPLOAD_DIR,
+    ttl=UPLOAD_TTL_SECONDS,
+    write_buffer_size=UPLOAD_WRITE_BUFFER_SIZE,
+    checkpoint_size=UPLOAD_CHECKPOINT_SIZE,
+    sweep_interval=UPLOAD_SWEEP_INTERVAL_SECONDS,
+    max_open_per_author=UPLOAD_MAX_OPEN_PER_AUTHOR,
+    max_open_bytes_per_author=UPLOAD_MAX_OPEN_BYTES_PER_AUTHOR
+)
@@ -0,0 +1,212 @@
+from globals import VIDEO_FILE_INDEX_SIZE, VIDEO_FILE_MAX_STREAMS_PER_CLIENT, VIDEO_FILE_SEND_SIZE
+from config.blob_store import BlobStore, Manifest, to_manifest
+from sqlalchemy.ext.asyncio import AsyncEngine
+from log.loggers import VIDEO_FILES_LOGGER
+from collections.abc import Callable
+from collections import OrderedDict
+from fastapi.responses import Response
+from dataclasses import dataclass
+from config.db_conf import engine
+from email.utils import format_datetime
+from sqlalchemy import text
+import datetime
+import asyncio
+import mmap
+import uuid
+
+#
+# Serving of stored video files. Everything a request needs to answer
+# (size, ETag, Last-Modified, where each byte range lives) comes from an
+# in-memory index filled from postgres on first use; stored files never
+# change, so entries are only ever evicted, not invalidated.
+#
+# Bytes never pass through python: when the ASGI server offers the
+# zerocopysend extension every chunk range is handed over as a file and
+# sent with sendfile by the server, otherwise the chunk is mapped and
+# slices of the mapping are written to the socket from the page cache.
+#
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+SELECT_VIDEO_FILE = text("""
+SELECT v.created_at, m.digest, m.size, m.chunks
+FROM videos v JOIN blob_manifests m ON m.digest = v.manifest_digest
+WHERE v.id = :video_id
+""")
+
+
+@dataclass
+class VideoFile:
+    manifest: Manifest
+    # Strong, the manifest digest is the sha256 of the content
+    etag: str
+    last_modified: str
+    # Whole seconds, HTTP dates have no finer resolution
+    modified_at: int
+
+
+class VideoFileIndex:
+    def __init__(self, engine: AsyncEngine, size: int):
+        self.__engine = engine
+        self.__size = size
+
+        # video_id -> file, least recently used first
+        self.__files: OrderedDict[uuid.UUID, VideoFile] = OrderedDict()
+        # Concurrent misses of one video wait for a single query
+        self.__loading: dict[uuid.UUID, asyncio.Future] = {}
+
+        self.__hits = 0
+        self.__misses = 0
+
+    async def get(self, video_id: uuid.UUID) -> VideoFile | None:
+        file = self.__files.get(video_id)
+        if file is not None:
+            self.__files.move_to_end(video_id)
+            self.__hits += 1
+            return file
+
+        self.__misses += 1
+        loading = self.__loading.get(video_id)
+        if loading is None:
+            loading = self.__loading[video_id] = asyncio.ensure_future(self.__load(video_id))
+            loading.add_done_callback(lambda _: self.__loading.pop(video_id, None))
+
+        # A cancelled request must not cancel the query the others wait for
+        return await asyncio.shield(loading)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.__files),
+            "hits": self.__hits,
+            "misses": self.__misses
+        }
+
+    async def __load(self, video_id: uuid.UUID) -> VideoFile | None:
+        async with self.__engine.connect() as conn:
+            row = (await conn.execute(SELECT_VIDEO_FILE, {"video_id": video_id})).first()
+
+        # Unknown videos are not remembered, the video may be created a moment later
+        if row is None:
+            return None
+
+        modified_at = row.created_at.astimezone(datetime.timezone.utc).replace(microsecond=0)
+        file = VideoFile(
+            manifest=to_manifest(row.digest, row.size, row.chunks),
+            etag=f'"{row.digest.hex()}"',
+            last_modified=format_datetime(modified_at, usegmt=True),
+            modified_at=int(modified_at.timestamp())
+        )
+
+        self.__files[video_id] = file
+        while len(self.__files) > self.__size:
+            self.__files.popitem(last=False)
+
+        return file
+
+
+#
+# Open streams per client. A player keeps one or two range requests open,
+# more than a few from one client are scrapers or runaway retries.
+#
+class StreamLimiter:
+    def __init__(self, max_streams: int):
+        self.__max_streams = max_streams
+        self.__streams: dict[str, int] = {}
+
+        self.__served = 0
+        self.__refused = 0
+
+    def acquire(self, client: str) -> bool:
+        streams = self.__streams.get(client, 0)
+        if streams >= self.__max_streams:
+            self.__refused += 1
+            return False
+
+        self.__streams[client] = streams + 1
+        self.__served += 1
+        return True
+
+    def release(self, client: str):
+        streams = self.__streams.pop(client, 0) - 1
+        if streams > 0:
+            self.__streams[client] = streams
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self.__streams),
+            "open": sum(self.__streams.values()),
+            "served": self.__served,
+            "refused": self.__refused
+        }
+
+
+def map_chunk(path: str) -> mmap.mmap:
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # Read ahead now rather than page fault by page fault in the event loop
+    mapped.madvise(mmap.MADV_WILLNEED)
+    return mapped
+
+
+#
+# Body of [start, end) of a stored file. Headers are set by the caller,
+# on_close runs however the response ends (the client may go away mid-file).
+#
+class VideoFileResponse(Response):
+    def __init__(
+        self,
+        store: BlobStore,
+        manifest: Manifest,
+        start: int,
+        end: int,
+        status_code: int,
+        headers: dict[str, str],
+        media_type: str,
+        on_close: Callable[[], None]
+    ):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.__store = store
+        self.__manifest = manifest
+        self.__start = start
+        self.__end = end
+        self.__on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+            if scope["method"] != "HEAD":
+                if ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                    await self.__send_files(send)
+                else:
+                    await self.__send_mapped(send)
+
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        except FileNotFoundError as ex:
+            # Headers are gone already, the connection is dropped and the client sees a short body
+            VIDEO_FILES_LOGGER.error(f"Chunk file is missing | manifest {self.__manifest.digest.hex()} ; {ex}")
+            raise
+        finally:
+            self.__on_close()
+
+    async def __send_files(self, send):
+        for chunk_digest, offset, length in self.__manifest.ranges(self.__start, self.__end):
+            file = await asyncio.to_thread(open, self.__store.chunk_path(chunk_digest), "rb", buffering=0)
+            try:
+                await send({"type": ZEROCOPY_EXTENSION, "file": file, "offset": offset, "count": length, "more_body": True})
+            finally:
+                file.close()
+
+    async def __send_mapped(self, send):
+        for chunk_digest, offset, length in self.__manifest.ranges(self.__start, self.__end):
+            # Not closed explicitly: the transport may still hold slices, the mapping goes with the last of them
+            view = memoryview(await asyncio.to_thread(map_chunk, self.__store.chunk_path(chunk_digest)))
+
+            for position in range(offset, offset + length, VIDEO_FILE_SEND_SIZE):
+                piece = view[position:min(position + VIDEO_FILE_SEND_SIZE, offset + length)]
+                await send({"type": "http.response.body", "body": piece, "more_body": True})
+
+
+video_file_index = VideoFileIndex(engine=engine, size=VIDEO_FILE_INDEX_SIZE)
+stream_limiter = StreamLimiter(max_streams=VIDEO_FILE_MAX_STREAMS_PER_CLIENT)
@@ -53,6 +53,10 @@ class ConflictException(CodeException):
     def __init__(self, message: str = "Some conflict in db."):
         super().__init__(message=message, status_code=409)
 
+class TooManyRequestsException(CodeException):
+    def __init__(self, message: str = "Слишком много запросов"):
+        super().__init__(message=message, status_code=429)
+
 
 # 5xx
 class InternalServerErrorException(CodeException):
@@ -67,4 +71,11 @@ class BadGatewayException(CodeException):
     def __init__(self, message: str = "Ошибка шлюза"):
         super().__init__(message=message, status_code=502)
 
+class ServiceUnavailableException(CodeException):
+    def __init__(self, message: str = "Сервис временно недоступен"):
+        super().__init__(message=message, status_code=503)
+
+class InsufficientStorageException(CodeException):
+    def __init__(self, message: str = "Недостаточно места для хранения"):
+        super().__init__(message=message, status_code=507)
 
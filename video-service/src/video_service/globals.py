@@ -1,22 +1,71 @@
-from dotenv import load_dotenv
 import logging
 import os
 
-load_dotenv()
+# .env is a local development convenience, containers get their environment
+# from compose and skip importing python-dotenv
+if os.environ.get("LOAD_DOTENV", "true").lower() == "true":
+    from dotenv import load_dotenv
+    load_dotenv()
 
 #
 # SERVER VARS
 #
 PORT = 8085
 HOST = "localhost"
+SERVICE_NAME = "video-service"
+
+# Not counted as in-flight requests, they are answered while draining too
+HEALTH_PATHS = ("/healthz", "/readyz", "/metrics")
+READINESS_CHECK_TIMEOUT_SECONDS = float(os.environ.get("READINESS_CHECK_TIMEOUT_SECONDS", 1))
+# In-flight requests are given this long to finish on shutdown
+SHUTDOWN_DRAIN_TIMEOUT_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_TIMEOUT_SECONDS", 20))
+# After SIGTERM the service reports not ready but keeps serving this long,
+# so load balancers polling /readyz stop sending it traffic first
+SHUTDOWN_READINESS_DELAY_SECONDS = float(os.environ.get("SHUTDOWN_READINESS_DELAY_SECONDS", 5))
+# Unreachable dependencies must not hold the start up
+WARM_UP_TIMEOUT_SECONDS = float(os.environ.get("WARM_UP_TIMEOUT_SECONDS", 2))
 
 
 #
 # LOGGING VARS
 #
-LOGS_LEVEL = logging.DEBUG
+LOGS_LEVEL = logging.getLevelName(os.environ.get("LOGS_LEVEL", "INFO").upper())
 LOGS_FILENAME = "logs/{date}.log" 
-LOGS_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOGS_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s"
+# "json" or "text" (LOGS_FORMAT)
+LOGS_FORMAT_TYPE = os.environ.get("LOGS_FORMAT_TYPE", "json")
+LOGS_QUEUE_SIZE = int(os.environ.get("LOGS_QUEUE_SIZE", 10000))
+# "LOGGER NAME=rate,OTHER LOGGER=rate", rate is the share of records kept
+LOGS_SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, rate in (
+        item.rsplit("=", 1) for item in os.environ.get("LOGS_SAMPLE_RATES", "").split(",") if item.strip() != ""
+    )
+}
+# "/path/prefix=LEVEL,...", records below LEVEL are dropped while serving that route
+LOGS_ROUTE_LEVELS = {
+    prefix.strip(): logging.getLevelName(level.strip().upper())
+    for prefix, level in (
+        item.rsplit("=", 1) for item in os.environ.get("LOGS_ROUTE_LEVELS", "").split(",") if item.strip() != ""
+    )
+}
+# Expected (4xx) errors are reported once per exception class per interval
+ERROR_LOG_INTERVAL_SECONDS = float(os.environ.get("ERROR_LOG_INTERVAL_SECONDS", 10))
+ERROR_RESPONSE_CACHE_SIZE = int(os.environ.get("ERROR_RESPONSE_CACHE_SIZE", 1024))
+
+
+#
+# TRACING
+#
+# "file", "otlp" or "none"
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "file")
+# Share of new traces recorded, services follow the decision sent in traceparent
+TRACING_SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", 0.05))
+TRACING_FILENAME = "traces/{date}.jsonl"
+TRACING_OTLP_ENDPOINT = os.environ.get("TRACING_OTLP_ENDPOINT", "http://otel-collector:4318/v1/traces")
+TRACING_QUEUE_SIZE = int(os.environ.get("TRACING_QUEUE_SIZE", 10000))
+TRACING_BATCH_SIZE = int(os.environ.get("TRACING_BATCH_SIZE", 512))
+TRACING_EXPORT_INTERVAL_MS = int(os.environ.get("TRACING_EXPORT_INTERVAL_MS", 1000))
 
 
 #
@@ -28,15 +77,153 @@ DB_NAME = os.environ.get("DB_NAME")
 DB_HOST = os.environ.get("DB_HOST")
 DB_URL = os.environ.get("DB_URL")
 
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 5))
+DB_POOL_TIMEOUT_SECONDS = float(os.environ.get("DB_POOL_TIMEOUT_SECONDS", 5))
+DB_POOL_RECYCLE_SECONDS = int(os.environ.get("DB_POOL_RECYCLE_SECONDS", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_WARM_UP_CONNECTIONS = int(os.environ.get("DB_POOL_WARM_UP_CONNECTIONS", 2))
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 100))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 5000))
+
+DB_REPLICA_HOSTS = [host for host in os.environ.get("DB_REPLICA_HOSTS", "").split(",") if host != ""]
+DB_REPLICA_MAX_LAG_SECONDS = float(os.environ.get("DB_REPLICA_MAX_LAG_SECONDS", 1))
+DB_REPLICA_CHECK_INTERVAL_SECONDS = float(os.environ.get("DB_REPLICA_CHECK_INTERVAL_SECONDS", 2))
+DB_REPLICA_CHECK_TIMEOUT_SECONDS = float(os.environ.get("DB_REPLICA_CHECK_TIMEOUT_SECONDS", 3))
+DB_READ_YOUR_WRITES_SECONDS = float(os.environ.get("DB_READ_YOUR_WRITES_SECONDS", 5))
+
 
 #
 # REDIS
 #
 REDIS_HOST = os.environ.get("REDIS_HOST")
 REDIS_PORT = int(os.environ.get("REDIS_PORT"))
+REDIS_WARM_UP_CONNECTIONS = int(os.environ.get("REDIS_WARM_UP_CONNECTIONS", 2))
 
 
 #
 # OTHER
 # 
 JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY")
+
+
+#
+# VIDEO FEED
+#
+VIDEO_FEED_DEFAULT_PAGE_SIZE = int(os.environ.get("VIDEO_FEED_DEFAULT_PAGE_SIZE", 20))
+VIDEO_FEED_MAX_PAGE_SIZE = int(os.environ.get("VIDEO_FEED_MAX_PAGE_SIZE", 100))
+
+
+#
+# LIKES
+#
+# Pending like count changes are written to videos.like_count this often
+LIKE_FLUSH_INTERVAL_SECONDS = float(os.environ.get("LIKE_FLUSH_INTERVAL_SECONDS", 5))
+# like_count is recounted from the likes table to repair drift
+LIKE_RECONCILE_INTERVAL_SECONDS = float(os.environ.get("LIKE_RECONCILE_INTERVAL_SECONDS", 3600))
+# Videos recounted per transaction, flushes wait for one batch at a time
+LIKE_RECONCILE_BATCH_SIZE = int(os.environ.get("LIKE_RECONCILE_BATCH_SIZE", 1000))
+LIKE_COUNT_TTL_SECONDS = int(os.environ.get("LIKE_COUNT_TTL_SECONDS", 600))
+# Liked video ids of a user are cached as one set, users with more likes are looked up in the db
+LIKE_SET_TTL_SECONDS = int(os.environ.get("LIKE_SET_TTL_SECONDS", 1800))
+LIKE_SET_MAX_SIZE = int(os.environ.get("LIKE_SET_MAX_SIZE", 10000))
+LIKE_LOOKUP_MAX_VIDEOS = int(os.environ.get("LIKE_LOOKUP_MAX_VIDEOS", 200))
+
+
+#
+# TAG SEARCH
+#
+# The redis tag index is rebuilt from postgres this often, newly tagged videos
+# and new tags are found by tag search only after the next rebuild
+TAG_INDEX_REBUILD_INTERVAL_SECONDS = float(os.environ.get("TAG_INDEX_REBUILD_INTERVAL_SECONDS", 900))
+# Entries of the smallest posting list checked against the others per round trip
+TAG_INDEX_SCAN_CHUNK_SIZE = int(os.environ.get("TAG_INDEX_SCAN_CHUNK_SIZE", 200))
+TAG_SEARCH_MAX_TAGS = int(os.environ.get("TAG_SEARCH_MAX_TAGS", 10))
+TAG_AUTOCOMPLETE_MAX_SIZE = int(os.environ.get("TAG_AUTOCOMPLETE_MAX_SIZE", 50))
+
+
+#
+# VIDEO SEARCH
+#
+VIDEO_SEARCH_MAX_QUERY_LENGTH = int(os.environ.get("VIDEO_SEARCH_MAX_QUERY_LENGTH", 200))
+# Pages of the same query are served from redis for this long
+VIDEO_SEARCH_CACHE_TTL_SECONDS = int(os.environ.get("VIDEO_SEARCH_CACHE_TTL_SECONDS", 30))
+# How close by trigrams the query must be to a part of the name to match with typos
+VIDEO_SEARCH_WORD_SIMILARITY_THRESHOLD = float(os.environ.get("VIDEO_SEARCH_WORD_SIMILARITY_THRESHOLD", 0.5))
+
+
+#
+# TRENDING
+#
+# An event weighs half as much after this long
+TRENDING_HALF_LIFE_SECONDS = float(os.environ.get("TRENDING_HALF_LIFE_SECONDS", 6 * 3600))
+TRENDING_VIEW_WEIGHT = float(os.environ.get("TRENDING_VIEW_WEIGHT", 1))
+TRENDING_LIKE_WEIGHT = float(os.environ.get("TRENDING_LIKE_WEIGHT", 5))
+TRENDING_RENORMALIZE_INTERVAL_SECONDS = float(os.environ.get("TRENDING_RENORMALIZE_INTERVAL_SECONDS", 3600))
+# Videos whose decayed score fell below this are dropped on renormalization
+TRENDING_MIN_SCORE = float(os.environ.get("TRENDING_MIN_SCORE", 0.01))
+TRENDING_MAX_SIZE = int(os.environ.get("TRENDING_MAX_SIZE", 100))
+TRENDING_VIDEO_TAGS_CACHE_SIZE = int(os.environ.get("TRENDING_VIDEO_TAGS_CACHE_SIZE", 10000))
+TRENDING_VIDEO_TAGS_CACHE_TTL_SECONDS = float(os.environ.get("TRENDING_VIDEO_TAGS_CACHE_TTL_SECONDS", 600))
+# A user's view or like of a video adds to its score once in this long
+TRENDING_EVENT_WINDOW_SECONDS = int(os.environ.get("TRENDING_EVENT_WINDOW_SECONDS", 6 * 3600))
+TRENDING_MAX_VIEWS_PER_MINUTE = int(os.environ.get("TRENDING_MAX_VIEWS_PER_MINUTE", 60))
+
+
+#
+# RELATED VIDEOS
+#
+# Neighbours kept per video by the offline job (jobs/related_videos.py)
+RELATED_VIDEOS_TOP_K = int(os.environ.get("RELATED_VIDEOS_TOP_K", 20))
+# Videos whose similarities are computed at once, at most, and the bound on
+# their co-occurrence entries (about 12 bytes each, a few times over while scored)
+RELATED_VIDEOS_BLOCK_SIZE = int(os.environ.get("RELATED_VIDEOS_BLOCK_SIZE", 2048))
+RELATED_VIDEOS_MAX_BLOCK_NNZ = int(os.environ.get("RELATED_VIDEOS_MAX_BLOCK_NNZ", 20_000_000))
+RELATED_VIDEOS_MIN_COMMON_LIKES = int(os.environ.get("RELATED_VIDEOS_MIN_COMMON_LIKES", 2))
+RELATED_VIDEOS_MAX_USER_LIKES = int(os.environ.get("RELATED_VIDEOS_MAX_USER_LIKES", 1000))
+# Results outlive a missed run of the job, videos that lost all neighbours fade out
+RELATED_VIDEOS_TTL_SECONDS = int(os.environ.get("RELATED_VIDEOS_TTL_SECONDS", 3 * 24 * 3600))
+
+
+#
+# UPLOADS
+#
+# Unfinished uploads, one preallocated file per upload
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "uploads")
+UPLOAD_MAX_SIZE = int(os.environ.get("UPLOAD_MAX_SIZE", 8 * 1024 ** 3))
+# An upload that got no chunk for this long is dropped with its file
+UPLOAD_TTL_SECONDS = int(os.environ.get("UPLOAD_TTL_SECONDS", 24 * 3600))
+# Open uploads of one author, in number and in declared bytes
+UPLOAD_MAX_OPEN_PER_AUTHOR = int(os.environ.get("UPLOAD_MAX_OPEN_PER_AUTHOR", 3))
+UPLOAD_MAX_OPEN_BYTES_PER_AUTHOR = int(os.environ.get("UPLOAD_MAX_OPEN_BYTES_PER_AUTHOR", 16 * 1024 ** 3))
+# Received bytes are written and hashed in pieces of this size
+UPLOAD_WRITE_BUFFER_SIZE = int(os.environ.get("UPLOAD_WRITE_BUFFER_SIZE", 4 * 1024 ** 2))
+# The offset an interrupted upload resumes from is synced to disk and saved this often
+UPLOAD_CHECKPOINT_SIZE = int(os.environ.get("UPLOAD_CHECKPOINT_SIZE", 64 * 1024 ** 2))
+UPLOAD_SWEEP_INTERVAL_SECONDS = float(os.environ.get("UPLOAD_SWEEP_INTERVAL_SECONDS", 600))
+
+#
+# BLOB STORE
+#
+# Finished uploads are stored here as deduplicated chunks
+BLOB_DIR = os.environ.get("BLOB_DIR", "blobs")
+# Chunk boundaries follow the content, between the min and max size and around the average (a power of two)
+BLOB_CHUNK_MIN_SIZE = int(os.environ.get("BLOB_CHUNK_MIN_SIZE", 256 * 1024))
+BLOB_CHUNK_AVG_SIZE = int(os.environ.get("BLOB_CHUNK_AVG_SIZE", 1024 ** 2))
+BLOB_CHUNK_MAX_SIZE = int(os.environ.get("BLOB_CHUNK_MAX_SIZE", 4 * 1024 ** 2))
+# Manifests and chunks nothing references any more are removed this often, in batches
+BLOB_GC_INTERVAL_SECONDS = float(os.environ.get("BLOB_GC_INTERVAL_SECONDS", 3600))
+BLOB_GC_BATCH_SIZE = int(os.environ.get("BLOB_GC_BATCH_SIZE", 1000))
+
+#
+# VIDEO FILES
+#
+# Size, ETag and chunk list of this many videos are kept in memory, a served range costs no db query or stat
+VIDEO_FILE_INDEX_SIZE = int(os.environ.get("VIDEO_FILE_INDEX_SIZE", 10000))
+# Streams one client (user, or address for anonymous requests) may have open at once
+VIDEO_FILE_MAX_STREAMS_PER_CLIENT = int(os.environ.get("VIDEO_FILE_MAX_STREAMS_PER_CLIENT", 4))
+# Piece size of the mmap fallback, when the server can't sendfile
+VIDEO_FILE_SEND_SIZE = int(os.environ.get("VIDEO_FILE_SEND_SIZE", 1024 ** 2))
+# Uploads carry no container information, files are served as this type
+VIDEO_FILE_MEDIA_TYPE = os.environ.get("VIDEO_FILE_MEDIA_TYPE", "video/mp4")
+VIDEO_FILE_CACHE_MAX_AGE_SECONDS = int(os.environ.get("VIDEO_FILE_CACHE_MAX_AGE_SECONDS", 24 * 3600))
@@ -0,0 +1,39 @@
+from log.setup import setup_logging, shutdown_logging
+from config.blob_store import blob_store
+from config.db_conf import engine
+import argparse
+import asyncio
+
+MIB = 1024 ** 2
+
+
+async def main(args):
+    setup_logging()
+    try:
+        if args.command == "gc":
+            manifests, chunks = await blob_store.collect()
+            print(f"Removed manifests {manifests} ; chunks {chunks}")
+
+        report = await blob_store.report()
+        print(
+            f"Videos {report['files']} ({report['logical_bytes'] / MIB:.1f} MiB) ; "
+            f"unique files {report['unique_files']} ({report['unique_file_bytes'] / MIB:.1f} MiB) ; "
+            f"chunks {report['chunks']} ({report['stored_bytes'] / MIB:.1f} MiB) ; "
+            f"dedup ratio {report['dedup_ratio']}"
+        )
+    finally:
+        if engine != None:
+            await engine.dispose()
+        shutdown_logging()
+
+
+#
+# Run from src/video_service:
+#   python -m jobs.blob_store report    logical vs stored bytes of the blob store
+#   python -m jobs.blob_store gc        collects unreferenced blobs now, then reports
+#
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["report", "gc"])
+
+    asyncio.run(main(parser.parse_args()))
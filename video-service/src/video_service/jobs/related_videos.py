@@ -0,0 +1,233 @@
+from globals import (
+    RELATED_VIDEOS_TOP_K, RELATED_VIDEOS_BLOCK_SIZE, RELATED_VIDEOS_MAX_BLOCK_NNZ, RELATED_VIDEOS_MIN_COMMON_LIKES,
+    RELATED_VIDEOS_MAX_USER_LIKES, RELATED_VIDEOS_TTL_SECONDS
+)
+from models.entities import video_like_association_table
+from log.setup import setup_logging, shutdown_logging
+from log.loggers import RELATED_VIDEOS_LOGGER
+from config.redis_conf import redis_client
+from services.related_videos_service import RELATED_KEY
+from config.db_conf import engine
+from sqlalchemy import select
+import scipy.sparse as sp
+import numpy as np
+import argparse
+import asyncio
+import time
+import uuid
+
+#
+# "Viewers who liked this also liked": item-item cosine similarity over the
+# user x video like matrix, computed offline and written to redis.
+#
+#   1. Likes are streamed ordered by user through the (users_id, video_id)
+#      index, so users get dense indexes without a dict of all user ids.
+#   2. The binary matrix is built in CSR. Users with more likes than
+#      max_user_likes are left out: a user with n likes adds n^2 pairs and
+#      says little about any of them.
+#   3. Co-occurrence counts X^T X are computed for a block of videos at a
+#      time, scaled to cosine and cut to the top k per video with one sort.
+#      A block is at most block_size videos and its rows have at most
+#      max_block_nnz entries, so memory stays bounded whatever the number of
+#      videos and however popular the videos of a block are.
+#   4. Every video's neighbours are one redis string of packed 16 byte ids.
+#
+
+STREAM_CHUNK_SIZE = 100_000
+WRITE_BATCH_SIZE = 1000
+
+
+class LikeMatrixBuilder:
+    def __init__(self):
+        self.video_ids: list[uuid.UUID] = []
+        self.__video_index: dict[uuid.UUID, int] = {}
+        self.__users: list[np.ndarray] = []
+        self.__videos: list[np.ndarray] = []
+        self.__last_user: uuid.UUID | None = None
+        self.__user_count = 0
+
+    def add_chunk(self, rows: list[tuple[uuid.UUID, uuid.UUID]]):
+        users = np.empty(len(rows), dtype=np.int32)
+        videos = np.empty(len(rows), dtype=np.int32)
+
+        for position, (user_id, video_id) in enumerate(rows):
+            if user_id != self.__last_user:
+                self.__last_user = user_id
+                self.__user_count += 1
+
+            video = self.__video_index.get(video_id)
+            if video is None:
+                video = self.__video_index[video_id] = len(self.video_ids)
+                self.video_ids.append(video_id)
+
+            users[position] = self.__user_count - 1
+            videos[position] = video
+
+        self.__users.append(users)
+        self.__videos.append(videos)
+
+    def build(self) -> sp.csr_matrix:
+        if len(self.__users) == 0:
+            return sp.csr_matrix((0, 0), dtype=np.float32)
+
+        return like_matrix(
+            np.concatenate(self.__users), np.concatenate(self.__videos), self.__user_count, len(self.video_ids)
+        )
+
+
+def like_matrix(users: np.ndarray, videos: np.ndarray, user_count: int, video_count: int) -> sp.csr_matrix:
+    matrix = sp.csr_matrix(
+        (np.ones(len(users), dtype=np.float32), (users, videos)), shape=(user_count, video_count)
+    )
+    # Duplicate pairs are summed by the constructor, likes are binary
+    matrix.data[:] = 1
+    return matrix
+
+
+def drop_heavy_users(matrix: sp.csr_matrix, max_user_likes: int) -> sp.csr_matrix:
+    likes = np.diff(matrix.indptr)
+    return matrix[likes <= max_user_likes]
+
+
+#
+# (start, stop) of consecutive video blocks. The co-occurrence row of a video
+# has at most one entry per like of its likers (and per video), blocks are cut
+# where those bounds add up to max_block_nnz; a single video may exceed it.
+#
+def video_blocks(matrix: sp.csr_matrix, by_video: sp.csr_matrix, block_size: int, max_block_nnz: int) -> list[tuple[int, int]]:
+    video_count = matrix.shape[1]
+    user_likes = np.diff(matrix.indptr).astype(np.float64)
+    row_nnz = np.minimum(by_video @ user_likes, video_count)
+    ends = np.cumsum(row_nnz)
+
+    blocks = []
+    start = 0
+    while start < video_count:
+        stop = int(np.searchsorted(ends, ends[start] - row_nnz[start] + max_block_nnz, side="right"))
+        stop = min(max(stop, start + 1), start + block_size, video_count)
+        blocks.append((start, stop))
+        start = stop
+
+    return blocks
+
+
+#
+# Returns a (videos, k) int32 array of neighbour indexes, best first, -1 padded
+#
+def top_k_similar(
+    matrix: sp.csr_matrix,
+    k: int,
+    block_size: int,
+    max_block_nnz: int,
+    min_common_likes: int
+) -> np.ndarray:
+    video_count = matrix.shape[1]
+    neighbours = np.full((video_count, k), -1, dtype=np.int32)
+    if video_count == 0:
+        return neighbours
+
+    by_video = matrix.T.tocsr()
+    norms = np.sqrt(np.diff(by_video.indptr)).astype(np.float32)
+
+    for start, stop in video_blocks(matrix, by_video, block_size, max_block_nnz):
+
+        # Rows are the videos of the block, values are the number of common likers
+        common = (by_video[start:stop] @ matrix).tocoo()
+        rows, cols, counts = common.row, common.col, common.data
+
+        keep = (counts >= min_common_likes) & (cols != rows + start)
+        rows, cols, counts = rows[keep], cols[keep], counts[keep]
+        scores = counts / (norms[rows + start] * norms[cols])
+
+        # Grouped by row, best first inside each row; rank is the position inside the row
+        order = np.lexsort((-scores, rows))
+        rows, cols = rows[order], cols[order]
+        row_starts = np.searchsorted(rows, np.arange(stop - start))
+        rank = np.arange(len(rows)) - row_starts[rows]
+
+        top = rank < k
+        neighbours[rows[top] + start, rank[top]] = cols[top]
+
+    return neighbours
+
+
+async def load_likes(max_user_likes: int) -> tuple[sp.csr_matrix, list[uuid.UUID]]:
+    query = (
+        select(video_like_association_table.c.users_id, video_like_association_table.c.video_id)
+        .order_by(video_like_association_table.c.users_id)
+        .execution_options(yield_per=STREAM_CHUNK_SIZE)
+    )
+    builder = LikeMatrixBuilder()
+
+    async with engine.connect() as conn:
+        result = await conn.stream(query)
+        async for rows in result.partitions():
+            builder.add_chunk(rows)
+
+    return (drop_heavy_users(builder.build(), max_user_likes), builder.video_ids)
+
+
+async def write_neighbours(video_ids: list[uuid.UUID], neighbours: np.ndarray, ttl: int) -> int:
+    packed_ids = np.frombuffer(b"".join(video_id.bytes for video_id in video_ids), dtype="S16")
+    written = 0
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for video, row in enumerate(neighbours):
+            row = row[row >= 0]
+            if len(row) == 0:
+                continue
+
+            pipe.set(RELATED_KEY.format(video_id=video_ids[video]), packed_ids[row].tobytes(), ex=ttl)
+            written += 1
+
+            if len(pipe) == WRITE_BATCH_SIZE:
+                await pipe.execute()
+        await pipe.execute()
+
+    return written
+
+
+async def run(top_k: int, block_size: int, max_block_nnz: int, min_common_likes: int, max_user_likes: int, ttl: int):
+    started_at = time.perf_counter()
+    matrix, video_ids = await load_likes(max_user_likes)
+    loaded_at = time.perf_counter()
+
+    neighbours = top_k_similar(matrix, top_k, block_size, max_block_nnz, min_common_likes)
+    computed_at = time.perf_counter()
+
+    written = await write_neighbours(video_ids, neighbours, ttl)
+
+    RELATED_VIDEOS_LOGGER.info(
+        f"Related videos are built | users {matrix.shape[0]} ; videos {len(video_ids)} ; likes {matrix.nnz} ; "
+        f"written {written} ; load {loaded_at - started_at:.1f} s ; compute {computed_at - loaded_at:.1f} s ; "
+        f"write {time.perf_counter() - computed_at:.1f} s"
+    )
+
+
+async def main(args):
+    setup_logging()
+    try:
+        await run(
+            args.top_k, args.block_size, args.max_block_nnz, args.min_common_likes, args.max_user_likes,
+            RELATED_VIDEOS_TTL_SECONDS
+        )
+    finally:
+        await redis_client.aclose()
+        if engine != None:
+            await engine.dispose()
+        shutdown_logging()
+
+
+#
+# Run from src/video_service, e.g. nightly:
+#   python -m jobs.related_videos [--top-k 20] [--block-size 2048]
+#
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top-k", type=int, default=RELATED_VIDEOS_TOP_K)
+    parser.add_argument("--block-size", type=int, default=RELATED_VIDEOS_BLOCK_SIZE)
+    parser.add_argument("--max-block-nnz", type=int, default=RELATED_VIDEOS_MAX_BLOCK_NNZ)
+    parser.add_argument("--min-common-likes", type=int, default=RELATED_VIDEOS_MIN_COMMON_LIKES)
+    parser.add_argument("--max-user-likes", type=int, default=RELATED_VIDEOS_MAX_USER_LIKES)
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,29 @@
+from globals import LOGS_ROUTE_LEVELS
+from contextvars import ContextVar
+import logging
+
+REQUEST_ID: ContextVar[str | None] = ContextVar("REQUEST_ID", default=None)
+ROUTE_LOGS_LEVEL: ContextVar[int] = ContextVar("ROUTE_LOGS_LEVEL", default=logging.NOTSET)
+
+# Longest prefix first, so the most specific route wins
+__ROUTE_LEVELS = sorted(LOGS_ROUTE_LEVELS.items(), key=lambda item: len(item[0]), reverse=True)
+
+
+def route_logs_level(path: str) -> int:
+    for prefix, level in __ROUTE_LEVELS:
+        if path.startswith(prefix):
+            return level
+    return logging.NOTSET
+
+
+#
+# Stamps every record with the request id of the current context and drops
+# records below the level configured for the current route
+#
+class RequestContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < ROUTE_LOGS_LEVEL.get():
+            return False
+
+        record.request_id = REQUEST_ID.get()
+        return True
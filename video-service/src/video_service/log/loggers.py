@@ -3,3 +3,19 @@ import logging
 APP_LOGGER: logging.Logger = logging.getLogger("APP")
 EXCEPTION_HANDLER_LOGGER: logging.Logger = logging.getLogger("EXCEPTION HANDLER")
 TEST_LOGGER: logging.Logger = logging.getLogger("TEST")
+
+VIDEO_FEED_SERVICE_LOGGER: logging.Logger = logging.getLogger("VIDEO FEED SERVICE")
+LIKE_SERVICE_LOGGER: logging.Logger = logging.getLogger("LIKE SERVICE")
+LIKE_COUNTER_LOGGER: logging.Logger = logging.getLogger("LIKE COUNTER")
+LIKE_MEMBERSHIP_LOGGER: logging.Logger = logging.getLogger("LIKE MEMBERSHIP")
+TAG_INDEX_LOGGER: logging.Logger = logging.getLogger("TAG INDEX")
+TAG_SEARCH_SERVICE_LOGGER: logging.Logger = logging.getLogger("TAG SEARCH SERVICE")
+VIDEO_SEARCH_SERVICE_LOGGER: logging.Logger = logging.getLogger("VIDEO SEARCH SERVICE")
+TRENDING_LOGGER: logging.Logger = logging.getLogger("TRENDING")
+TRENDING_SERVICE_LOGGER: logging.Logger = logging.getLogger("TRENDING SERVICE")
+RELATED_VIDEOS_LOGGER: logging.Logger = logging.getLogger("RELATED VIDEOS")
+UPLOAD_STORE_LOGGER: logging.Logger = logging.getLogger("UPLOAD STORE")
+UPLOAD_SERVICE_LOGGER: logging.Logger = logging.getLogger("UPLOAD SERVICE")
+BLOB_STORE_LOGGER: logging.Logger = logging.getLogger("BLOB STORE")
+VIDEO_FILES_LOGGER: logging.Logger = logging.getLogger("VIDEO FILES")
+VIDEO_FILE_SERVICE_LOGGER: logging.Logger = logging.getLogger("VIDEO FILE SERVICE")
\ No newline at end of file
@@ -0,0 +1,275 @@
+from globals import (
+    SERVICE_NAME, TRACING_EXPORTER, TRACING_SAMPLE_RATE, TRACING_FILENAME, TRACING_OTLP_ENDPOINT,
+    TRACING_QUEUE_SIZE, TRACING_BATCH_SIZE, TRACING_EXPORT_INTERVAL_MS
+)
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+import urllib.request
+import threading
+import logging
+import random
+import orjson
+import queue
+import time
+import os
+
+TRACING_LOGGER: logging.Logger = logging.getLogger("TRACING")
+
+
+#
+# Minimal span model with W3C trace context propagation. Sampling is decided
+# once at the trace root (head based) and travels in the traceparent flags,
+# unsampled spans are a shared no-op object and cost nothing to end.
+#
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    sampled = True
+
+    def __init__(self, trace_id: str, parent_id: str | None, name: str, kind: str, attributes: dict | None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes if attributes is not None else {}
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self, error: BaseException | None = None):
+        if self.end_ns is not None:
+            return
+
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+        EXPORTER.export(self)
+
+
+class NoopSpan:
+    sampled = False
+
+    def __init__(self, trace_id: str | None = None, parent_id: str | None = None):
+        self.trace_id = trace_id
+        self.span_id = parent_id
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def traceparent(self) -> str | None:
+        if self.trace_id is None:
+            return None
+        return f"00-{self.trace_id}-{self.span_id}-00"
+
+    def end(self, error: BaseException | None = None):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+CURRENT_SPAN: ContextVar[Span | NoopSpan] = ContextVar("CURRENT_SPAN", default=NOOP_SPAN)
+
+
+def parse_traceparent(traceparent: str | None) -> tuple[str, str, bool] | None:
+    if traceparent is None:
+        return None
+
+    parts = traceparent.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        return (parts[1], parts[2], int(parts[3], 16) & 1 == 1)
+    except ValueError:
+        return None
+
+
+#
+# Starts a span as a child of the current one. Without a current span a new
+# trace is started (continued from traceparent when one was received),
+# unless new_trace is off, as for db and redis calls made outside of requests.
+#
+def start_span(
+    name: str,
+    kind: str = "internal",
+    attributes: dict | None = None,
+    traceparent: str | None = None,
+    new_trace: bool = True
+):
+    parent = CURRENT_SPAN.get()
+
+    if parent.trace_id is None:
+        if not new_trace:
+            return NOOP_SPAN
+
+        remote = parse_traceparent(traceparent)
+
+        if remote is not None:
+            trace_id, parent_id, sampled = remote
+        else:
+            trace_id, parent_id, sampled = f"{random.getrandbits(128):032x}", None, random.random() < TRACING_SAMPLE_RATE
+
+        if not sampled or not EXPORTER.enabled:
+            return NoopSpan(trace_id, parent_id if parent_id is not None else f"{random.getrandbits(64):016x}")
+
+        return Span(trace_id, parent_id, name, kind, attributes)
+
+    if not parent.sampled:
+        return parent
+
+    return Span(parent.trace_id, parent.span_id, name, kind, attributes)
+
+
+@contextmanager
+def span(
+    name: str,
+    kind: str = "internal",
+    attributes: dict | None = None,
+    traceparent: str | None = None,
+    new_trace: bool = True
+):
+    current = start_span(name, kind, attributes, traceparent, new_trace)
+    token = CURRENT_SPAN.set(current)
+
+    try:
+        yield current
+    except BaseException as ex:
+        current.end(ex)
+        raise
+    finally:
+        CURRENT_SPAN.reset(token)
+        current.end()
+
+
+#
+# Collects finished spans in a bounded queue, a background thread writes them
+# in batches to a JSON lines file or an OTLP/HTTP (JSON) collector.
+# Spans are dropped, never waited for, when the queue is full.
+#
+class BatchSpanExporter:
+    def __init__(self, exporter: str, filename: str, endpoint: str | None, queue_size: int, batch_size: int, interval: float):
+        self.enabled = exporter in ("file", "otlp")
+        self.dropped = 0
+
+        self.__exporter = exporter
+        self.__filename = filename
+        self.__endpoint = endpoint
+        self.__batch_size = batch_size
+        self.__interval = interval
+        self.__queue: queue.Queue[Span] = queue.Queue(maxsize=queue_size)
+        self.__stopped = threading.Event()
+        self.__thread: threading.Thread | None = None
+
+    def export(self, span: Span):
+        try:
+            self.__queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        if self.enabled and self.__thread is None:
+            self.__stopped.clear()
+            self.__thread = threading.Thread(target=self.__run, name="span-exporter", daemon=True)
+            self.__thread.start()
+
+    def stop(self):
+        if self.__thread is None:
+            return
+
+        self.__stopped.set()
+        self.__thread.join()
+        self.__thread = None
+
+    def __run(self):
+        while not self.__stopped.is_set():
+            self.__stopped.wait(self.__interval)
+            self.__flush()
+        self.__flush()
+
+    def __flush(self):
+        while not self.__queue.empty():
+            batch = []
+            while len(batch) < self.__batch_size:
+                try:
+                    batch.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                if self.__exporter == "otlp":
+                    self.__send_otlp(batch)
+                else:
+                    self.__write_file(batch)
+            except (OSError, ValueError) as ex:
+                TRACING_LOGGER.warning(f"Span batch of {len(batch)} is lost | {ex}")
+
+    def __write_file(self, batch: list[Span]):
+        filename = self.__filename.format(date=datetime.now().strftime('%Y-%m-%d'))
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+
+        with open(filename, "ab") as file:
+            for span in batch:
+                file.write(orjson.dumps({
+                    "service": SERVICE_NAME,
+                    "trace_id": span.trace_id,
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "name": span.name,
+                    "kind": span.kind,
+                    "start_ns": span.start_ns,
+                    "duration_ms": (span.end_ns - span.start_ns) / 1e6,
+                    "attributes": span.attributes,
+                    "error": span.error
+                }, default=str))
+                file.write(b"\n")
+
+    def __send_otlp(self, batch: list[Span]):
+        kinds = {"internal": 1, "server": 2, "client": 3}
+        body = orjson.dumps({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": SERVICE_NAME},
+                "spans": [{
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": kinds.get(span.kind, 1),
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [
+                        {"key": key, "value": {"stringValue": str(value)}}
+                        for key, value in span.attributes.items()
+                    ],
+                    "status": {"code": 2, "message": span.error} if span.error is not None else {"code": 0}
+                } for span in batch]
+            }]
+        }]})
+
+        request = urllib.request.Request(
+            self.__endpoint,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+
+EXPORTER = BatchSpanExporter(
+    exporter=TRACING_EXPORTER,
+    filename=TRACING_FILENAME,
+    endpoint=TRACING_OTLP_ENDPOINT,
+    queue_size=TRACING_QUEUE_SIZE,
+    batch_size=TRACING_BATCH_SIZE,
+    interval=TRACING_EXPORT_INTERVAL_MS / 1000
+)
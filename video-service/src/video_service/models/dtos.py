@@ -0,0 +1,48 @@
+from globals import LIKE_LOOKUP_MAX_VIDEOS, UPLOAD_MAX_SIZE
+from pydantic import BaseModel, Field
+import datetime
+import uuid
+
+class AuthorDto(BaseModel):
+    id: uuid.UUID
+    name: str
+    profile_picture: str
+
+class VideoFeedItem(BaseModel):
+    id: uuid.UUID
+    name: str
+    created_at: datetime.datetime
+    author: AuthorDto
+    tags: list[str]
+
+class VideoFeedPage(BaseModel):
+    items: list[VideoFeedItem]
+    # Opaque, passed back as ?cursor= to get the next page; null on the last page
+    next_cursor: str | None
+
+class VideoLikes(BaseModel):
+    video_id: uuid.UUID
+    like_count: int
+
+class LikeLookup(BaseModel):
+    video_ids: list[uuid.UUID] = Field(max_length=LIKE_LOOKUP_MAX_VIDEOS)
+
+class LikeStates(BaseModel):
+    # liked[i] is the state of video_ids[i]
+    liked: list[bool]
+
+class TagSuggestion(BaseModel):
+    name: str
+    video_count: int
+
+class UploadCreate(BaseModel):
+    name: str = Field(min_length=1)
+    size: int = Field(gt=0, le=UPLOAD_MAX_SIZE)
+    # Hex sha256 of the whole file, checked when the upload is finished
+    sha256: str | None = Field(None, pattern="^[0-9a-fA-F]{64}$")
+
+class UploadStatus(BaseModel):
+    upload_id: uuid.UUID
+    size: int
+    # Bytes stored so far, the next chunk is sent from here
+    offset: int
@@ -1,19 +1,22 @@
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import Column, Integer, String, ARRAY, Float, ForeignKey, Date, UUID, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ARRAY, Float, ForeignKey, Date, UUID, Table, DateTime, Index, func, BigInteger, Computed, LargeBinary, text
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 class Base(DeclarativeBase):
     pass
 
 
-__video_like_association_table = Table(
+video_like_association_table = Table(
     "video_likes_association_table",
     Base.metadata,
     Column("video_id", ForeignKey("videos.id"), primary_key=True),
-    Column("users_id", ForeignKey("users_data.id"), primary_key=True)
+    Column("users_id", ForeignKey("users_data.id"), primary_key=True),
+    # The primary key leads with video_id, lookups of a user's likes need the reverse order
+    Index("ix_video_likes_users_id_video_id", "users_id", "video_id")
 )
 
-__video_tags_association_table = Table(
+video_tags_association_table = Table(
     "video_tags_association_table",
     Base.metadata,
     Column("video_id", ForeignKey("videos.id"), primary_key=True),
@@ -28,44 +31,93 @@ class VideoTags(Base):
 
     videos = relationship(
         "Video",
-        secondary=__video_tags_association_table,
+        secondary=video_tags_association_table,
         back_populates="tags",
-        lazy="select"
+        lazy="raise"
     )
 
 
 class UserData(Base):
-    __tablename__ = "users_data",
+    __tablename__ = "users_data"
     id = Column(UUID, primary_key=True, nullable=False)
     name = Column(String, nullable=False)
     profile_picture = Column(String, nullable=False)
 
-    videos = relationship("Video", back_populates="author", lazy="select")
+    videos = relationship("Video", back_populates="author", lazy="raise")
     liked_videos = relationship(
         "Video",
-        secondary=__video_like_association_table,
+        secondary=video_like_association_table,
         back_populates="liked_users",
-        lazy="select"                            
+        lazy="raise"                            
     )
 
 
+#
+# Content-addressed video storage, see config/blob_store.py
+#
+class BlobManifest(Base):
+    __tablename__ = "blob_manifests"
+    __table_args__ = (
+        # The garbage collector only looks for unreferenced manifests
+        Index("ix_blob_manifests_unreferenced", "digest", postgresql_where=text("ref_count = 0")),
+    )
+    # sha256 of the whole file
+    digest = Column(LargeBinary, primary_key=True, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    # Packed (chunk sha256, 8 byte big endian size) records in file order
+    chunks = deferred(Column(LargeBinary, nullable=False))
+    # Videos pointing at the manifest
+    ref_count = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class BlobChunk(Base):
+    __tablename__ = "blob_chunks"
+    __table_args__ = (
+        Index("ix_blob_chunks_unreferenced", "digest", postgresql_where=text("ref_count = 0")),
+    )
+    # sha256 of the chunk, the file is {BLOB_DIR}/chunks/ab/cd/abcd...
+    digest = Column(LargeBinary, primary_key=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    # Occurrences in manifests
+    ref_count = Column(BigInteger, nullable=False)
+
+
+#
+# Relationships are lazy="raise": under AsyncSession an implicit lazy load
+# can't run anyway, every query states what it loads.
+#
 class Video(Base):
     __tablename__ = "videos"
+    __table_args__ = (
+        # Keyset pagination of the feed walks (created_at, id) backwards
+        Index("ix_videos_created_at_id", "created_at", "id"),
+        # Search: full-text match on name_tsv, typo tolerant trigram match on name
+        Index("ix_videos_name_tsv", "name_tsv", postgresql_using="gin"),
+        Index("ix_videos_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"})
+    )
     id = Column(UUID, primary_key=True, nullable=False)
     name = Column(String, nullable=False)
     author_id = Column(UUID, ForeignKey("users_data.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Denormalized count of liked_users, kept up to date by the like counter flusher
+    like_count = Column(BigInteger, nullable=False, server_default="0")
+    # Stored file, null for videos from before the blob store
+    manifest_digest = Column(LargeBinary, ForeignKey("blob_manifests.digest"), nullable=True)
+    # Generated by postgres, only used in WHERE and ORDER BY of the search
+    name_tsv = deferred(Column(TSVECTOR, Computed("to_tsvector('russian', name)", persisted=True)))
 
-    author = relationship("UserData", back_populates="videos", lazy="select")
+    author = relationship("UserData", back_populates="videos", lazy="raise")
     liked_users = relationship(
         "UserData",
-        secondary=__video_like_association_table,
+        secondary=video_like_association_table,
         back_populates="liked_videos" ,
-        lazy="select"   
+        lazy="raise"   
     )
     tags = relationship(
         "VideoTags",
-        secondary=__video_tags_association_table,
+        secondary=video_tags_association_table,
         back_populates="videos",
-        lazy="select"
+        lazy="raise"
     )
 
@@ -0,0 +1,46 @@
+from config.lifecycle import lifecycle
+from fastapi import APIRouter, Response
+import orjson
+
+health_router = APIRouter()
+
+HEALTHY_CONTENT = orjson.dumps({"status": "OK"})
+
+
+#
+# Liveness, answers as long as the event loop does
+#
+@health_router.get("/healthz")
+async def router_healthz():
+    return Response(content=HEALTHY_CONTENT, media_type="application/json")
+
+
+#
+# Readiness, false until warm up is done, while draining and
+# whenever one of the dependencies doesn't answer the check
+#
+@health_router.get("/readyz")
+async def router_readyz():
+    if not lifecycle.ready:
+        return Response(
+            content=orjson.dumps({"status": "draining" if lifecycle.draining else "starting"}),
+            status_code=503,
+            media_type="application/json"
+        )
+
+    checks = await lifecycle.check()
+    ready = all(result == "OK" for result in checks.values())
+
+    return Response(
+        content=orjson.dumps({"status": "OK" if ready else "unavailable", "checks": checks}),
+        status_code=200 if ready else 503,
+        media_type="application/json"
+    )
+
+
+#
+# Counters of the pools, caches and error handlers, as they are now
+#
+@health_router.get("/metrics")
+async def router_metrics():
+    return Response(content=orjson.dumps(lifecycle.stats()), media_type="application/json")
@@ -0,0 +1,27 @@
+from globals import VIDEO_FEED_DEFAULT_PAGE_SIZE, VIDEO_FEED_MAX_PAGE_SIZE, TAG_SEARCH_MAX_TAGS, TAG_AUTOCOMPLETE_MAX_SIZE
+from services.tag_search_service import search_by_tags, autocomplete_tags
+from config.responses import model_response
+from fastapi import APIRouter, Query
+
+tag_router = APIRouter(prefix="/tags")
+
+
+#
+# ?tags=a&tags=b, mode "and" wants every tag on a video, "or" any of them
+#
+@tag_router.get("/videos")
+async def router_search_by_tags(
+    tags: list[str] = Query(..., min_length=1, max_length=TAG_SEARCH_MAX_TAGS),
+    mode: str = "and",
+    cursor: str | None = None,
+    limit: int = Query(VIDEO_FEED_DEFAULT_PAGE_SIZE, ge=1, le=VIDEO_FEED_MAX_PAGE_SIZE)
+):
+    return model_response(await search_by_tags(tags, mode, cursor, limit))
+
+
+@tag_router.get("/autocomplete")
+async def router_autocomplete_tags(
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=TAG_AUTOCOMPLETE_MAX_SIZE)
+):
+    return model_response(await autocomplete_tags(prefix, limit))
@@ -0,0 +1,44 @@
+from services.upload_service import create_upload, get_upload, write_upload, finish_upload, cancel_upload
+from fastapi import APIRouter, Header, Depends, Request, Response
+from routers.video_router import current_user_id
+from config.responses import model_response
+from models.dtos import UploadCreate
+import uuid
+
+upload_router = APIRouter(prefix="/videos/uploads")
+
+
+@upload_router.post("")
+async def router_create_upload(upload: UploadCreate, user_id: uuid.UUID = Depends(current_user_id)):
+    return model_response(await create_upload(user_id, upload), status_code=201)
+
+
+@upload_router.get("/{upload_id}")
+async def router_get_upload(upload_id: uuid.UUID, user_id: uuid.UUID = Depends(current_user_id)):
+    return model_response(await get_upload(user_id, upload_id))
+
+
+#
+# The body is read as a stream and never buffered whole, a chunk can be
+# as large as the rest of the upload. Upload-Offset in the response is
+# where the next chunk starts.
+#
+@upload_router.patch("/{upload_id}", status_code=204)
+async def router_write_upload(
+    upload_id: uuid.UUID,
+    req: Request,
+    upload_offset: int = Header(..., ge=0),
+    user_id: uuid.UUID = Depends(current_user_id)
+):
+    offset = await write_upload(user_id, upload_id, upload_offset, req.stream())
+    return Response(status_code=204, headers={"Upload-Offset": str(offset)})
+
+
+@upload_router.post("/{upload_id}/finish")
+async def router_finish_upload(upload_id: uuid.UUID, user_id: uuid.UUID = Depends(current_user_id)):
+    return model_response(await finish_upload(user_id, upload_id), status_code=201)
+
+
+@upload_router.delete("/{upload_id}", status_code=204)
+async def router_cancel_upload(upload_id: uuid.UUID, user_id: uuid.UUID = Depends(current_user_id)):
+    await cancel_upload(user_id, upload_id)
@@ -0,0 +1,86 @@
+from globals import VIDEO_FEED_DEFAULT_PAGE_SIZE, VIDEO_FEED_MAX_PAGE_SIZE, VIDEO_SEARCH_MAX_QUERY_LENGTH, TRENDING_MAX_SIZE, RELATED_VIDEOS_TOP_K
+from services.like_service import like_video, unlike_video, get_likes, get_like_states
+from services.session_service import get_session_user_id
+from services.video_feed_service import get_feed
+from services.video_search_service import search_videos
+from services.trending_service import get_trending, record_view
+from services.related_videos_service import get_related
+from services.video_file_service import serve_video_file, stream_client
+from config.responses import model_response
+from models.dtos import LikeLookup
+from fastapi import APIRouter, Query, Cookie, Depends, Request, Response
+import uuid
+
+video_router = APIRouter(prefix="/videos")
+
+
+async def current_user_id(session_id: str | None = Cookie(None)) -> uuid.UUID:
+    return await get_session_user_id(session_id)
+
+
+@video_router.get("/feed")
+async def router_feed(
+    cursor: str | None = None,
+    limit: int = Query(VIDEO_FEED_DEFAULT_PAGE_SIZE, ge=1, le=VIDEO_FEED_MAX_PAGE_SIZE)
+):
+    return model_response(await get_feed(cursor, limit))
+
+
+@video_router.get("/trending")
+async def router_trending(
+    tag: str | None = None,
+    limit: int = Query(VIDEO_FEED_DEFAULT_PAGE_SIZE, ge=1, le=TRENDING_MAX_SIZE)
+):
+    return model_response(await get_trending(limit, tag))
+
+
+@video_router.get("/search")
+async def router_search(
+    q: str = Query(..., min_length=1, max_length=VIDEO_SEARCH_MAX_QUERY_LENGTH),
+    cursor: str | None = None,
+    limit: int = Query(VIDEO_FEED_DEFAULT_PAGE_SIZE, ge=1, le=VIDEO_FEED_MAX_PAGE_SIZE)
+):
+    return Response(content=await search_videos(q, cursor, limit), media_type="application/json")
+
+
+#
+# Like state of the current user for a batch of videos, e.g. a feed page
+#
+@video_router.post("/likes/lookup")
+async def router_like_lookup(lookup: LikeLookup, user_id: uuid.UUID = Depends(current_user_id)):
+    return model_response(await get_like_states(user_id, lookup.video_ids))
+
+
+@video_router.get("/{video_id}/likes")
+async def router_get_likes(video_id: uuid.UUID):
+    return model_response(await get_likes(video_id))
+
+
+@video_router.post("/{video_id}/like")
+async def router_like_video(video_id: uuid.UUID, user_id: uuid.UUID = Depends(current_user_id)):
+    return model_response(await like_video(user_id, video_id))
+
+
+@video_router.delete("/{video_id}/like")
+async def router_unlike_video(video_id: uuid.UUID, user_id: uuid.UUID = Depends(current_user_id)):
+    return model_response(await unlike_video(user_id, video_id))
+
+
+@video_router.get("/{video_id}/related")
+async def router_related(video_id: uuid.UUID, limit: int = Query(10, ge=1, le=RELATED_VIDEOS_TOP_K)):
+    return model_response(await get_related(video_id, limit))
+
+
+@video_router.post("/{video_id}/view", status_code=204)
+async def router_record_view(video_id: uuid.UUID, user_id: uuid.UUID = Depends(current_user_id)):
+    await record_view(user_id, video_id)
+
+
+#
+# The stored file, Range and conditional requests are supported. HEAD
+# gives size and validators without opening a stream.
+#
+@video_router.api_route("/{video_id}/file", methods=["GET", "HEAD"])
+async def router_video_file(video_id: uuid.UUID, req: Request, session_id: str | None = Cookie(None)):
+    client = await stream_client(session_id, req.headers, req.client.host if req.client != None else "")
+    return await serve_video_file(video_id, req.method, req.headers, client)
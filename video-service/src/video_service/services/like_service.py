@@ -0,0 +1,85 @@
+from models.entities import video_like_association_table
+from sqlalchemy.dialects.postgresql import insert
+from log.loggers import LIKE_SERVICE_LOGGER
+from config.like_membership import like_membership
+from config.like_counter import like_counter
+from config.trending import trending_scores
+from globals import TRENDING_LIKE_WEIGHT
+from config.db_conf import AsyncSessionMaker
+from sqlalchemy.ext.asyncio import AsyncSession
+from log.wrappers import log_entrance_debug
+from exceptions import NotFoundException
+from sqlalchemy.exc import IntegrityError
+from models.dtos import VideoLikes, LikeStates
+from sqlalchemy import delete
+import uuid
+
+#
+# The association row is written first and the counter is only moved when
+# the row really appeared or disappeared, so repeated likes are idempotent.
+#
+
+
+@log_entrance_debug(LIKE_SERVICE_LOGGER)
+async def like_video(user_id: uuid.UUID, video_id: uuid.UUID) -> VideoLikes:
+    query = (
+        insert(video_like_association_table)
+        .values(video_id=video_id, users_id=user_id)
+        .on_conflict_do_nothing()
+        .returning(video_like_association_table.c.video_id)
+    )
+
+    async with AsyncSessionMaker() as session:
+        session: AsyncSession
+
+        try:
+            inserted = (await session.execute(query)).first() != None
+            await session.commit()
+        except IntegrityError:
+            raise NotFoundException("Video not found.")
+
+    if inserted:
+        await like_counter.increment(video_id, 1)
+        await like_membership.update(user_id, video_id, True)
+        await trending_scores.record(video_id, TRENDING_LIKE_WEIGHT, f"like:{user_id}")
+
+    return await get_likes(video_id)
+
+
+@log_entrance_debug(LIKE_SERVICE_LOGGER)
+async def unlike_video(user_id: uuid.UUID, video_id: uuid.UUID) -> VideoLikes:
+    query = (
+        delete(video_like_association_table)
+        .where(
+            video_like_association_table.c.video_id == video_id,
+            video_like_association_table.c.users_id == user_id
+        )
+        .returning(video_like_association_table.c.video_id)
+    )
+
+    async with AsyncSessionMaker() as session:
+        session: AsyncSession
+
+        deleted = (await session.execute(query)).first() != None
+        await session.commit()
+
+    if deleted:
+        await like_counter.increment(video_id, -1)
+        await like_membership.update(user_id, video_id, False)
+
+    return await get_likes(video_id)
+
+
+@log_entrance_debug(LIKE_SERVICE_LOGGER)
+async def get_likes(video_id: uuid.UUID) -> VideoLikes:
+    like_count = await like_counter.get(video_id)
+
+    if like_count == None:
+        raise NotFoundException("Video not found.")
+
+    return VideoLikes(video_id=video_id, like_count=like_count)
+
+
+@log_entrance_debug(LIKE_SERVICE_LOGGER, log_result=False)
+async def get_like_states(user_id: uuid.UUID, video_ids: list[uuid.UUID]) -> LikeStates:
+    return LikeStates(liked=await like_membership.has_liked(user_id, video_ids))
@@ -0,0 +1,21 @@
+from .video_feed_service import load_feed_items
+from log.loggers import RELATED_VIDEOS_LOGGER
+from log.wrappers import log_entrance_debug
+from config.redis_conf import redis_client
+from models.dtos import VideoFeedItem
+import uuid
+
+#
+# Neighbours are precomputed by jobs/related_videos.py, best first,
+# as one string of packed 16 byte video ids per video
+#
+RELATED_KEY = "related_videos:{video_id}"
+
+
+@log_entrance_debug(RELATED_VIDEOS_LOGGER, log_result=False)
+async def get_related(video_id: uuid.UUID, limit: int) -> list[VideoFeedItem]:
+    packed_ids = await redis_client.getrange(RELATED_KEY.format(video_id=video_id), 0, limit * 16 - 1)
+
+    return await load_feed_items([
+        uuid.UUID(bytes=packed_ids[offset:offset + 16]) for offset in range(0, len(packed_ids), 16)
+    ])
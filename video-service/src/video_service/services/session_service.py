@@ -0,0 +1,20 @@
+from exceptions import UnauthorizedException
+from config.redis_conf import redis_client
+import orjson
+import uuid
+
+#
+# Sessions are created by auth-service in the shared redis,
+# here they are only read to find out who is making the request
+#
+
+
+async def get_session_user_id(session_id: str | None) -> uuid.UUID:
+    if session_id == None:
+        raise UnauthorizedException("Session id is required.")
+
+    session_data = await redis_client.get(session_id)
+    if session_data == None:
+        raise UnauthorizedException("Session id is expired.")
+
+    return uuid.UUID(orjson.loads(session_data)["user_id"])
@@ -0,0 +1,75 @@
+from exceptions import BadRequestException, ServiceUnavailableException
+from models.dtos import VideoFeedPage, TagSuggestion
+from .video_feed_service import load_feed_items
+from log.loggers import TAG_SEARCH_SERVICE_LOGGER
+from log.wrappers import log_entrance_debug
+from config.tag_index import tag_index
+import binascii
+import base64
+import orjson
+import uuid
+
+#
+# Videos by tags, newest first, answered from the redis tag index and
+# hydrated with the same two queries as the feed. The cursor is the
+# (score, video id) of the last returned video in the posting lists.
+#
+
+
+def encode_cursor(score: int, video_id: str) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps([score, video_id])).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[int, str]:
+    try:
+        score, video_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return (int(score), str(uuid.UUID(video_id)))
+    except (binascii.Error, orjson.JSONDecodeError, ValueError, TypeError):
+        raise BadRequestException("Invalid cursor")
+
+
+async def __current_version() -> str:
+    version = await tag_index.version()
+    if version == None:
+        raise ServiceUnavailableException("Tag index is being built")
+
+    return version
+
+
+@log_entrance_debug(TAG_SEARCH_SERVICE_LOGGER, log_result=False)
+async def search_by_tags(tags: list[str], mode: str, cursor: str | None, limit: int) -> VideoFeedPage:
+    if mode not in ("and", "or"):
+        raise BadRequestException("Mode must be and or or")
+
+    after = decode_cursor(cursor) if cursor != None else None
+    version = await __current_version()
+
+    tag_ids = await tag_index.resolve(version, tags)
+    known = list(dict.fromkeys(tag_id for tag_id in tag_ids if tag_id != None))
+
+    if len(known) == 0 or (mode == "and" and None in tag_ids):
+        return VideoFeedPage(items=[], next_cursor=None)
+
+    # One extra entry tells whether there is a next page
+    if mode == "and":
+        postings = await tag_index.intersect(version, known, after, limit + 1)
+    else:
+        postings = await tag_index.union(version, known, after, limit + 1)
+
+    has_next = len(postings) > limit
+    postings = postings[:limit]
+
+    return VideoFeedPage(
+        items=await load_feed_items([uuid.UUID(video_id) for _, video_id in postings]),
+        next_cursor=encode_cursor(*postings[-1]) if has_next else None
+    )
+
+
+@log_entrance_debug(TAG_SEARCH_SERVICE_LOGGER, log_result=False)
+async def autocomplete_tags(prefix: str, limit: int) -> list[TagSuggestion]:
+    version = await __current_version()
+
+    return [
+        TagSuggestion(name=name, video_count=video_count)
+        for name, video_count in await tag_index.autocomplete(version, prefix, limit)
+    ]
@@ -0,0 +1,32 @@
+from globals import TRENDING_VIEW_WEIGHT
+from exceptions import ServiceUnavailableException, NotFoundException, TooManyRequestsException
+from .video_feed_service import load_feed_items
+from config.trending import trending_scores
+from log.loggers import TRENDING_SERVICE_LOGGER
+from log.wrappers import log_entrance_debug
+from config.tag_index import tag_index
+from models.dtos import VideoFeedItem
+import uuid
+
+
+@log_entrance_debug(TRENDING_SERVICE_LOGGER, log_result=False)
+async def get_trending(limit: int, tag: str | None = None) -> list[VideoFeedItem]:
+    tag_id = None
+
+    if tag != None:
+        version = await tag_index.version()
+        if version == None:
+            raise ServiceUnavailableException("Tag index is being built")
+
+        tag_id = (await tag_index.resolve(version, [tag]))[0]
+        if tag_id == None:
+            raise NotFoundException("Tag not found.")
+
+    return await load_feed_items(await trending_scores.top(limit, tag_id))
+
+
+async def record_view(user_id: uuid.UUID, video_id: uuid.UUID):
+    if not await trending_scores.allow_view(user_id):
+        raise TooManyRequestsException("Too many views.")
+
+    await trending_scores.record(video_id, TRENDING_VIEW_WEIGHT, f"view:{user_id}")
@@ -0,0 +1,99 @@
+from exceptions import NotFoundException, ForbiddenException, BadRequestException, ConflictException
+from models.dtos import UploadCreate, UploadStatus, VideoFeedItem
+from config.upload_store import upload_store, UploadState
+from config.blob_store import blob_store
+from .video_feed_service import load_feed_items
+from log.loggers import UPLOAD_SERVICE_LOGGER
+from collections.abc import AsyncIterator
+from config.db_conf import AsyncSessionMaker
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import ClientDisconnect
+from log.wrappers import log_entrance_debug
+from sqlalchemy.exc import IntegrityError
+from models.entities import Video
+import uuid
+
+#
+# Resumable upload protocol, the storage side is config/upload_store.py:
+#   POST   /videos/uploads               declare name, size and optionally sha256
+#   PATCH  /videos/uploads/{id}          body is the next chunk, Upload-Offset header is where it starts
+#   GET    /videos/uploads/{id}          current offset, to resume after an interruption
+#   POST   /videos/uploads/{id}/finish   checks the hash, stores the file (config/blob_store.py) and creates the video
+#
+
+
+def to_status(state: UploadState) -> UploadStatus:
+    return UploadStatus(upload_id=state.upload_id, size=state.size, offset=state.offset)
+
+
+async def __owned_upload(user_id: uuid.UUID, upload_id: uuid.UUID) -> UploadState:
+    state = await upload_store.get(upload_id)
+    if state == None:
+        raise NotFoundException("Upload not found.")
+    if state.author_id != user_id:
+        raise ForbiddenException("Upload belongs to another user.")
+
+    return state
+
+
+@log_entrance_debug(UPLOAD_SERVICE_LOGGER)
+async def create_upload(user_id: uuid.UUID, upload: UploadCreate) -> UploadStatus:
+    state = await upload_store.create(user_id, upload.name, upload.size, (upload.sha256 or "").lower())
+    return to_status(state)
+
+
+@log_entrance_debug(UPLOAD_SERVICE_LOGGER)
+async def get_upload(user_id: uuid.UUID, upload_id: uuid.UUID) -> UploadStatus:
+    return to_status(await __owned_upload(user_id, upload_id))
+
+
+@log_entrance_debug(UPLOAD_SERVICE_LOGGER)
+async def write_upload(user_id: uuid.UUID, upload_id: uuid.UUID, offset: int, stream: AsyncIterator[bytes]) -> int:
+    state = await __owned_upload(user_id, upload_id)
+    if offset != state.offset:
+        raise ConflictException(f"Upload offset is {state.offset}.")
+
+    try:
+        return await upload_store.write(state, stream)
+    except ClientDisconnect:
+        # What arrived is stored, the client resumes from GET /videos/uploads/{id}
+        raise BadRequestException("Upload chunk was interrupted.")
+
+
+@log_entrance_debug(UPLOAD_SERVICE_LOGGER, log_result=False)
+async def finish_upload(user_id: uuid.UUID, upload_id: uuid.UUID) -> VideoFeedItem:
+    state = await __owned_upload(user_id, upload_id)
+    video_id = uuid.uuid4()
+
+    async with upload_store.completing(state) as digest:
+        if state.sha256 != "" and digest != state.sha256:
+            await upload_store.discard(state)
+            raise BadRequestException("Upload checksum does not match, the upload is discarded.")
+
+        manifest_digest = await blob_store.put(upload_store.path(upload_id), bytes.fromhex(digest))
+
+        async with AsyncSessionMaker() as session:
+            session: AsyncSession
+
+            session.add(Video(id=video_id, name=state.name, author_id=state.author_id, manifest_digest=manifest_digest))
+            # Without the video the reference taken by put() goes back, the garbage collector removes the rest
+            try:
+                await session.commit()
+            except IntegrityError:
+                await blob_store.release(manifest_digest)
+                raise NotFoundException("Author not found.")
+            except BaseException:
+                await blob_store.release(manifest_digest)
+                raise
+
+        await upload_store.discard(state)
+
+    UPLOAD_SERVICE_LOGGER.info(f"Upload is finished | upload {upload_id} ; video {video_id} ; {state.size} bytes")
+
+    return (await load_feed_items([video_id]))[0]
+
+
+@log_entrance_debug(UPLOAD_SERVICE_LOGGER)
+async def cancel_upload(user_id: uuid.UUID, upload_id: uuid.UUID):
+    state = await __owned_upload(user_id, upload_id)
+    await upload_store.discard(state)
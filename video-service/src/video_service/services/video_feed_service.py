@@ -0,0 +1,103 @@
+from models.dtos import VideoFeedPage, VideoFeedItem, AuthorDto
+from sqlalchemy.orm import joinedload, selectinload, load_only
+from models.entities import Video, VideoTags, UserData
+from log.loggers import VIDEO_FEED_SERVICE_LOGGER
+from config.db_conf import ReadOnlySessionMaker
+from sqlalchemy.ext.asyncio import AsyncSession
+from log.wrappers import log_entrance_debug
+from exceptions import BadRequestException
+from sqlalchemy import select, tuple_
+import datetime
+import binascii
+import base64
+import orjson
+import uuid
+
+#
+# Feed is ordered by (created_at, id) descending and paginated by keyset:
+# the cursor is the key of the last returned video and the next page starts
+# strictly below it, so every page is one index range scan however deep it is.
+#
+
+
+def encode_cursor(created_at: datetime.datetime, video_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps([created_at.isoformat(), str(video_id)])).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, uuid.UUID]:
+    try:
+        created_at, video_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return (datetime.datetime.fromisoformat(created_at), uuid.UUID(video_id))
+    except (binascii.Error, orjson.JSONDecodeError, ValueError, TypeError):
+        raise BadRequestException("Invalid cursor")
+
+
+#
+# Two queries per page whatever its size: videos with their author joined in,
+# then tags of all of them through one SELECT ... IN
+#
+FEED_ITEM_OPTIONS = (
+    load_only(Video.id, Video.name, Video.created_at, Video.author_id),
+    joinedload(Video.author, innerjoin=True).load_only(UserData.id, UserData.name, UserData.profile_picture),
+    selectinload(Video.tags).load_only(VideoTags.tag_name)
+)
+
+
+def to_feed_item(video: Video) -> VideoFeedItem:
+    return VideoFeedItem(
+        id=video.id,
+        name=video.name,
+        created_at=video.created_at,
+        author=AuthorDto(
+            id=video.author.id,
+            name=video.author.name,
+            profile_picture=video.author.profile_picture
+        ),
+        tags=[tag.tag_name for tag in video.tags]
+    )
+
+
+#
+# Feed items of the given videos, in the order of video_ids
+#
+async def load_feed_items(video_ids: list[uuid.UUID]) -> list[VideoFeedItem]:
+    if len(video_ids) == 0:
+        return []
+
+    async with ReadOnlySessionMaker() as session:
+        session: AsyncSession
+
+        videos: list[Video] = (
+            await session.execute(select(Video).options(*FEED_ITEM_OPTIONS).where(Video.id.in_(video_ids)))
+        ).scalars().all()
+
+    by_id = {video.id: video for video in videos}
+    return [to_feed_item(by_id[video_id]) for video_id in video_ids if video_id in by_id]
+
+
+@log_entrance_debug(VIDEO_FEED_SERVICE_LOGGER, log_result=False)
+async def get_feed(cursor: str | None, limit: int) -> VideoFeedPage:
+    query = (
+        select(Video)
+        .options(*FEED_ITEM_OPTIONS)
+        .order_by(Video.created_at.desc(), Video.id.desc())
+        # One extra row tells whether there is a next page
+        .limit(limit + 1)
+    )
+
+    if cursor != None:
+        created_at, video_id = decode_cursor(cursor)
+        query = query.where(tuple_(Video.created_at, Video.id) < tuple_(created_at, video_id))
+
+    async with ReadOnlySessionMaker() as session:
+        session: AsyncSession
+
+        videos: list[Video] = (await session.execute(query)).scalars().all()
+
+    has_next = len(videos) > limit
+    videos = videos[:limit]
+
+    return VideoFeedPage(
+        items=[to_feed_item(video) for video in videos],
+        next_cursor=encode_cursor(videos[-1].created_at, videos[-1].id) if has_next else None
+    )
@@ -0,0 +1,163 @@
+from globals import VIDEO_FILE_MEDIA_TYPE, VIDEO_FILE_CACHE_MAX_AGE_SECONDS
+from config.video_files import video_file_index, stream_limiter, VideoFile, VideoFileResponse
+from exceptions import NotFoundException, TooManyRequestsException, UnauthorizedException
+from .session_service import get_session_user_id
+from log.loggers import VIDEO_FILE_SERVICE_LOGGER
+from email.utils import parsedate_to_datetime
+from log.wrappers import log_entrance_debug
+from config.blob_store import blob_store
+from starlette.datastructures import Headers
+from fastapi.responses import Response
+import functools
+import uuid
+
+#
+# GET/HEAD /videos/{id}/file, with single byte ranges (a player seeking)
+# and conditional requests (a cache revalidating). Multi-range requests
+# and ranges the server can't parse get the whole file, as RFC 9110 allows.
+#
+
+
+# Only ASCII digits: isdigit() also takes '²', which int() refuses, and int() takes other scripts' digits
+def __is_number(text: str) -> bool:
+    return text.isascii() and text.isdecimal()
+
+
+#
+# (start, end) of a single "bytes=" range, end exclusive, None if the
+# header is to be ignored. start >= size means it is not satisfiable.
+#
+def parse_range(value: str, size: int) -> tuple[int, int] | None:
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, dash, last = spec.strip().partition("-")
+    if dash == "" or not (first == "" or __is_number(first)) or not (last == "" or __is_number(last)):
+        return None
+
+    if first == "":
+        if last == "":
+            return None
+        suffix = int(last)
+        return (max(0, size - suffix), size) if suffix != 0 else (size, size)
+
+    start = int(first)
+    if last != "" and int(last) < start:
+        return None
+    if start >= size:
+        return (size, size)
+
+    return (start, min(int(last) + 1, size) if last != "" else size)
+
+
+def etag_matches(value: str, etag: str, weak: bool) -> bool:
+    if value.strip() == "*":
+        return True
+
+    for candidate in value.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+
+    return False
+
+
+def not_modified(headers: Headers, file: VideoFile) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, file.etag, weak=True)
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+
+    try:
+        return file.modified_at <= int(parsedate_to_datetime(if_modified_since).timestamp())
+    except (TypeError, ValueError):
+        return False
+
+
+#
+# If-Range: the range only applies to the representation the client
+# already has part of, anything else gets the whole new one
+#
+def range_applies(headers: Headers, file: VideoFile) -> bool:
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return etag_matches(if_range, file.etag, weak=False)
+
+    return if_range == file.last_modified
+
+
+def file_headers(file: VideoFile) -> dict[str, str]:
+    return {
+        "etag": file.etag,
+        "last-modified": file.last_modified,
+        "cache-control": f"public, max-age={VIDEO_FILE_CACHE_MAX_AGE_SECONDS}",
+        "accept-ranges": "bytes"
+    }
+
+
+#
+# Streams are counted per user, anonymous requests (or expired sessions)
+# per address. The gateway appends the address it got the request from.
+#
+async def stream_client(session_id: str | None, headers: Headers, peer: str) -> str:
+    if session_id != None:
+        try:
+            return f"user:{await get_session_user_id(session_id)}"
+        except UnauthorizedException:
+            pass
+
+    forwarded_for = headers.get("x-forwarded-for")
+    if forwarded_for != None:
+        return f"address:{forwarded_for.rsplit(',', 1)[-1].strip()}"
+
+    return f"address:{peer}"
+
+
+@log_entrance_debug(VIDEO_FILE_SERVICE_LOGGER, log_result=False)
+async def serve_video_file(video_id: uuid.UUID, method: str, headers: Headers, client: str) -> Response:
+    file = await video_file_index.get(video_id)
+    if file == None:
+        raise NotFoundException("Video file not found.")
+
+    size = file.manifest.size
+    response_headers = file_headers(file)
+
+    if not_modified(headers, file):
+        return Response(status_code=304, headers=response_headers)
+
+    start, end, status_code = 0, size, 200
+    range_header = headers.get("range")
+    if range_header != None and range_applies(headers, file):
+        byte_range = parse_range(range_header, size)
+        if byte_range != None:
+            start, end = byte_range
+            if start >= size:
+                return Response(status_code=416, headers={**response_headers, "content-range": f"bytes */{size}"})
+
+            status_code = 206
+            response_headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+
+    response_headers["content-length"] = str(end - start)
+
+    if method == "HEAD":
+        return VideoFileResponse(blob_store, file.manifest, start, end, status_code, response_headers, VIDEO_FILE_MEDIA_TYPE, lambda: None)
+
+    if not stream_limiter.acquire(client):
+        raise TooManyRequestsException("Too many open video streams.")
+
+    return VideoFileResponse(
+        blob_store, file.manifest, start, end, status_code, response_headers, VIDEO_FILE_MEDIA_TYPE,
+        functools.partial(stream_limiter.release, client)
+    )
@@ -0,0 +1,114 @@
+from globals import VIDEO_SEARCH_CACHE_TTL_SECONDS, VIDEO_SEARCH_WORD_SIMILARITY_THRESHOLD
+from log.loggers import VIDEO_SEARCH_SERVICE_LOGGER
+from .video_feed_service import load_feed_items
+from config.db_conf import ReadOnlySessionMaker
+from sqlalchemy.ext.asyncio import AsyncSession
+from log.wrappers import log_entrance_debug
+from exceptions import BadRequestException
+from redis.exceptions import RedisError
+from config.redis_conf import redis_client
+from models.dtos import VideoFeedPage
+from sqlalchemy import text
+import binascii
+import hashlib
+import base64
+import orjson
+import uuid
+
+#
+# Search of videos by name. A video matches when its name_tsv matches the
+# query as a web search (GIN on name_tsv) or when the query is close enough
+# to a word sequence of the name by trigrams (GIN trigram on name), which
+# catches typos; postgres answers the OR with a BitmapOr of both indexes.
+# Results are ordered by text rank plus word similarity and paginated by
+# the (score, id) keyset. Rendered pages are cached in redis for a short while.
+#
+
+CACHE_KEY = "video_search:{digest}"
+
+SEARCH_QUERY = """
+WITH ranked AS (
+    SELECT v.id, ts_rank_cd(v.name_tsv, q.query) + word_similarity(:text, v.name) AS score
+    FROM videos v, websearch_to_tsquery('russian', :text) AS q(query)
+    WHERE v.name_tsv @@ q.query OR :text <% v.name
+)
+SELECT id, score FROM ranked
+{keyset}
+ORDER BY score DESC, id DESC
+LIMIT :limit
+"""
+
+FIRST_PAGE = text(SEARCH_QUERY.format(keyset=""))
+NEXT_PAGE = text(SEARCH_QUERY.format(keyset="WHERE (score, id) < (CAST(:score AS real), CAST(:video_id AS uuid))"))
+
+SET_SIMILARITY_THRESHOLD = text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)")
+
+
+def encode_cursor(score: float, video_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps([score, str(video_id)])).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[float, uuid.UUID]:
+    try:
+        score, video_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return (float(score), uuid.UUID(video_id))
+    except (binascii.Error, orjson.JSONDecodeError, ValueError, TypeError):
+        raise BadRequestException("Invalid cursor")
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).lower()
+
+
+async def __search_page(query: str, cursor: str | None, limit: int) -> VideoFeedPage:
+    params = {"text": query, "limit": limit + 1}
+    statement = FIRST_PAGE
+
+    if cursor != None:
+        score, video_id = decode_cursor(cursor)
+        params.update(score=score, video_id=video_id)
+        statement = NEXT_PAGE
+
+    async with ReadOnlySessionMaker() as session:
+        session: AsyncSession
+
+        await session.execute(SET_SIMILARITY_THRESHOLD, {"threshold": str(VIDEO_SEARCH_WORD_SIMILARITY_THRESHOLD)})
+        rows = (await session.execute(statement, params)).all()
+
+    # One extra row tells whether there is a next page
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    return VideoFeedPage(
+        items=await load_feed_items([row.id for row in rows]),
+        next_cursor=encode_cursor(rows[-1].score, rows[-1].id) if has_next else None
+    )
+
+
+#
+# Returns the serialized page, hits are served from the cache without
+# touching postgres or pydantic
+#
+@log_entrance_debug(VIDEO_SEARCH_SERVICE_LOGGER, log_result=False)
+async def search_videos(query: str, cursor: str | None, limit: int) -> bytes:
+    query = normalize_query(query)
+    if query == "":
+        raise BadRequestException("Search query is empty")
+
+    cache_key = CACHE_KEY.format(digest=hashlib.sha1(orjson.dumps([query, cursor, limit])).hexdigest())
+
+    try:
+        cached = await redis_client.get(cache_key)
+        if cached != None:
+            return cached
+    except RedisError as ex:
+        VIDEO_SEARCH_SERVICE_LOGGER.warning(f"Search cache is unavailable | {ex}")
+
+    body = (await __search_page(query, cursor, limit)).model_dump_json().encode()
+
+    try:
+        await redis_client.set(cache_key, body, ex=VIDEO_SEARCH_CACHE_TTL_SECONDS)
+    except RedisError as ex:
+        VIDEO_SEARCH_SERVICE_LOGGER.warning(f"Search cache is unavailable | {ex}")
+
+    return body
@@ -0,0 +1,152 @@
+#
+# Content-defined chunking and manifest ranges of the blob store
+# (config/blob_store.py). Pure functions, no database or disk.
+#
+import unittest
+import pathlib
+import random
+import sys
+import os
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "video_service"))
+
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+from config.blob_store import (
+    WINDOW_SIZE, SEGMENT_SIZE, MULTIPLIER, Manifest, boundary_candidates, chunk_boundaries, position_powers
+)
+from unittest import mock
+import config.blob_store
+import numpy as np
+
+# Small chunks keep the files small while still crossing segments
+MIN_SIZE = 2 * 1024
+AVG_SIZE = 8 * 1024
+MAX_SIZE = 32 * 1024
+
+
+def random_bytes(size: int, seed: int) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+# The rolling hash of the window ending right before position end, as defined
+def naive_hash(data: bytes, end: int) -> int:
+    return sum(data[end - 1 - k] * pow(MULTIPLIER, k, 2 ** 32) for k in range(WINDOW_SIZE)) % 2 ** 32
+
+
+# All window hashes at once, term by term, ends[i] = WINDOW_SIZE + i
+def naive_hashes(data: bytes) -> np.ndarray:
+    values = np.frombuffer(data, dtype=np.uint8).astype(np.uint64)
+    count = len(values) - WINDOW_SIZE + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for k in range(WINDOW_SIZE):
+        start = WINDOW_SIZE - 1 - k
+        hashes = (hashes + values[start:start + count] * np.uint64(pow(MULTIPLIER, k, 2 ** 32))) % np.uint64(2 ** 32)
+    return hashes
+
+
+class BoundaryCandidatesTest(unittest.TestCase):
+    def test_hash_matches_the_definition(self):
+        data = random_bytes(2 * SEGMENT_SIZE + 12345, seed=1)
+        bits = 8
+        positions, hashes = boundary_candidates(np.frombuffer(data, dtype=np.uint8), bits)
+        candidates = dict(zip(positions.tolist(), hashes.tolist()))
+
+        rng = random.Random(2)
+        sampled = [rng.randrange(WINDOW_SIZE, len(data) + 1) for _ in range(2000)]
+        # Windows reaching across a segment start are hashed from the previous segment's bytes
+        for segment_start in (SEGMENT_SIZE, 2 * SEGMENT_SIZE):
+            sampled.extend(range(segment_start - 2, segment_start + WINDOW_SIZE + 2))
+        sampled.extend([WINDOW_SIZE, len(data)])
+        # Few random positions are candidates, some are checked on purpose
+        sampled.extend(rng.sample(sorted(candidates), 500))
+
+        for end in sampled:
+            expected = naive_hash(data, end)
+            if expected < 1 << (32 - bits):
+                self.assertEqual(candidates.get(end), expected, f"position {end}")
+            else:
+                self.assertNotIn(end, candidates, f"position {end}")
+
+    def test_every_position_across_many_segments(self):
+        data = random_bytes(50000, seed=8)
+        # Half the positions are candidates, a window lost at any segment start shows up
+        bits = 1
+
+        position_powers.cache_clear()
+        try:
+            with mock.patch.object(config.blob_store, "SEGMENT_SIZE", 1000):
+                positions, hashes = boundary_candidates(np.frombuffer(data, dtype=np.uint8), bits)
+        finally:
+            position_powers.cache_clear()
+
+        expected = naive_hashes(data)
+        found = np.flatnonzero(expected < 1 << (32 - bits))
+        np.testing.assert_array_equal(positions, found + WINDOW_SIZE)
+        np.testing.assert_array_equal(hashes, expected[found])
+
+    def test_data_shorter_than_the_window(self):
+        positions, hashes = boundary_candidates(np.frombuffer(random_bytes(WINDOW_SIZE - 1, seed=3), dtype=np.uint8), 1)
+        self.assertEqual(len(positions), 0)
+        self.assertEqual(len(hashes), 0)
+
+
+class ChunkBoundariesTest(unittest.TestCase):
+    def boundaries(self, data: bytes) -> list[int]:
+        return chunk_boundaries(np.frombuffer(data, dtype=np.uint8), MIN_SIZE, AVG_SIZE, MAX_SIZE)
+
+    def test_chunk_sizes_are_bounded(self):
+        data = random_bytes(SEGMENT_SIZE + 500000, seed=4)
+        boundaries = self.boundaries(data)
+        sizes = np.diff([0] + boundaries)
+
+        self.assertEqual(boundaries[-1], len(data))
+        self.assertTrue(np.all(sizes[:-1] >= MIN_SIZE))
+        self.assertTrue(np.all(sizes <= MAX_SIZE))
+
+    def test_inserted_prefix_leaves_later_chunks_unchanged(self):
+        data = random_bytes(SEGMENT_SIZE + 500000, seed=5)
+        prefix = random_bytes(1000, seed=6)
+
+        original = self.boundaries(data)
+        shifted = self.boundaries(prefix + data)
+
+        # The cut points resynchronize within a few chunks and never diverge again
+        common = set(end + len(prefix) for end in original) & set(shifted)
+        first = min(common)
+        self.assertLess(shifted.index(first), 4)
+        self.assertEqual(
+            shifted[shifted.index(first):],
+            [end + len(prefix) for end in original if end + len(prefix) >= first]
+        )
+
+    def test_empty_data(self):
+        self.assertEqual(self.boundaries(b""), [])
+
+
+class ManifestRangesTest(unittest.TestCase):
+    def setUp(self):
+        self.data = random_bytes(60, seed=7)
+        # Chunks of 10, 20 and 30 bytes
+        self.contents = {b"a": self.data[:10], b"b": self.data[10:30], b"c": self.data[30:]}
+        self.manifest = Manifest(digest=b"m", size=60, chunks=[b"a", b"b", b"c"], ends=[10, 30, 60])
+
+    def test_ranges_at_chunk_edges(self):
+        self.assertEqual(self.manifest.ranges(0, 60), [(b"a", 0, 10), (b"b", 0, 20), (b"c", 0, 30)])
+        self.assertEqual(self.manifest.ranges(0, 10), [(b"a", 0, 10)])
+        self.assertEqual(self.manifest.ranges(10, 30), [(b"b", 0, 20)])
+        self.assertEqual(self.manifest.ranges(9, 11), [(b"a", 9, 1), (b"b", 0, 1)])
+        self.assertEqual(self.manifest.ranges(29, 31), [(b"b", 19, 1), (b"c", 0, 1)])
+        self.assertEqual(self.manifest.ranges(59, 60), [(b"c", 29, 1)])
+
+    def test_empty_ranges(self):
+        for position in (0, 10, 30, 60):
+            with self.subTest(position=position):
+                self.assertEqual(self.manifest.ranges(position, position), [])
+
+    def test_every_range_reassembles_the_file_slice(self):
+        for start in range(61):
+            for end in range(start, 61):
+                pieces = [self.contents[digest][offset:offset + length] for digest, offset, length in self.manifest.ranges(start, end)]
+                self.assertEqual(b"".join(pieces), self.data[start:end], f"range {start}-{end}")
@@ -0,0 +1,162 @@
+#
+# Reconciliation of denormalized like counts (config/like_counter.py) against
+# likes committing around the recount. Needs a disposable postgres and redis
+# (DB_* and REDIS_* variables as for the service), skipped without them. The
+# tables live in their own schema (like_counter_test), dropped afterwards,
+# the like counter keys of redis are deleted.
+#
+import unittest
+import pathlib
+import uuid
+import sys
+import os
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "video_service"))
+
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+from config.like_counter import LikeCounter, DELTAS_KEY, COUNT_KEY, RECONCILE_LOCK_ID
+from sqlalchemy.ext.asyncio import create_async_engine
+from config.redis_conf import redis_client
+from redis.exceptions import RedisError
+from config.db_conf import engine
+from sqlalchemy import text
+
+SCHEMA = "like_counter_test"
+
+CREATE_TABLES = [
+    "CREATE TABLE videos (id uuid PRIMARY KEY, like_count bigint NOT NULL DEFAULT 0)",
+    "CREATE TABLE video_likes_association_table (video_id uuid REFERENCES videos (id), users_id uuid, PRIMARY KEY (video_id, users_id))"
+]
+
+
+#
+# Runs on_read after the first read of the pending deltas, that is after
+# reconciliation took its snapshot and before it recounts
+#
+class HookedRedis:
+    def __init__(self, redis, on_read):
+        self.__redis = redis
+        self.__on_read = on_read
+
+    async def hgetall(self, key):
+        result = await self.__redis.hgetall(key)
+        if self.__on_read is not None:
+            on_read, self.__on_read = self.__on_read, None
+            await on_read()
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.__redis, name)
+
+
+class LikeCounterReconcileTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        if engine is None:
+            self.skipTest("DB_* variables are not set")
+        try:
+            await redis_client.ping()
+        except (RedisError, OSError):
+            self.skipTest("Redis is not reachable")
+
+        self.engine = create_async_engine(engine.url, connect_args={"server_settings": {"search_path": SCHEMA}})
+        async with self.engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+            for statement in CREATE_TABLES:
+                await conn.execute(text(statement))
+
+        self.video_id = uuid.uuid4()
+        await redis_client.delete(DELTAS_KEY, COUNT_KEY.format(video_id=self.video_id))
+
+        # Five in the column, two actual likes whose deltas are still pending
+        async with self.engine.begin() as conn:
+            await conn.execute(text("INSERT INTO videos (id, like_count) VALUES (:id, 5)"), {"id": self.video_id})
+        self.counter = self.like_counter(redis_client)
+        for _ in range(2):
+            await self.like(self.counter)
+
+    async def asyncTearDown(self):
+        await redis_client.delete(DELTAS_KEY, COUNT_KEY.format(video_id=self.video_id))
+        async with self.engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await self.engine.dispose()
+        await redis_client.aclose()
+
+    def like_counter(self, redis, reconcile_batch_size: int = 100) -> LikeCounter:
+        return LikeCounter(
+            redis_client=redis,
+            engine=self.engine,
+            flush_interval=3600,
+            reconcile_interval=3600,
+            reconcile_batch_size=reconcile_batch_size,
+            count_ttl=60
+        )
+
+    # As like_service does: the association row commits, then the delta is counted
+    async def like(self, counter: LikeCounter):
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text("INSERT INTO video_likes_association_table (video_id, users_id) VALUES (:video_id, :user_id)"),
+                {"video_id": self.video_id, "user_id": uuid.uuid4()}
+            )
+        await counter.increment(self.video_id, 1)
+
+    async def column(self) -> int:
+        async with self.engine.connect() as conn:
+            return (await conn.execute(text("SELECT like_count FROM videos WHERE id = :id"), {"id": self.video_id})).scalar()
+
+    async def test_pending_deltas_are_left_to_the_flush(self):
+        self.assertEqual(await self.counter.reconcile(), 1)
+        self.assertEqual(await self.column(), 0)
+
+        await self.counter.flush()
+        self.assertEqual(await self.column(), 2)
+        self.assertEqual(await self.counter.reconcile(), 0)
+
+    async def test_like_during_recount_is_not_counted_twice(self):
+        counter = self.like_counter(HookedRedis(redis_client, lambda: self.like(self.counter)))
+
+        # The third like may or may not be in the recount, the video waits
+        self.assertEqual(await counter.reconcile(), 0)
+        self.assertEqual(counter.stats()["deferred_videos"], 1)
+
+        await counter.flush()
+        self.assertEqual(await self.column(), 8)
+
+        self.assertEqual(await counter.reconcile(), 1)
+        self.assertEqual(await self.column(), 3)
+        await counter.flush()
+        self.assertEqual(await self.column(), 3)
+
+    async def test_like_between_reconcile_and_flush_is_counted_once(self):
+        await self.counter.reconcile()
+        await self.like(self.counter)
+        await self.counter.flush()
+
+        self.assertEqual(await self.column(), 3)
+        self.assertEqual(await self.counter.get(self.video_id), 3)
+
+    async def test_videos_are_reconciled_batch_by_batch(self):
+        # Four more videos counted once without a like, two videos per batch
+        async with self.engine.begin() as conn:
+            for _ in range(4):
+                await conn.execute(text("INSERT INTO videos (id, like_count) VALUES (:id, 1)"), {"id": uuid.uuid4()})
+
+        counter = self.like_counter(redis_client, reconcile_batch_size=2)
+        self.assertEqual(await counter.reconcile(), 5)
+        self.assertEqual(await self.column(), 0)
+
+        async with self.engine.connect() as conn:
+            self.assertEqual((await conn.execute(text("SELECT sum(like_count) FROM videos"))).scalar(), 0)
+
+    async def test_reconcile_is_skipped_while_another_replica_runs_it(self):
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT pg_advisory_lock(:lock_id)"), {"lock_id": RECONCILE_LOCK_ID})
+            self.assertEqual(await self.counter.reconcile(), 0)
+            self.assertEqual(await self.column(), 5)
+            await conn.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": RECONCILE_LOCK_ID})
+
+        self.assertEqual(await self.counter.reconcile(), 1)
+        self.assertEqual(await self.column(), 0)
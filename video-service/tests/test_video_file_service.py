@@ -0,0 +1,117 @@
+#
+# Range and conditional request handling of video files
+# (services/video_file_service.py). Pure functions, no database or redis.
+#
+import unittest
+import pathlib
+import sys
+import os
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src" / "video_service"))
+
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+from services.video_file_service import parse_range, etag_matches, not_modified, range_applies
+from starlette.datastructures import Headers
+from config.video_files import VideoFile
+
+SIZE = 1000
+ETAG = '"3f2a"'
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+MODIFIED_AT = 1445412480
+
+FILE = VideoFile(manifest=None, etag=ETAG, last_modified=LAST_MODIFIED, modified_at=MODIFIED_AT)
+
+
+class ParseRangeTest(unittest.TestCase):
+    def test_closed_range_is_end_exclusive(self):
+        self.assertEqual(parse_range("bytes=0-499", SIZE), (0, 500))
+        self.assertEqual(parse_range("bytes=500-500", SIZE), (500, 501))
+
+    def test_open_range_runs_to_the_end(self):
+        self.assertEqual(parse_range("bytes=900-", SIZE), (900, SIZE))
+
+    def test_last_past_the_end_is_cut(self):
+        self.assertEqual(parse_range("bytes=900-5000", SIZE), (900, SIZE))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range("bytes=-100", SIZE), (900, SIZE))
+        self.assertEqual(parse_range("bytes=-5000", SIZE), (0, SIZE))
+
+    def test_unsatisfiable_ranges_start_at_size(self):
+        self.assertEqual(parse_range("bytes=1000-", SIZE), (SIZE, SIZE))
+        self.assertEqual(parse_range("bytes=2000-3000", SIZE), (SIZE, SIZE))
+        self.assertEqual(parse_range("bytes=-0", SIZE), (SIZE, SIZE))
+
+    def test_whitespace_and_unit_case_are_tolerated(self):
+        self.assertEqual(parse_range("Bytes = 0-9", SIZE), (0, 10))
+
+    def test_ignored_ranges(self):
+        for value in (
+            "items=0-9",
+            "bytes=0-9,20-29",
+            "bytes=9-0",
+            "bytes=-",
+            "bytes=5",
+            "bytes=a-9",
+            "bytes=0-b",
+            "bytes=-1-2",
+            "bytes=",
+            "bytes=²-",
+            "bytes=0-²",
+            "bytes=-٣"
+        ):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_range(value, SIZE))
+
+
+class EtagMatchesTest(unittest.TestCase):
+    def test_wildcard(self):
+        self.assertTrue(etag_matches(" * ", ETAG, weak=False))
+
+    def test_strong_match_in_a_list(self):
+        self.assertTrue(etag_matches(f'"other", {ETAG}', ETAG, weak=False))
+        self.assertFalse(etag_matches('"other"', ETAG, weak=False))
+
+    def test_weak_validators_only_match_weakly(self):
+        self.assertTrue(etag_matches(f"W/{ETAG}", ETAG, weak=True))
+        self.assertFalse(etag_matches(f"W/{ETAG}", ETAG, weak=False))
+
+    def test_unquoted_value_does_not_match(self):
+        self.assertFalse(etag_matches(ETAG.strip('"'), ETAG, weak=True))
+
+
+class NotModifiedTest(unittest.TestCase):
+    def test_no_validators(self):
+        self.assertFalse(not_modified(Headers({}), FILE))
+
+    def test_if_none_match_compares_weakly(self):
+        self.assertTrue(not_modified(Headers({"if-none-match": f"W/{ETAG}"}), FILE))
+        self.assertFalse(not_modified(Headers({"if-none-match": '"other"'}), FILE))
+
+    def test_if_none_match_wins_over_if_modified_since(self):
+        headers = Headers({"if-none-match": '"other"', "if-modified-since": LAST_MODIFIED})
+        self.assertFalse(not_modified(headers, FILE))
+
+    def test_if_modified_since(self):
+        self.assertTrue(not_modified(Headers({"if-modified-since": LAST_MODIFIED}), FILE))
+        self.assertTrue(not_modified(Headers({"if-modified-since": "Thu, 22 Oct 2015 07:28:00 GMT"}), FILE))
+        self.assertFalse(not_modified(Headers({"if-modified-since": "Tue, 20 Oct 2015 07:28:00 GMT"}), FILE))
+
+    def test_unparsable_date_is_ignored(self):
+        self.assertFalse(not_modified(Headers({"if-modified-since": "yesterday"}), FILE))
+
+
+class RangeAppliesTest(unittest.TestCase):
+    def test_no_if_range(self):
+        self.assertTrue(range_applies(Headers({}), FILE))
+
+    def test_etag_must_match_strongly(self):
+        self.assertTrue(range_applies(Headers({"if-range": ETAG}), FILE))
+        self.assertFalse(range_applies(Headers({"if-range": f"W/{ETAG}"}), FILE))
+        self.assertFalse(range_applies(Headers({"if-range": '"other"'}), FILE))
+
+    def test_date_must_be_the_exact_last_modified(self):
+        self.assertTrue(range_applies(Headers({"if-range": f" {LAST_MODIFIED} "}), FILE))
+        self.assertFalse(range_applies(Headers({"if-range": "Thu, 22 Oct 2015 07:28:00 GMT"}), FILE))